@@ -0,0 +1,377 @@
+"""API 基准测试
+
+在独立的基准数据库中生成合成基金池（基金、按交易日的净值历史、盘中估值），
+用 gunicorn 子进程以生产配置启动后端（或通过 --base-url 指向已运行的实例），
+以并发客户端依次压测 routes/funds.py 中的每个路由，输出各场景的 p50/p95/p99 延迟和 req/s。
+结果写为 JSON，传入 --baseline 时与之前的结果对比。
+
+    python -m app.benchmark --funds 5000 --years 10 --output bench.json
+    python -m app.benchmark --baseline bench.json --scenarios prices,analytics
+
+基准数据库与参数一致时复用已生成的数据，--reseed 强制重新生成。
+list_funds/list_funds_fast、prices/prices_fast 两组场景只差 fast 参数，对比快速序列化的端到端效果；
+加 --no-cache 关闭响应缓存，使每个请求都经过查询和序列化：
+
+    python -m app.benchmark --no-cache --scenarios list_funds,list_funds_fast,prices,prices_fast
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+from fund_common.fund_stats import rebuild_fund_stats
+from fund_common.indexes import ensure_indexes
+from fund_common.price_rollups import ROLLUP_COLLECTION, rebuild_price_rollups
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BENCH_DATABASE = "fund_tracker_bench"
+SEED_BATCH_SIZE = 10000
+SERVER_START_TIMEOUT = 60
+
+TRACKING_INDEXES = ["沪深300", "中证500", "中证1000", "创业板指", "上证50", "科创50", "中证红利", "恒生指数"]
+COMPANIES = ["华夏基金", "易方达基金", "南方基金", "广发基金", "嘉实基金", "博时基金", "富国基金", "汇添富基金"]
+
+def trading_days(years: int, end: datetime) -> List[datetime]:
+    day = end - timedelta(days=365 * years)
+    days = []
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def make_fund(i: int, code: str, now: datetime) -> dict:
+    return {
+        "code": code,
+        "name": f"{TRACKING_INDEXES[i % len(TRACKING_INDEXES)]}指数基金{i}",
+        "type": "指数基金",
+        "tracking_index": TRACKING_INDEXES[i % len(TRACKING_INDEXES)],
+        "fund_size": round(random.uniform(1, 500), 2),
+        "company": COMPANIES[i % len(COMPANIES)],
+        "manager": f"经理{i % 200}",
+        "experience_years": round(random.uniform(1, 20), 1),
+        "tracking_error": round(random.uniform(0.01, 2), 2),
+        "rating": random.randint(1, 5),
+        "expense_ratio": round(random.uniform(0.1, 1.2), 2),
+        "establishment_date": now - timedelta(days=365 * 12),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+async def seed(db, funds: int, years: int, reseed: bool = False):
+    """生成合成基金池；已有相同参数的数据时跳过"""
+    meta = {"_id": "universe", "funds": funds, "years": years}
+    if not reseed and await db.bench_meta.find_one(meta) is not None:
+        print(f"Reusing seeded universe: {funds} funds x {years} years")
+        return
+
+    started_at = time.perf_counter()
+    for name in ("funds", "fund_prices", "fund_stats", ROLLUP_COLLECTION, "fund_estimates", "bench_meta"):
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    random.seed(42)
+    rng = np.random.default_rng(42)
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    days = trading_days(years, now)
+    codes = [f"{i:06d}" for i in range(funds)]
+
+    await db.funds.insert_many([make_fund(i, code, now) for i, code in enumerate(codes)], ordered=False)
+
+    batch, estimates = [], []
+    for code in codes:
+        # 对数收益率随机游走
+        changes = rng.normal(0.0003, 0.012, len(days))
+        prices = np.exp(np.cumsum(changes))
+        for day, price, change in zip(days, prices.round(4).tolist(), (changes * 100).round(2).tolist()):
+            batch.append({"fund_code": code, "date": day, "price": price, "daily_change": change})
+        if len(batch) >= SEED_BATCH_SIZE:
+            await db.fund_prices.insert_many(batch, ordered=False)
+            batch = []
+        estimates.append({
+            "code": code, "nav_date": days[-1], "nav": round(float(prices[-1]), 4),
+            "estimate": round(float(prices[-1]) * 1.001, 4), "estimate_change": 0.1,
+            "estimate_time": now + timedelta(hours=14), "updated_at": now,
+        })
+    if batch:
+        await db.fund_prices.insert_many(batch, ordered=False)
+    await db.fund_estimates.insert_many(estimates, ordered=False)
+
+    await rebuild_fund_stats(db)
+    await rebuild_price_rollups(db)
+    await db.bench_meta.insert_one(meta)
+    print(f"Seeded {funds} funds x {len(days)} days in {time.perf_counter() - started_at:.1f}s")
+
+class Universe:
+    """压测请求使用的基金代码、文档 id，以及写接口重复写入的已有净值（写入后数据不变）"""
+
+    def __init__(self, codes: List[str], ids: List[str], prices: List[dict]):
+        self.codes = codes
+        self.ids = ids
+        self.prices = prices
+        self.created_ids: List[str] = []
+        self.counter = 0
+
+    def code(self) -> str:
+        return random.choice(self.codes)
+
+    def next_code(self) -> str:
+        self.counter += 1
+        return f"B{self.counter:05d}"
+
+async def load_universe(db, sample: int = 1000) -> Universe:
+    funds = await db.funds.aggregate([{"$sample": {"size": sample}}, {"$project": {"code": 1}}]).to_list(length=None)
+    prices = await db.fund_prices.find({"fund_code": funds[0]["code"]}, {"_id": 0}).sort("date", -1).limit(250).to_list(length=None)
+    return Universe([f["code"] for f in funds], [str(f["_id"]) for f in funds], prices)
+
+# 场景：名称 -> 生成 (方法, 路径, aiohttp 请求参数) 的函数
+ScenarioRequest = Tuple[str, str, dict]
+
+def _json_date(date: datetime) -> str:
+    return date.isoformat()
+
+def _price_json(price: dict) -> dict:
+    return dict(price, date=_json_date(price["date"]))
+
+def _create_body(u: Universe) -> dict:
+    fund = make_fund(0, u.next_code(), datetime.utcnow())
+    for name in ("created_at", "updated_at"):
+        del fund[name]
+    fund["establishment_date"] = _json_date(fund["establishment_date"])
+    return fund
+
+def _bulk_body(u: Universe) -> dict:
+    rows = [json.dumps(_price_json(price)) for price in u.prices]
+    return {"data": "\n".join(rows), "headers": {"Content-Type": "application/x-ndjson"}}
+
+SCENARIOS: Dict[str, Callable[[Universe], ScenarioRequest]] = {
+    "list_funds": lambda u: ("GET", "/api/funds/", {"params": {"skip": random.randint(0, 1000), "limit": 100}}),
+    "list_funds_fast": lambda u: ("GET", "/api/funds/", {"params": {
+        "skip": random.randint(0, 1000), "limit": 100, "fast": "true",
+    }}),
+    "search_funds": lambda u: ("GET", "/api/funds/", {"params": {"search": random.choice(TRACKING_INDEXES)}}),
+    "summary": lambda u: ("GET", "/api/funds/summary", {"params": {"days": 30}}),
+    "compare": lambda u: ("GET", "/api/funds/compare", {"params": {"codes": ",".join(random.sample(u.codes, 5))}}),
+    "screener": lambda u: ("GET", "/api/funds/screener", {"params": {
+        "tracking_index": random.choice(TRACKING_INDEXES), "min": "return_1y:0", "sort": "-return_1y", "limit": 50,
+    }}),
+    "get_fund": lambda u: ("GET", f"/api/funds/{random.choice(u.ids)}", {}),
+    "get_fund_by_code": lambda u: ("GET", f"/api/funds/code/{u.code()}", {}),
+    "prices": lambda u: ("GET", f"/api/funds/{u.code()}/prices", {}),
+    "prices_fast": lambda u: ("GET", f"/api/funds/{u.code()}/prices", {"params": {"fast": "true"}}),
+    "prices_paged": lambda u: ("GET", f"/api/funds/{u.code()}/prices", {"params": {"limit": 1000, "fast": "true"}}),
+    "prices_10y": lambda u: ("GET", f"/api/funds/{u.code()}/prices", {"params": {"days": 3650}}),
+    "analytics": lambda u: ("GET", f"/api/funds/{u.code()}/analytics", {}),
+    "estimate": lambda u: ("GET", f"/api/funds/{u.code()}/estimate", {}),
+    "add_price": lambda u: ("POST", "/api/funds/prices", {"json": _price_json(random.choice(u.prices))}),
+    "bulk_prices": lambda u: ("POST", "/api/funds/prices/bulk", _bulk_body(u)),
+    "update_fund": lambda u: ("PUT", f"/api/funds/{random.choice(u.ids)}", {"json": {"description": "benchmark"}}),
+    "create_fund": lambda u: ("POST", "/api/funds/", {"json": _create_body(u)}),
+    # 删除 create_fund 创建的基金，恢复数据
+    "delete_fund": lambda u: ("DELETE", f"/api/funds/{u.created_ids.pop()}", {}),
+}
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+async def drive_scenario(
+    session, base_url: str, universe: Universe, name: str, requests: int, concurrency: int
+) -> Tuple[List[float], Dict[str, int]]:
+    """以 concurrency 个并发客户端发出 requests 个请求，返回各请求延迟(秒)和状态计数"""
+    make_request = SCENARIOS[name]
+    if name == "delete_fund":
+        requests = min(requests, len(universe.created_ids))
+    latencies = []
+    statuses: Dict[str, int] = {}
+    remaining = requests
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = make_request(universe)
+            started_at = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, **kwargs) as response:
+                    body = await response.read()
+                    status = str(response.status)
+                    if name == "create_fund" and response.status == 200:
+                        universe.created_ids.append(json.loads(body)["_id"])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started_at)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, statuses
+
+def summarize(latencies: List[float], statuses: Dict[str, int], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+async def run_scenario(session, base_url: str, universe: Universe, name: str, requests: int, concurrency: int) -> dict:
+    started_at = time.perf_counter()
+    latencies, statuses = await drive_scenario(session, base_url, universe, name, requests, concurrency)
+    return summarize(latencies, statuses, time.perf_counter() - started_at)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_server(
+    mongo_url: str, database: str, workers: int, env: Optional[Dict[str, str]] = None
+) -> Tuple[subprocess.Popen, str]:
+    """以生产配置（app/gunicorn_conf.py）启动 gunicorn 子进程，客户端与服务端不共用事件循环"""
+    port = free_port()
+    env = dict(os.environ, MONGO_URL=mongo_url, DATABASE_NAME=database, **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "python:app.gunicorn_conf",
+         "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                async with session.get(base_url + "/") as response:
+                    if response.status == 200:
+                        return process, base_url
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not start in time")
+
+def compare(results: dict, baseline: dict):
+    """打印与基准结果的差异（正数表示延迟增加或吞吐提高）"""
+    def delta(new, old):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else "    n/a"
+
+    print(f"\n{'scenario':18} {'p50 ms':>18} {'p95 ms':>18} {'req/s':>18}")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        print(f"{name:18} "
+              f"{current['p50_ms']:9.2f} {delta(current['p50_ms'], previous['p50_ms'])} "
+              f"{current['p95_ms']:9.2f} {delta(current['p95_ms'], previous['p95_ms'])} "
+              f"{current['rps']:9.1f} {delta(current['rps'], previous['rps'])}")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> dict:
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.database]
+    process = None
+    try:
+        await seed(db, args.funds, args.years, args.reseed)
+        universe = await load_universe(db)
+
+        base_url = args.base_url
+        if base_url is None:
+            env = {"RESPONSE_CACHE_SIZE": "0"} if args.no_cache else None
+            process, base_url = await start_server(args.mongo_url, args.database, args.workers, env)
+
+        names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+        results = {}
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            for name in names:
+                if args.warmup and name not in ("create_fund", "delete_fund"):
+                    await run_scenario(session, base_url, universe, name, args.warmup, args.concurrency)
+                results[name] = await run_scenario(
+                    session, base_url, universe, name, args.requests, args.concurrency
+                )
+                r = results[name]
+                print(f"{name:18} {r['rps']:8.1f} req/s  p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                      f"p99 {r['p99_ms']:8.2f}ms  errors {r['errors']}")
+            # create_fund 单独运行时删除创建的基金
+            while universe.created_ids:
+                await run_scenario(session, base_url, universe, "delete_fund", len(universe.created_ids), args.concurrency)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        client.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "funds": args.funds,
+            "years": args.years,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers if args.base_url is None else None,
+            "response_cache": not args.no_cache if args.base_url is None else None,
+        },
+        "scenarios": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fund tracker API benchmark")
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default=BENCH_DATABASE)
+    parser.add_argument("--funds", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--base-url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="server workers when starting the server")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache when starting the server")
+    parser.add_argument("--scenarios", help=f"comma separated subset of: {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10, help="unrecorded requests per scenario")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare with a previous JSON result")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS) if args.scenarios else set()
+    if unknown:
+        parser.error(f"unknown scenarios: {','.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""生产环境 gunicorn 配置：多个 uvicorn worker 进程
+
+    gunicorn app.main:app -c python:app.gunicorn_conf
+
+每个 worker 各自连接 Mongo（连接池按进程计算，总连接数为 worker 数 × MONGO_MAX_POOL_SIZE）、
+构建搜索索引和响应缓存；worker 之间的缓存失效依赖 RabbitMQ 事件和 fund_stats 轮询。
+多于一个 worker 时指标写入 PROMETHEUS_MULTIPROC_DIR，/metrics 汇总所有 worker。
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))  # worker 进程数，默认 CPU 核数
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))  # worker 无响应多久后重启(秒)
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # 重启或退出时等待请求完成的时间(秒)
+keepalive = int(os.getenv("KEEPALIVE", "5"))  # keep-alive 连接空闲时间(秒)
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))  # worker 处理多少请求后重启，0表示不重启
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+def on_starting(server):
+    # worker 由主进程 fork，此时设置的环境变量对所有 worker 生效（命令行 --workers 优先于 WEB_CONCURRENCY）
+    if server.cfg.workers > 1:
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/fund-tracker-metrics")
+    # 清理上次运行残留的指标文件
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+def child_exit(server, worker):
+    # 退出的 worker 不再计入进行中的请求数
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
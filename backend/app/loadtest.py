@@ -0,0 +1,183 @@
+"""多 worker 压测：吞吐随 worker 数的扩展
+
+复用 app.benchmark 的数据生成和压测场景，依次以 1、2、4… 个 worker（至多 CPU 核数）
+按生产配置启动 gunicorn，对只读场景压测，输出各 worker 数的 req/s 和相对单 worker 的加速比。
+压测客户端分布在多个进程中，同时开始发送请求，避免客户端本身成为瓶颈。
+--read-preference 设置服务端只读路由的 READ_PREFERENCE，配合本地副本集测试从节点读取：
+
+    docker-compose -f docker-compose.replicaset.yml up -d
+    export MONGO_URL="mongodb://localhost:27117,localhost:27118,localhost:27119/?replicaSet=rs0"
+    python -m app.loadtest --read-preference secondaryPreferred --output loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import aiohttp
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.benchmark import (
+    BENCH_DATABASE, Universe, drive_scenario, git_commit, load_universe, run_scenario, seed, start_server,
+    summarize
+)
+
+# 压测的只读场景，写接口始终在主节点，不随读偏好扩展
+READ_SCENARIOS = [
+    "list_funds", "list_funds_fast", "search_funds", "summary", "compare", "screener", "get_fund",
+    "get_fund_by_code", "prices", "prices_fast", "prices_paged", "prices_10y", "analytics", "estimate",
+]
+
+def default_worker_counts() -> List[int]:
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+def client_process(base_url: str, universe: Universe, name: str, requests: int, concurrency: int,
+                   warmup: int, timeout: float, barrier, results):
+    """在独立进程中预热后等待其他客户端进程，再同时开始压测"""
+    random.seed(os.getpid())
+
+    async def main():
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            if warmup:
+                await run_scenario(session, base_url, universe, name, warmup, concurrency)
+            barrier.wait()
+            started_at = time.time()
+            latencies, statuses = await drive_scenario(session, base_url, universe, name, requests, concurrency)
+            results.put((latencies, statuses, started_at, time.time()))
+
+    asyncio.run(main())
+
+def drive_clients(base_url: str, universe: Universe, name: str, args) -> dict:
+    """--clients 个进程平分请求数和并发数，汇总延迟；吞吐按最早开始到最晚结束计算"""
+    # 在事件循环中创建子进程，用 spawn 避免继承父进程的循环状态
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.clients)
+    results = context.Queue()
+    processes = [
+        context.Process(target=client_process, args=(
+            base_url, universe, name, args.requests // args.clients, max(args.concurrency // args.clients, 1),
+            args.warmup, args.timeout, barrier, results,
+        ))
+        for _ in range(args.clients)
+    ]
+    for process in processes:
+        process.start()
+    runs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    for run_latencies, run_statuses, _, _ in runs:
+        latencies.extend(run_latencies)
+        for status, count in run_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    elapsed = max(run[3] for run in runs) - min(run[2] for run in runs)
+    return summarize(latencies, statuses, elapsed)
+
+async def replica_set_info(client) -> dict:
+    hello = await client.admin.command("isMaster")
+    return {"set_name": hello.get("setName"), "members": len(hello.get("hosts", []))}
+
+async def run(args) -> dict:
+    client = AsyncIOMotorClient(args.mongo_url)
+    try:
+        await seed(client[args.database], args.funds, args.years, args.reseed)
+        universe = await load_universe(client[args.database])
+        topology = await replica_set_info(client)
+    finally:
+        client.close()
+    if topology["set_name"] is None and args.read_preference != "primary":
+        print(f"Warning: {args.mongo_url} is not a replica set, all reads go to a single server")
+
+    names = args.scenarios.split(",") if args.scenarios else READ_SCENARIOS
+    worker_counts = [int(count) for count in args.workers.split(",")] if args.workers else default_worker_counts()
+    env = {"READ_PREFERENCE": args.read_preference, "READ_MAX_STALENESS": str(args.max_staleness)}
+    runs: Dict[str, Dict[str, dict]] = {}
+    for workers in worker_counts:
+        process, base_url = await start_server(args.mongo_url, args.database, workers, env)
+        try:
+            runs[str(workers)] = {}
+            for name in names:
+                result = drive_clients(base_url, universe, name, args)
+                runs[str(workers)][name] = result
+                print(f"{workers:3} workers  {name:18} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:8.2f}ms  "
+                      f"p95 {result['p95_ms']:8.2f}ms  errors {result['errors']}")
+        finally:
+            process.terminate()
+            process.wait()
+
+    print_scaling(runs, names)
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "funds": args.funds,
+            "years": args.years,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "clients": args.clients,
+            "read_preference": args.read_preference,
+            "max_staleness": args.max_staleness,
+            "replica_set": topology,
+        },
+        "runs": runs,
+    }
+
+def print_scaling(runs: Dict[str, Dict[str, dict]], names: List[str]):
+    """各场景在不同 worker 数下的 req/s 及相对最少 worker 的加速比"""
+    counts = list(runs)
+    print(f"\n{'scenario':18}" + "".join(f"{count + ' workers':>22}" for count in counts))
+    for name in names:
+        base = runs[counts[0]][name]["rps"]
+        cells = []
+        for count in counts:
+            rps = runs[count][name]["rps"]
+            cells.append(f"{rps:10.1f} ({rps / base if base else 0:5.2f}x)")
+        print(f"{name:18}" + "".join(f"{cell:>22}" for cell in cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Fund tracker multi-worker load test")
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default=BENCH_DATABASE)
+    parser.add_argument("--funds", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--workers", help="comma separated worker counts, default 1,2,4,... up to the CPU count")
+    parser.add_argument("--read-preference", default="primary", help="READ_PREFERENCE for read-only routes")
+    parser.add_argument("--max-staleness", type=int, default=-1, help="READ_MAX_STALENESS in seconds")
+    parser.add_argument("--scenarios", help=f"comma separated subset of: {','.join(READ_SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario and worker count")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent requests across all clients")
+    parser.add_argument("--clients", type=int, default=max((os.cpu_count() or 1) // 2, 1), help="client processes")
+    parser.add_argument("--warmup", type=int, default=20, help="unrecorded requests per client process")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(READ_SCENARIOS) if args.scenarios else set()
+    if unknown:
+        parser.error(f"unknown or write scenarios: {','.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
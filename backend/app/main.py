@@ -1,24 +1,115 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from contextlib import asynccontextmanager
+import asyncio
 import os
-from app.routes import funds
+from fund_common.fund_stats import rebuild_fund_stats
+from fund_common.indexes import ensure_indexes
+from fund_common.price_rollups import ROLLUP_COLLECTION, rebuild_price_rollups
+from app.routes import export, funds, stream
+from app.services.events import EventHub, create_broker
+from app.services.metrics import MetricsMiddleware, MongoCommandMetrics, ProfilerMiddleware, metrics_response
+from app.services.search import FundSearchIndex
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.response_cache import ResponseCache, ResponseCacheMiddleware, fund_tags
 
 # 环境变量配置
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "fund_tracker")
+SEARCH_SYNC_INTERVAL = int(os.getenv("SEARCH_SYNC_INTERVAL", "60"))  # 搜索索引增量同步间隔(秒)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # 响应缓存最大条数
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))  # 响应缓存最大字节数
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))  # 响应缓存有效期(秒)
+CACHE_SYNC_INTERVAL = int(os.getenv("CACHE_SYNC_INTERVAL", "10"))  # 检查爬虫写入的间隔(秒)
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")  # 未配置时事件只在进程内分发
+RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
+RABBITMQ_PASSWORD = os.getenv("RABBITMQ_PASSWORD", "guest")
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"  # 允许请求带 profile=1 获取采样分析结果
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))  # 采样间隔(秒)
+# Mongo 连接池，每个 worker 进程各有一个连接池
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))  # 每个进程的最大连接数
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))  # 每个进程保持的最小连接数
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0")) or None  # 空闲连接关闭时间，0表示不关闭
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000"))  # 建立连接超时
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None  # 单次读写超时，0表示不超时
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))  # 选择可用节点超时
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None  # 等待空闲连接超时，0表示一直等待
+# 只读路由的读偏好：primary/primaryPreferred/secondary/secondaryPreferred/nearest，写入始终在主节点
+READ_PREFERENCE = os.getenv("READ_PREFERENCE", "primary")
+READ_MAX_STALENESS = int(os.getenv("READ_MAX_STALENESS", "-1"))  # 从节点最大延迟(秒)，-1表示不限制，否则不小于90
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def read_preference():
+    if READ_PREFERENCE not in READ_PREFERENCES:
+        raise ValueError(f"Unknown READ_PREFERENCE {READ_PREFERENCE}, expected one of {', '.join(READ_PREFERENCES)}")
+    if READ_PREFERENCE == "primary":
+        return Primary()
+    return READ_PREFERENCES[READ_PREFERENCE](max_staleness=READ_MAX_STALENESS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时连接数据库
-    app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
+    app.mongodb_client = AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[MongoCommandMetrics()],
+    )
     app.mongodb = app.mongodb_client[DATABASE_NAME]
+    # 只读路由使用的数据库句柄，可按读偏好读取从节点；写入和写后读取使用 app.mongodb
+    app.mongodb_read = app.mongodb_client.get_database(DATABASE_NAME, read_preference=read_preference())
+    # 创建路由查询所需的索引
+    await ensure_indexes(app.mongodb)
+    # 首次部署时根据已有数据生成 fund_stats 和净值降采样文档，之后由写入方增量维护
+    if await app.mongodb.fund_stats.find_one() is None:
+        await rebuild_fund_stats(app.mongodb)
+    if await app.mongodb[ROLLUP_COLLECTION].find_one() is None:
+        await rebuild_price_rollups(app.mongodb)
+    # 构建基金搜索索引，并定期同步爬虫写入的变更
+    app.fund_search = FundSearchIndex()
+    await app.fund_search.load(app.mongodb.funds)
+    search_sync_task = asyncio.create_task(
+        app.fund_search.sync_forever(app.mongodb.funds, SEARCH_SYNC_INTERVAL)
+    )
+    # 爬虫写入后按 fund_stats 的更新时间失效对应的响应缓存
+    cache_sync_task = asyncio.create_task(
+        app.response_cache.sync_forever(app.mongodb.fund_stats, CACHE_SYNC_INTERVAL)
+    )
+    # 消费爬虫和写接口发布的变更事件
+    app.events.start()
     yield
     # 关闭时断开连接
+    search_sync_task.cancel()
+    cache_sync_task.cancel()
+    app.events.close()
     app.mongodb_client.close()
 
 app = FastAPI(lifespan=lifespan)
+app.response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_BYTES)
+
+# 响应缓存，需在 CORS 之前添加，使缓存命中的响应也带 CORS 头
+app.add_middleware(ResponseCacheMiddleware, cache=app.response_cache)
+
+# 变更事件：推送给 SSE 订阅者，并立即失效对应的响应缓存和已删除基金的搜索索引
+app.event_hub = EventHub()
+app.events = create_broker(RABBITMQ_HOST, RABBITMQ_USER, RABBITMQ_PASSWORD)
+app.events.subscribe(app.event_hub.publish)
+app.events.subscribe(lambda event: app.response_cache.invalidate(*fund_tags(event["code"])))
+app.events.subscribe(lambda event: app.fund_search.apply_event(event))
 
 # 配置CORS
 app.add_middleware(
@@ -27,15 +118,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
+# 采样分析和请求指标，最后添加的中间件在最外层，缓存命中的请求也会被统计
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilerMiddleware, interval=PROFILE_INTERVAL)
+app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(funds.router, prefix="/api/funds", tags=["funds"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Fund Tracker API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+# 本地开发：自动重载的单进程服务；生产环境使用 gunicorn 多进程，见 app/gunicorn_conf.py
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,6 +1,12 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, Field, validator
+from typing import Dict, Optional, List
+from datetime import datetime, timezone
+
+def naive_utc(value: datetime) -> datetime:
+    """带时区的时间转换为 UTC 并去掉时区，与 Mongo 读出的时间一致，可以互相比较"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class FundBase(BaseModel):
     code: str
@@ -45,9 +51,97 @@ class FundPrice(BaseModel):
     date: datetime
     price: float
     daily_change: float  # 日涨跌幅
+
+    _normalize_date = validator("date", allow_reuse=True)(naive_utc)
     
 class FundPriceInDB(FundPrice):
     id: str = Field(alias="_id")
     
     class Config:
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+class FundPriceRollup(FundPriceInDB):
+    """按周/月降采样的净值：date 为周期起点，price 为期末净值，daily_change 为周期涨跌幅"""
+    daily_change: Optional[float] = None
+    open: float
+    high: float
+    low: float
+    end_date: datetime  # 期内最后一个净值日期
+
+class FundSummary(BaseModel):
+    id: str = Field(alias="_id")
+    code: str
+    name: str
+    tracking_index: Optional[str] = None
+    company: Optional[str] = None
+    fund_size: Optional[float] = None
+    tracking_error: Optional[float] = None
+    latest_date: Optional[datetime] = None
+    latest_price: Optional[float] = None
+    daily_change: Optional[float] = None  # 日涨跌幅
+    period_change: Optional[float] = None  # 区间涨跌幅(%)
+
+    class Config:
+        populate_by_name = True
+
+class BulkPriceError(BaseModel):
+    row: int  # 从1开始的行号
+    detail: str
+
+class BulkPriceResult(BaseModel):
+    received: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    upserted: int = 0
+    modified: int = 0
+    failed: int = 0  # 校验通过但写入失败
+    errors: List[BulkPriceError] = []
+
+class FundAnalytics(BaseModel):
+    code: str
+    as_of: datetime  # 最新净值日期
+    days: int  # 风险指标的计算区间（天）
+    returns: Dict[str, Optional[float]]  # 各区间收益率(%)
+    volatility: Optional[float] = None  # 年化波动率(%)
+    max_drawdown: Optional[float] = None  # 最大回撤(%)
+    sharpe_ratio: Optional[float] = None
+    tracking_error: Optional[float] = None  # 年化跟踪误差(%)
+    benchmark: Optional[str] = None
+    observations: int = 0
+
+class FundComparison(BaseModel):
+    codes: List[str]  # 矩阵列顺序
+    dates: List[datetime]  # 矩阵行顺序
+    prices: List[List[Optional[float]]]  # 按日期对齐并前值填充的净值
+    returns: List[List[Optional[float]]]  # 日收益率(%)，比 dates 少第一行
+    correlation: List[List[Optional[float]]]  # 日收益率相关系数
+
+class FundStats(BaseModel):
+    code: str
+    name: Optional[str] = None
+    type: Optional[str] = None
+    tracking_index: Optional[str] = None
+    company: Optional[str] = None
+    fund_size: Optional[float] = None
+    expense_ratio: Optional[float] = None
+    tracking_error: Optional[float] = None
+    rating: Optional[int] = None
+    latest_date: Optional[datetime] = None
+    latest_price: Optional[float] = None
+    daily_change: Optional[float] = None
+    return_1w: Optional[float] = None  # 各区间收益率(%)
+    return_1m: Optional[float] = None
+    return_3m: Optional[float] = None
+    return_6m: Optional[float] = None
+    return_1y: Optional[float] = None
+    volatility: Optional[float] = None  # 近一年年化波动率(%)
+    updated_at: Optional[datetime] = None
+
+class FundEstimate(BaseModel):
+    code: str
+    nav_date: datetime  # 最新官方净值日期
+    nav: float
+    estimate: float  # 盘中估算净值
+    estimate_change: float  # 估算涨跌幅(%)
+    estimate_time: datetime
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+import pymongo
+
+from app.services.export import (
+    EXPORT_FORMATS, FUND_COLUMNS, PRICE_COLUMNS, encode_stream, iter_batches, pa
+)
+
+router = APIRouter()
+
+FORMAT_PATTERN = f"^({'|'.join(EXPORT_FORMATS)})$"
+
+def export_response(name: str, format: str, cursor, columns) -> StreamingResponse:
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=501, detail="Arrow export requires pyarrow")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        encode_stream(format, iter_batches(cursor), columns),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+def parse_codes(codes: Optional[str]) -> list:
+    return [code.strip() for code in codes.split(",") if code.strip()] if codes else []
+
+# 导出基金列表
+@router.get("/funds")
+async def export_funds(
+    request: Request,
+    format: str = Query("ndjson", regex=FORMAT_PATTERN),
+    codes: Optional[str] = Query(None, description="逗号分隔的基金代码，默认全部")
+):
+    query = {}
+    fund_codes = parse_codes(codes)
+    if fund_codes:
+        query["code"] = {"$in": fund_codes}
+
+    projection = {"_id": 0, **{column: 1 for column in FUND_COLUMNS}}
+    cursor = request.app.mongodb_read.funds.find(query, projection).sort("code", pymongo.ASCENDING)
+    return export_response("funds", format, cursor, FUND_COLUMNS)
+
+# 导出价格历史，按基金代码和日期排序
+@router.get("/prices")
+async def export_prices(
+    request: Request,
+    format: str = Query("ndjson", regex=FORMAT_PATTERN),
+    codes: Optional[str] = Query(None, description="逗号分隔的基金代码，默认全部"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
+    query = {}
+    fund_codes = parse_codes(codes)
+    if fund_codes:
+        query["fund_code"] = {"$in": fund_codes}
+
+    date_query = {}
+    if start_date:
+        date_query["$gte"] = start_date
+    if end_date:
+        date_query["$lte"] = end_date
+    if date_query:
+        query["date"] = date_query
+
+    projection = {"_id": 0, **{column: 1 for column in PRICE_COLUMNS}}
+    cursor = request.app.mongodb_read.fund_prices.find(query, projection).sort(
+        [("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)]
+    )
+    return export_response("fund_prices", format, cursor, PRICE_COLUMNS)
@@ -1,53 +1,277 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from motor.motor_asyncio import AsyncIOMotorCollection
-from fastapi import Request
-from typing import List, Optional
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta
 from bson import ObjectId
 import pymongo
+from fund_common.events import delete_event, details_event, price_event
+from fund_common.fund_stats import SCREENER_FIELDS, refresh_fund_stats
+from fund_common.price_rollups import RESOLUTIONS, ROLLUP_COLLECTION, refresh_price_rollups
 
-from app.models.fund import FundBase, FundCreate, FundUpdate, FundInDB, FundPrice, FundPriceInDB
+from app.models.fund import (
+    BulkPriceResult, FundAnalytics, FundBase, FundComparison, FundCreate, FundEstimate, FundUpdate, FundInDB, FundPrice, FundPriceInDB, FundPriceRollup, FundStats,
+    FundSummary
+)
+from app.services.analytics import compare_funds, get_fund_analytics
+from app.services.fast_json import FastJSONResponse, fields_projection
+from app.services.ingest import PriceIngestor, iter_json_array, iter_ndjson
+from app.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.services.response_cache import cache_response, fund_tags
 
 router = APIRouter()
 
-def get_fund_collection(request: Request) -> AsyncIOMotorCollection:
-    return request.app.mongodb.funds
+# 仪表盘摘要需要的基金字段
+SUMMARY_FUND_FIELDS = {
+    "code": 1,
+    "name": 1,
+    "tracking_index": 1,
+    "company": 1,
+    "fund_size": 1,
+    "tracking_error": 1,
+}
 
-def get_price_collection(request: Request) -> AsyncIOMotorCollection:
-    return request.app.mongodb.fund_prices
+# 游标分页时价格历史每页的默认条数
+PRICE_PAGE_SIZE = 1000
+
+# 价格历史最长区间（自然日）
+MAX_PRICE_DAYS = 3650
+# resolution=auto 时默认最多返回的点数
+DEFAULT_MAX_POINTS = 600
+# 各粒度平均每个自然日的点数，由细到粗
+POINTS_PER_DAY = {
+    "day": 5 / 7,
+    "week": 1 / 7,
+    "month": 12 / 365,
+}
+
+# 一次最多对比的基金数量
+MAX_COMPARE_FUNDS = 200
+
+def get_db(request: Request, read_only: bool = False):
+    """只读路由按 READ_PREFERENCE 可读从节点；写入及写后的读取始终在主节点"""
+    return request.app.mongodb_read if read_only else request.app.mongodb
+
+def get_fund_collection(request: Request, read_only: bool = False) -> AsyncIOMotorCollection:
+    return get_db(request, read_only).funds
+
+def get_price_collection(request: Request, read_only: bool = False) -> AsyncIOMotorCollection:
+    return get_db(request, read_only).fund_prices
+
+def get_stats_collection(request: Request, read_only: bool = False) -> AsyncIOMotorCollection:
+    return get_db(request, read_only).fund_stats
+
+def parse_range_filters(values: Optional[List[str]], operator: str) -> dict:
+    """解析 field:value 形式的范围条件"""
+    filters = {}
+    for value in values or []:
+        field, _, number = value.partition(":")
+        if field not in SCREENER_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Cannot filter on {field}")
+        try:
+            filters.setdefault(field, {})[operator] = float(number)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value for {field}: {number}")
+    return filters
+
+async def find_funds(
+    request: Request,
+    skip: int,
+    limit: int,
+    search: Optional[str] = None,
+    projection: Optional[dict] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """返回一页基金及下一页游标；传入游标时忽略 skip"""
+    fund_collection = get_fund_collection(request, read_only=True)
+    position = decode_cursor(cursor) if cursor else {}
+    
+    if not search:
+        # 按 code 做 keyset 分页，由 code 唯一索引提供排序
+        if cursor and not isinstance(position.get("code"), str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"code": {"$gt": position["code"]}} if cursor else {}
+        find = fund_collection.find(query, projection).sort("code", pymongo.ASCENDING)
+        if not cursor:
+            find = find.skip(skip)
+        funds = await find.limit(limit + 1).to_list(length=limit + 1)
+        
+        next_cursor = None
+        if len(funds) > limit:
+            funds = funds[:limit]
+            next_cursor = encode_cursor({"code": funds[-1]["code"]})
+        return funds, next_cursor
+    
+    # 通过内存搜索索引得到排序后的基金代码，再按代码批量读取；游标记录排名位置
+    start = position.get("rank") if cursor else skip
+    if cursor and (type(start) is not int or start < 0):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    codes = request.app.fund_search.search(search, limit=start + limit + 1)[start:]
+    next_cursor = encode_cursor({"rank": start + limit}) if len(codes) > limit else None
+    codes = codes[:limit]
+    if not codes:
+        return [], None
+    
+    funds = await fund_collection.find({"code": {"$in": codes}}, projection).to_list(length=len(codes))
+    rank = {code: i for i, code in enumerate(codes)}
+    funds.sort(key=lambda fund: rank[fund["code"]])
+    return funds, next_cursor
 
 # 获取所有基金
 @router.get("/", response_model=List[FundInDB])
 async def get_funds(
     request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fast: bool = False,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，指定时使用快速模式")
 ):
-    fund_collection = get_fund_collection(request)
-    query = {}
+    cache_response(request, "funds")
     
-    if search:
-        query = {
-            "$or": [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"code": {"$regex": search, "$options": "i"}},
-                {"tracking_index": {"$regex": search, "$options": "i"}},
-                {"company": {"$regex": search, "$options": "i"}},
-            ]
-        }
+    # 快速模式：按投影读取，直接序列化 BSON 文档，跳过模型校验
+    if fast or fields:
+        projection = fields_projection(FundInDB, fields, required=("code",))
+        funds, next_cursor = await find_funds(request, skip, limit, search, projection, cursor)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return FastJSONResponse(funds, headers=headers)
     
-    funds = await fund_collection.find(query).skip(skip).limit(limit).to_list(length=limit)
+    funds, next_cursor = await find_funds(request, skip, limit, search, cursor=cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     for fund in funds:
         fund["_id"] = str(fund["_id"])
     
     return funds
 
+# 获取基金摘要（最新净值、日涨跌幅、区间涨跌幅），供仪表盘一次性加载
+@router.get("/summary", response_model=List[FundSummary])
+async def get_funds_summary(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(1000, ge=1, le=5000),
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    days: int = Query(30, ge=1, le=365),
+    end_date: Optional[datetime] = None
+):
+    price_collection = get_price_collection(request, read_only=True)
+    
+    funds, next_cursor = await find_funds(request, skip, limit, search, SUMMARY_FUND_FIELDS, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    if not funds:
+        return []
+    
+    if end_date is None:
+        end_date = datetime.utcnow()
+    
+    start_date = end_date - timedelta(days=days)
+    
+    # 一次聚合算出每只基金区间内的首个和最新净值
+    pipeline = [
+        {"$match": {
+            "fund_code": {"$in": [fund["code"] for fund in funds]},
+            "date": {"$gte": start_date, "$lte": end_date}
+        }},
+        {"$sort": {"fund_code": 1, "date": 1}},
+        {"$group": {
+            "_id": "$fund_code",
+            "first_price": {"$first": "$price"},
+            "latest_price": {"$last": "$price"},
+            "latest_date": {"$last": "$date"},
+            "daily_change": {"$last": "$daily_change"},
+        }},
+    ]
+    
+    stats = {}
+    async for row in price_collection.aggregate(pipeline):
+        stats[row["_id"]] = row
+    
+    summaries = []
+    for fund in funds:
+        fund["_id"] = str(fund["_id"])
+        row = stats.get(fund["code"])
+        if row:
+            first_price = row["first_price"]
+            fund.update({
+                "latest_date": row["latest_date"],
+                "latest_price": row["latest_price"],
+                "daily_change": row["daily_change"],
+                "period_change": (row["latest_price"] - first_price) / first_price * 100 if first_price else None,
+            })
+        summaries.append(fund)
+    
+    return summaries
+
+# 多基金对比：按日期对齐的净值、日收益率矩阵和相关系数矩阵
+@router.get("/compare", response_model=FundComparison)
+async def compare_funds_route(
+    request: Request,
+    codes: str = Query(..., description="逗号分隔的基金代码"),
+    days: int = Query(365, ge=2, le=3650),
+    end_date: Optional[datetime] = None
+):
+    fund_codes = list(dict.fromkeys(code.strip() for code in codes.split(",") if code.strip()))
+    if not fund_codes:
+        raise HTTPException(status_code=400, detail="No fund codes given")
+    if len(fund_codes) > MAX_COMPARE_FUNDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMPARE_FUNDS} funds can be compared")
+    
+    if end_date is None:
+        end_date = datetime.utcnow()
+    
+    comparison = await compare_funds(
+        get_price_collection(request, read_only=True), fund_codes, end_date - timedelta(days=days), end_date
+    )
+    comparison["dates"] = [date.isoformat() for date in comparison["dates"]]
+    
+    # 矩阵只含基础类型，直接序列化，跳过大矩阵的 pydantic 校验
+    return JSONResponse(comparison)
+
+# 基金筛选：在 fund_stats 上按条件过滤和排序，不读取净值历史
+@router.get("/screener", response_model=List[FundStats])
+async def screen_funds(
+    request: Request,
+    tracking_index: Optional[str] = None,
+    company: Optional[str] = None,
+    type: Optional[str] = None,
+    min: Optional[List[str]] = Query(None, description="下限条件，如 return_1y:5"),
+    max: Optional[List[str]] = Query(None, description="上限条件，如 expense_ratio:0.5"),
+    sort: str = Query("-return_1y", description="排序字段，前缀 - 表示降序"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    sort_field = sort.lstrip("-")
+    if sort_field not in SCREENER_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort_field}")
+    direction = pymongo.DESCENDING if sort.startswith("-") else pymongo.ASCENDING
+    
+    query = {}
+    for field, value in (("tracking_index", tracking_index), ("company", company), ("type", type)):
+        if value:
+            query[field] = value
+    for operator, values in (("$gte", min), ("$lte", max)):
+        for field, condition in parse_range_filters(values, operator).items():
+            query.setdefault(field, {}).update(condition)
+    # 排序字段为空的基金（如历史不足一年）不参与排名
+    query.setdefault(sort_field, {}).setdefault("$ne", None)
+    
+    cursor = get_stats_collection(request, read_only=True).find(query, {"_id": 0}).sort(
+        [(sort_field, direction), ("code", direction)]
+    ).skip(skip).limit(limit)
+    return await cursor.to_list(length=limit)
+
 # 获取单个基金
 @router.get("/{fund_id}", response_model=FundInDB)
 async def get_fund(fund_id: str, request: Request):
-    fund_collection = get_fund_collection(request)
+    fund_collection = get_fund_collection(request, read_only=True)
     
     try:
         fund = await fund_collection.find_one({"_id": ObjectId(fund_id)})
@@ -63,7 +287,7 @@ async def get_fund(fund_id: str, request: Request):
 # 根据基金代码获取基金
 @router.get("/code/{fund_code}", response_model=FundInDB)
 async def get_fund_by_code(fund_code: str, request: Request):
-    fund_collection = get_fund_collection(request)
+    fund_collection = get_fund_collection(request, read_only=True)
     
     fund = await fund_collection.find_one({"code": fund_code})
     
@@ -71,6 +295,7 @@ async def get_fund_by_code(fund_code: str, request: Request):
         raise HTTPException(status_code=404, detail=f"Fund with code {fund_code} not found")
     
     fund["_id"] = str(fund["_id"])
+    cache_response(request, f"fund:{fund_code}")
     return fund
 
 # 创建基金
@@ -93,6 +318,10 @@ async def create_fund(fund: FundCreate, request: Request):
     result = await fund_collection.insert_one(fund_dict)
     
     created_fund = await fund_collection.find_one({"_id": result.inserted_id})
+    request.app.fund_search.add(created_fund)
+    await refresh_fund_stats(request.app.mongodb, [created_fund["code"]])
+    request.app.response_cache.invalidate(*fund_tags(created_fund["code"]))
+    request.app.events.publish(details_event(created_fund["code"], created_fund))
     created_fund["_id"] = str(created_fund["_id"])
     
     return created_fund
@@ -116,6 +345,11 @@ async def update_fund(fund_id: str, fund_update: FundUpdate, request: Request):
     await fund_collection.update_one({"_id": ObjectId(fund_id)}, {"$set": update_data})
     
     updated_fund = await fund_collection.find_one({"_id": ObjectId(fund_id)})
+    request.app.fund_search.add(updated_fund)
+    # 修改代码时旧代码的统计文档随之删除
+    await refresh_fund_stats(request.app.mongodb, [fund["code"], updated_fund["code"]])
+    request.app.response_cache.invalidate_funds([fund["code"], updated_fund["code"]])
+    request.app.events.publish(details_event(updated_fund["code"], updated_fund))
     updated_fund["_id"] = str(updated_fund["_id"])
     
     return updated_fund
@@ -134,16 +368,93 @@ async def delete_fund(fund_id: str, request: Request):
         raise HTTPException(status_code=404, detail=f"Fund with ID {fund_id} not found")
     
     await fund_collection.delete_one({"_id": ObjectId(fund_id)})
+    request.app.fund_search.remove(fund["code"])
+    await refresh_fund_stats(request.app.mongodb, [fund["code"]])
+    request.app.response_cache.invalidate(*fund_tags(fund["code"]))
+    # 其他 worker 通过事件失效缓存并从搜索索引中移除
+    request.app.events.publish(delete_event(fund["code"]))
+    # 204 响应不能带响应体
+    return Response(status_code=204)
+
+def choose_resolution(days: int, max_points: int) -> str:
+    """点数不超过 max_points 的最细粒度"""
+    for resolution, points_per_day in POINTS_PER_DAY.items():
+        if days * points_per_day <= max_points:
+            return resolution
+    return "month"
 
 # 获取基金价格历史
 @router.get("/{fund_code}/prices", response_model=List[FundPriceInDB])
 async def get_fund_prices(
     fund_code: str, 
     request: Request,
-    days: int = Query(30, ge=1, le=365),
-    end_date: Optional[datetime] = None
+    response: Response,
+    days: int = Query(30, ge=1, le=MAX_PRICE_DAYS),
+    end_date: Optional[datetime] = None,
+    start_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    fast: bool = False,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，指定时使用快速模式"),
+    resolution: str = Query("auto", regex="^(auto|day|week|month)$", description="day/week/month，auto 按 max_points 选择"),
+    max_points: int = Query(DEFAULT_MAX_POINTS, ge=10, le=5000, description="resolution=auto 时最多返回的点数")
 ):
-    price_collection = get_price_collection(request)
+    price_collection = get_price_collection(request, read_only=True)
+    cache_response(request, f"prices:{fund_code}")
+    
+    paginated = cursor is not None or limit is not None
+    if resolution == "auto":
+        resolution = "day" if paginated else choose_resolution(days, max_points)
+    elif resolution != "day" and paginated:
+        raise HTTPException(status_code=400, detail="Cursor pagination is only supported for daily prices")
+    
+    # 周/月粒度读取预聚合的降采样文档，文档已是响应格式，直接序列化
+    if resolution != "day":
+        if end_date is None:
+            end_date = datetime.utcnow()
+        period_start = RESOLUTIONS[resolution](end_date - timedelta(days=days))
+        rollups = await get_db(request, read_only=True)[ROLLUP_COLLECTION].find(
+            {"fund_code": fund_code, "resolution": resolution, "date": {"$gte": period_start, "$lte": end_date}},
+            fields_projection(FundPriceRollup, fields, required=("date",))
+        ).sort("date", pymongo.ASCENDING).to_list(length=None)
+        return FastJSONResponse(rollups)
+    
+    # 快速模式：按投影读取，直接序列化 BSON 文档，跳过模型校验
+    fast = fast or bool(fields)
+    projection = fields_projection(FundPriceInDB, fields, required=("date",)) if fast else None
+    
+    # 传入 cursor 或 limit 时按日期游标分页，可遍历完整历史
+    if paginated:
+        limit = limit or PRICE_PAGE_SIZE
+        date_query = {}
+        if cursor:
+            position = decode_cursor(cursor)
+            if "date" not in position:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            date_query["$gt"] = position["date"]
+        elif start_date:
+            date_query["$gte"] = start_date
+        if end_date:
+            date_query["$lte"] = end_date
+        
+        query = {"fund_code": fund_code}
+        if date_query:
+            query["date"] = date_query
+        
+        prices = await price_collection.find(query, projection).sort("date", pymongo.ASCENDING).limit(limit + 1).to_list(length=limit + 1)
+        headers = {}
+        if len(prices) > limit:
+            prices = prices[:limit]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor({"date": prices[-1]["date"]})
+        
+        if fast:
+            return FastJSONResponse(prices, headers=headers)
+        response.headers.update(headers)
+        
+        for price in prices:
+            price["_id"] = str(price["_id"])
+        
+        return prices
     
     if end_date is None:
         end_date = datetime.utcnow()
@@ -155,13 +466,42 @@ async def get_fund_prices(
         "date": {"$gte": start_date, "$lte": end_date}
     }
     
-    prices = await price_collection.find(query).sort("date", pymongo.ASCENDING).to_list(length=days)
+    prices = await price_collection.find(query, projection).sort("date", pymongo.ASCENDING).to_list(length=days)
+    
+    if fast:
+        return FastJSONResponse(prices)
     
     for price in prices:
         price["_id"] = str(price["_id"])
     
     return prices
 
+# 获取基金指标：多区间收益率、波动率、最大回撤、夏普比率和跟踪误差
+@router.get("/{fund_code}/analytics", response_model=FundAnalytics)
+async def get_fund_analytics_route(
+    fund_code: str,
+    request: Request,
+    days: int = Query(365, ge=30, le=3650),
+    benchmark: Optional[str] = None
+):
+    analytics = await get_fund_analytics(
+        get_fund_collection(request, read_only=True), get_price_collection(request, read_only=True), fund_code, days, benchmark
+    )
+    
+    if analytics is None:
+        raise HTTPException(status_code=404, detail=f"No prices found for fund {fund_code}")
+    
+    return analytics
+
+# 获取盘中估值（由爬虫在交易时段写入）
+@router.get("/{fund_code}/estimate", response_model=FundEstimate)
+async def get_fund_estimate(fund_code: str, request: Request):
+    estimate = await get_db(request, read_only=True).fund_estimates.find_one({"code": fund_code}, {"_id": 0})
+    if estimate is None:
+        raise HTTPException(status_code=404, detail=f"No estimate found for fund {fund_code}")
+    
+    return estimate
+
 # 添加基金价格记录
 @router.post("/prices", response_model=FundPriceInDB)
 async def add_fund_price(price: FundPrice, request: Request):
@@ -185,6 +525,10 @@ async def add_fund_price(price: FundPrice, request: Request):
             {"_id": existing_price["_id"]},
             {"$set": {"price": price.price, "daily_change": price.daily_change}}
         )
+        await refresh_fund_stats(request.app.mongodb, [price.fund_code])
+        await refresh_price_rollups(request.app.mongodb, [price.fund_code], {price.fund_code: price.date})
+        request.app.response_cache.invalidate(f"prices:{price.fund_code}")
+        request.app.events.publish(price_event(price.fund_code, price.date, price.price, price.daily_change))
         existing_price["price"] = price.price
         existing_price["daily_change"] = price.daily_change
         existing_price["_id"] = str(existing_price["_id"])
@@ -192,8 +536,39 @@ async def add_fund_price(price: FundPrice, request: Request):
     
     # 如果不存在，则创建新记录
     result = await price_collection.insert_one(price.dict())
+    await refresh_fund_stats(request.app.mongodb, [price.fund_code])
+    await refresh_price_rollups(request.app.mongodb, [price.fund_code], {price.fund_code: price.date})
+    request.app.response_cache.invalidate(f"prices:{price.fund_code}")
+    request.app.events.publish(price_event(price.fund_code, price.date, price.price, price.daily_change))
     
     created_price = await price_collection.find_one({"_id": result.inserted_id})
     created_price["_id"] = str(created_price["_id"])
     
-    return created_price
\ No newline at end of file
+    return created_price
+
+# 批量导入基金价格：JSON 数组，或 Content-Type 为 application/x-ndjson 的流式请求体
+@router.post("/prices/bulk", response_model=BulkPriceResult)
+async def add_fund_prices_bulk(request: Request):
+    ingestor = PriceIngestor(get_fund_collection(request), get_price_collection(request))
+    
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows = iter_ndjson(request)
+    else:
+        rows = iter_json_array(request)
+    
+    try:
+        result = await ingestor.ingest(rows)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {str(e)}")
+    finally:
+        # 请求体中途出错时已写入的批次也要更新统计
+        written_codes = list(ingestor.latest_prices)
+        await refresh_fund_stats(request.app.mongodb, written_codes)
+        await refresh_price_rollups(request.app.mongodb, written_codes, ingestor.earliest_dates)
+        request.app.response_cache.invalidate(*(f"prices:{code}" for code in written_codes))
+        # 每只基金只推送本次导入中最新的一条净值
+        for price in ingestor.latest_prices.values():
+            request.app.events.publish(price_event(price.fund_code, price.date, price.price, price.daily_change))
+    
+    return result
\ No newline at end of file
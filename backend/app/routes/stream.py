@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Query
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+
+from app.services.fast_json import dumps
+
+router = APIRouter()
+
+# 无事件时发送心跳注释的间隔(秒)，防止代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+
+async def event_stream(request: Request, subscription):
+    hub = request.app.event_hub
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": heartbeat\n\n"
+                continue
+            yield b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+# 订阅基金变更事件（SSE），codes 为空时订阅全部基金
+@router.get("/funds")
+async def stream_fund_events(
+    request: Request,
+    codes: Optional[str] = Query(None, description="逗号分隔的基金代码")
+):
+    fund_codes = [code.strip() for code in codes.split(",") if code.strip()] if codes else []
+    subscription = request.app.event_hub.subscribe(fund_codes)
+    return StreamingResponse(
+        event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,248 @@
+"""基金指标计算
+
+基于 fund_prices 中的净值序列，用 NumPy 一次性计算多区间收益率、年化波动率、
+最大回撤、夏普比率和相对基准的跟踪误差。结果按 (基金代码, 最新净值日期, 参数) 缓存，
+净值未更新前重复访问不再读取和计算。
+
+多基金对比把各基金净值按日期对齐为矩阵，缺失日期用前值填充，再计算日收益率相关系数。
+"""
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pymongo
+
+TRADING_DAYS_PER_YEAR = 252
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.02"))  # 年化无风险利率
+
+# 收益率区间（自然日）
+RETURN_WINDOWS = {
+    "1w": 7,
+    "1m": 30,
+    "3m": 90,
+    "6m": 180,
+    "1y": 365,
+    "3y": 365 * 3,
+}
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def get(self, key):
+        if key not in self.data:
+            return None
+        self.data.move_to_end(key)
+        return self.data[key]
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+_cache = LRUCache(int(os.getenv("ANALYTICS_CACHE_SIZE", "1024")))
+
+def to_series(rows: List[dict]):
+    """转为日期和净值数组；非正的净值是异常数据，计算收益时会得到 inf，直接跳过"""
+    rows = [row for row in rows if row["price"] > 0]
+    dates = np.array([row["date"] for row in rows], dtype="datetime64[D]")
+    prices = np.array([row["price"] for row in rows], dtype=float)
+    return dates, prices
+
+def window_returns(dates: np.ndarray, prices: np.ndarray) -> Dict[str, Optional[float]]:
+    """各区间收益率(%)，起点为区间开始后的第一个净值；历史不足的区间为 None"""
+    cutoffs = dates[-1] - np.array(list(RETURN_WINDOWS.values()), dtype="timedelta64[D]")
+    starts = np.searchsorted(dates, cutoffs, side="right")
+    covered = dates[0] <= cutoffs
+    values = (prices[-1] / prices[np.minimum(starts, len(prices) - 1)] - 1) * 100
+
+    returns = {name: (float(value) if ok else None) for name, value, ok in zip(RETURN_WINDOWS, values, covered)}
+    returns["inception"] = float((prices[-1] / prices[0] - 1) * 100)
+    return returns
+
+def benchmark_returns(dates: np.ndarray, peers: List[tuple]) -> np.ndarray:
+    """把各基准序列的日收益按日期对齐到 dates[1:]，取等权平均；无数据的日期为 NaN"""
+    total = np.zeros(len(dates) - 1)
+    count = np.zeros(len(dates) - 1)
+    for peer_dates, peer_prices in peers:
+        if len(peer_prices) < 2:
+            continue
+        peer_returns = peer_prices[1:] / peer_prices[:-1] - 1
+        positions = np.searchsorted(dates[1:], peer_dates[1:])
+        matched = (positions < len(dates) - 1)
+        matched[matched] = dates[1:][positions[matched]] == peer_dates[1:][matched]
+        np.add.at(total, positions[matched], peer_returns[matched])
+        np.add.at(count, positions[matched], 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+def compute_analytics(dates: np.ndarray, prices: np.ndarray, days: int, peers: Optional[List[tuple]] = None) -> dict:
+    result = {
+        "returns": window_returns(dates, prices),
+        "volatility": None,
+        "max_drawdown": None,
+        "sharpe_ratio": None,
+        "tracking_error": None,
+        "observations": 0,
+    }
+
+    # 风险指标只用最近 days 天的数据
+    start = np.searchsorted(dates, dates[-1] - np.timedelta64(days, "D"), side="left")
+    dates, prices = dates[start:], prices[start:]
+    result["observations"] = int(len(prices))
+    if len(prices) < 2:
+        return result
+
+    daily_returns = prices[1:] / prices[:-1] - 1
+    drawdowns = prices / np.maximum.accumulate(prices) - 1
+    result["max_drawdown"] = float(drawdowns.min() * 100)
+
+    if len(daily_returns) >= 2:
+        volatility = daily_returns.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        result["volatility"] = float(volatility * 100)
+        if volatility > 0:
+            annual_return = daily_returns.mean() * TRADING_DAYS_PER_YEAR
+            result["sharpe_ratio"] = float((annual_return - RISK_FREE_RATE) / volatility)
+
+    if peers:
+        active = daily_returns - benchmark_returns(dates, peers)
+        active = active[~np.isnan(active)]
+        if len(active) >= 2:
+            result["tracking_error"] = float(active.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) * 100)
+
+    return result
+
+async def get_fund_analytics(fund_collection, price_collection, fund_code: str, days: int,
+                             benchmark: Optional[str] = None) -> Optional[dict]:
+    """返回基金指标，无净值数据时返回 None。
+
+    跟踪误差的基准为 benchmark 指定的基金；未指定时为跟踪同一指数的其他基金的等权平均。
+    """
+    latest = await price_collection.find_one(
+        {"fund_code": fund_code}, {"date": 1}, sort=[("date", pymongo.DESCENDING)]
+    )
+    if latest is None:
+        return None
+
+    key = (fund_code, latest["date"], days, benchmark)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = await price_collection.find(
+        {"fund_code": fund_code}, {"_id": 0, "date": 1, "price": 1}
+    ).sort("date", pymongo.ASCENDING).to_list(length=None)
+    dates, prices = to_series(rows)
+    if len(prices) == 0:
+        return None
+
+    # 基准序列：一次 $in 查询取回所有基准基金在风险区间内的净值
+    if benchmark:
+        benchmark_codes = [benchmark]
+        benchmark_name = benchmark
+    else:
+        fund = await fund_collection.find_one({"code": fund_code}, {"tracking_index": 1})
+        tracking_index = fund.get("tracking_index") if fund else None
+        benchmark_codes = []
+        if tracking_index:
+            benchmark_codes = [
+                peer["code"] async for peer in fund_collection.find(
+                    {"tracking_index": tracking_index, "code": {"$ne": fund_code}}, {"code": 1}
+                )
+            ]
+        benchmark_name = f"{tracking_index} 同类基金均值" if benchmark_codes else None
+
+    peers = []
+    if benchmark_codes:
+        since = latest["date"] - timedelta(days=days + 7)
+        peer_rows = await price_collection.find(
+            {"fund_code": {"$in": benchmark_codes}, "date": {"$gte": since}},
+            {"_id": 0, "fund_code": 1, "date": 1, "price": 1}
+        ).sort([("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)]).to_list(length=None)
+
+        grouped = {}
+        for row in peer_rows:
+            grouped.setdefault(row["fund_code"], []).append(row)
+        peers = [to_series(series) for series in grouped.values()]
+
+    analytics = compute_analytics(dates, prices, days, peers)
+    analytics.update({
+        "code": fund_code,
+        "as_of": latest["date"],
+        "days": days,
+        "benchmark": benchmark_name if peers else None,
+    })
+
+    _cache.set(key, analytics)
+    return analytics
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """按列用前值填充缺失(NaN)，序列开始前的缺失保持 NaN"""
+    present = ~np.isnan(matrix)
+    index = np.where(present, np.arange(matrix.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = matrix[index, np.arange(matrix.shape[1])]
+    filled[~np.maximum.accumulate(present, axis=0)] = np.nan
+    return filled
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """逐对使用双方都有数据的日期计算相关系数"""
+    mask = (~np.isnan(returns)).astype(float)
+    values = np.where(mask > 0, returns, 0.0)
+
+    count = mask.T @ mask
+    sum_x = values.T @ mask  # sum_x[i, j]: 在 j 也有数据的日期上 i 的收益之和
+    sum_xx = (values ** 2).T @ mask
+    sum_xy = values.T @ values
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / count
+        var_x = sum_xx - sum_x ** 2 / count
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[count < 3] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+def price_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """净值之比，分母非正（异常净值）时为 NaN，避免 inf 无法序列化为 JSON"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+def nan_to_none(matrix: np.ndarray) -> list:
+    return np.where(np.isnan(matrix), None, matrix).tolist()
+
+async def compare_funds(price_collection, codes: List[str], start_date, end_date) -> dict:
+    """一次 $in 查询取回所有基金净值，按日期对齐为矩阵并计算收益率相关系数"""
+    rows = await price_collection.find(
+        {"fund_code": {"$in": codes}, "date": {"$gte": start_date, "$lte": end_date}},
+        {"_id": 0, "fund_code": 1, "date": 1, "price": 1}
+    ).sort([("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)]).to_list(length=None)
+
+    column = {code: i for i, code in enumerate(codes)}
+    row_dates = np.array([row["date"] for row in rows], dtype="datetime64[D]")
+    dates = np.unique(row_dates)
+
+    prices = np.full((len(dates), len(codes)), np.nan)
+    if rows:
+        prices[
+            np.searchsorted(dates, row_dates),
+            np.array([column[row["fund_code"]] for row in rows])
+        ] = [row["price"] for row in rows]
+    prices = forward_fill(prices)
+
+    if len(dates) > 1:
+        returns = (price_ratio(prices[1:], prices[:-1]) - 1) * 100
+    else:
+        returns = np.empty((0, len(codes)))
+
+    return {
+        "codes": codes,
+        "dates": dates.astype("datetime64[ms]").astype(object).tolist(),
+        "prices": nan_to_none(prices),
+        "returns": nan_to_none(returns),
+        "correlation": nan_to_none(correlation_matrix(returns)),
+    }
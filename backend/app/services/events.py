@@ -0,0 +1,150 @@
+"""基金变更事件
+
+爬虫和写接口把净值、基金详情的变更作为紧凑的 JSON 事件发布到 RabbitMQ 的 topic 交换机
+（路由键 price.<基金代码> / details.<基金代码> / delete.<基金代码>）；后端消费后由 EventHub 按基金分发给
+SSE 订阅者，并失效各 worker 的响应缓存和搜索索引。未配置 RabbitMQ 时使用进程内的 InMemoryBroker，发布即分发，便于本地测试。
+
+pika 为阻塞式客户端，发布和消费各在独立线程中运行，通过线程安全的队列和
+loop.call_soon_threadsafe 与事件循环交互。事件格式和发布线程在 fund_common.events 中，与爬虫共用。
+"""
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from fund_common.events import (
+    EVENT_EXCHANGE, RECONNECT_DELAY, RabbitMQPublisher, rabbitmq_parameters
+)
+
+from app.services.fast_json import dumps
+
+logger = logging.getLogger("fund-tracker.events")
+
+# 每个订阅者缓冲的事件数，客户端过慢时丢弃最旧的事件
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class InMemoryBroker:
+    """进程内的消息代理，发布的事件直接交给订阅的处理函数"""
+
+    def __init__(self):
+        self.handlers = []
+
+    def subscribe(self, handler: Callable[[dict], None]):
+        self.handlers.append(handler)
+
+    def publish(self, event: dict):
+        # 与 RabbitMQ 一致，订阅者收到的是 JSON 解码后的事件
+        decoded = json.loads(dumps(event))
+        for handler in self.handlers:
+            handler(decoded)
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+class RabbitMQBroker(RabbitMQPublisher):
+    """在发布线程之外增加消费线程，把交换机的全部事件交给订阅的处理函数"""
+
+    def __init__(self, parameters, exchange: str = EVENT_EXCHANGE):
+        super().__init__(parameters, exchange)
+        self.handlers = []
+        self.loop = None
+        self.consumer_connection = None
+
+    def subscribe(self, handler: Callable[[dict], None]):
+        self.handlers.append(handler)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        super().start()
+        if self.handlers:
+            self._start_thread(self._consume_forever)
+
+    def close(self):
+        self.stopping.set()
+        connection = self.consumer_connection
+        if connection is not None:
+            try:
+                connection.add_callback_threadsafe(connection.close)
+            except Exception:
+                pass
+        super().close()
+
+    def _consume_forever(self):
+        def on_message(channel, method, properties, body):
+            try:
+                event = json.loads(body)
+            except ValueError:
+                logger.warning(f"Dropping malformed event on {method.routing_key}")
+                return
+            for handler in self.handlers:
+                self.loop.call_soon_threadsafe(handler, event)
+
+        while not self.stopping.is_set():
+            try:
+                connection, channel = self._connect()
+                self.consumer_connection = connection
+                # 每个进程一个独占的临时队列，断开后自动删除
+                result = channel.queue_declare(queue="", exclusive=True, auto_delete=True)
+                channel.queue_bind(result.method.queue, self.exchange, routing_key="#")
+                channel.basic_consume(result.method.queue, on_message, auto_ack=True)
+                channel.start_consuming()
+            except Exception as e:
+                if self.stopping.is_set():
+                    break
+                logger.error(f"Error consuming events: {str(e)}")
+                self.stopping.wait(RECONNECT_DELAY)
+            finally:
+                self.consumer_connection = None
+
+class Subscription:
+    def __init__(self, codes: Set[str]):
+        self.codes = codes  # 为空表示订阅全部基金
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+class EventHub:
+    """按基金代码把事件分发给订阅者，在事件循环线程中调用"""
+
+    def __init__(self):
+        self.by_code: Dict[str, Set[Subscription]] = {}
+        self.all: Set[Subscription] = set()
+
+    def subscribe(self, codes: Iterable[str] = ()) -> Subscription:
+        subscription = Subscription(set(codes))
+        if subscription.codes:
+            for code in subscription.codes:
+                self.by_code.setdefault(code, set()).add(subscription)
+        else:
+            self.all.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.all.discard(subscription)
+        for code in subscription.codes:
+            subscribers = self.by_code.get(code)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.by_code[code]
+
+    def publish(self, event: dict):
+        for subscription in self.by_code.get(event.get("code"), ()):
+            subscription.put(event)
+        for subscription in self.all:
+            subscription.put(event)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.all) + len({s for subscribers in self.by_code.values() for s in subscribers})
+
+def create_broker(host: Optional[str], user: str, password: str):
+    if host:
+        return RabbitMQBroker(rabbitmq_parameters(host, user, password))
+    return InMemoryBroker()
@@ -0,0 +1,122 @@
+"""数据导出
+
+从 Mongo 游标按批读取文档，逐批编码为 NDJSON、CSV 或 Arrow IPC 流，
+内存占用只与批大小有关，与导出的总量无关。
+Arrow 格式需要安装 pyarrow，可用 pyarrow.ipc.open_stream 或 pandas 读取。
+"""
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+
+from app.services.fast_json import dumps
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+EXPORT_BATCH_SIZE = 5000
+
+# 导出的列及类型
+FUND_COLUMNS = {
+    "code": "string",
+    "name": "string",
+    "type": "string",
+    "tracking_index": "string",
+    "fund_size": "float",
+    "company": "string",
+    "manager": "string",
+    "experience_years": "float",
+    "tracking_error": "float",
+    "rating": "int",
+    "expense_ratio": "float",
+    "establishment_date": "datetime",
+    "description": "string",
+    "created_at": "datetime",
+    "updated_at": "datetime",
+}
+PRICE_COLUMNS = {
+    "fund_code": "string",
+    "date": "datetime",
+    "price": "float",
+    "daily_change": "float",
+}
+
+# 格式 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+async def iter_batches(cursor, size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    batch = []
+    async for document in cursor.batch_size(size):
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def ndjson_stream(batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(dumps(document) + b"\n" for document in batch)
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def csv_stream(batches: AsyncIterator[List[dict]], columns: Dict[str, str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        for document in batch:
+            writer.writerow([_csv_value(document.get(column)) for column in columns])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # 没有数据时只有表头
+        yield buffer.getvalue().encode("utf-8")
+
+def arrow_schema(columns: Dict[str, str]):
+    types = {
+        "string": pa.string(),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "datetime": pa.timestamp("ms"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+async def arrow_stream(batches: AsyncIterator[List[dict]], columns: Dict[str, str]) -> AsyncIterator[bytes]:
+    """每批写为一个 RecordBatch，写完即取出缓冲区内容"""
+    schema = arrow_schema(columns)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()  # schema
+    async for batch in batches:
+        writer.write_batch(pa.RecordBatch.from_pydict(
+            {column: [document.get(column) for document in batch] for column in columns}, schema=schema
+        ))
+        yield drain()
+    writer.close()
+    yield drain()
+
+def encode_stream(format: str, batches: AsyncIterator[List[dict]], columns: Dict[str, str]) -> AsyncIterator[bytes]:
+    if format == "csv":
+        return csv_stream(batches, columns)
+    if format == "arrow":
+        return arrow_stream(batches, columns)
+    return ndjson_stream(batches)
@@ -0,0 +1,129 @@
+"""查询计划检查
+
+`python -m app.services.indexes --check` 先创建索引（fund_common.indexes），
+再对 routes/funds.py 中的每种查询执行 explain()，若有查询退化为全表扫描（COLLSCAN）则以非零状态退出。
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import List
+
+import pymongo
+
+from fund_common.indexes import ensure_indexes
+
+logger = logging.getLogger("fund-tracker.indexes")
+
+def _winning_plans(explain):
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from _winning_plans(item)
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+def query_shapes(fund_code: str = "000000") -> List[dict]:
+    """routes/funds.py 中的查询形态，修改路由查询时需同步更新"""
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+    return [
+        {"name": "get_funds", "collection": "funds",
+         "find": {}, "sort": [("code", pymongo.ASCENDING)]},
+        {"name": "get_funds_cursor", "collection": "funds",
+         "find": {"code": {"$gt": fund_code}}, "sort": [("code", pymongo.ASCENDING)]},
+        {"name": "get_funds_search", "collection": "funds",
+         "find": {"code": {"$in": [fund_code]}}},
+        {"name": "get_fund_by_code", "collection": "funds",
+         "find": {"code": fund_code}},
+        {"name": "get_fund_analytics_peers", "collection": "funds",
+         "find": {"tracking_index": "沪深300", "code": {"$ne": fund_code}}},
+        {"name": "get_fund_prices", "collection": "fund_prices",
+         "find": {"fund_code": fund_code, "date": {"$gte": start_date, "$lte": end_date}},
+         "sort": [("date", pymongo.ASCENDING)]},
+        {"name": "get_fund_prices_cursor", "collection": "fund_prices",
+         "find": {"fund_code": fund_code, "date": {"$gt": start_date}},
+         "sort": [("date", pymongo.ASCENDING)]},
+        {"name": "get_fund_prices_rollup", "collection": "fund_price_rollups",
+         "find": {"fund_code": fund_code, "resolution": "week", "date": {"$gte": start_date, "$lte": end_date}},
+         "sort": [("date", pymongo.ASCENDING)]},
+        {"name": "get_fund_estimate", "collection": "fund_estimates",
+         "find": {"code": fund_code}},
+        {"name": "compare_funds", "collection": "fund_prices",
+         "find": {"fund_code": {"$in": [fund_code]}, "date": {"$gte": start_date, "$lte": end_date}},
+         "sort": [("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)]},
+        {"name": "screen_funds", "collection": "fund_stats",
+         "find": {"tracking_index": "沪深300", "return_1y": {"$ne": None}},
+         "sort": [("return_1y", pymongo.DESCENDING), ("code", pymongo.DESCENDING)]},
+        {"name": "response_cache_sync", "collection": "fund_stats",
+         "find": {"updated_at": {"$gte": start_date}}},
+        {"name": "add_fund_price", "collection": "fund_prices",
+         "find": {"fund_code": fund_code, "date": end_date}},
+        {"name": "get_funds_summary", "collection": "fund_prices",
+         "aggregate": [
+             {"$match": {"fund_code": {"$in": [fund_code]}, "date": {"$gte": start_date, "$lte": end_date}}},
+             {"$sort": {"fund_code": 1, "date": 1}},
+         ]},
+    ]
+
+async def explain_shape(db, shape) -> dict:
+    if "aggregate" in shape:
+        command = {"aggregate": shape["collection"], "pipeline": shape["aggregate"], "cursor": {}}
+    else:
+        command = {"find": shape["collection"], "filter": shape["find"]}
+        if shape.get("sort"):
+            command["sort"] = dict(shape["sort"])
+    return await db.command("explain", command, verbosity="queryPlanner")
+
+async def check_query_plans(db) -> List[str]:
+    """返回退化为 COLLSCAN 的查询名称列表"""
+    sample = await db.funds.find_one({}, {"code": 1})
+    fund_code = sample["code"] if sample else "000000"
+
+    failures = []
+    for shape in query_shapes(fund_code):
+        explain = await explain_shape(db, shape)
+        stages = {stage for plan in _winning_plans(explain) for stage in _stages(plan)}
+        if "COLLSCAN" in stages:
+            failures.append(shape["name"])
+            logger.error(f"{shape['name']}: COLLSCAN on {shape['collection']}")
+        else:
+            logger.info(f"{shape['name']}: {', '.join(sorted(stages))}")
+    return failures
+
+async def _main(args) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://mongo:27017"))
+    db = client[os.getenv("DATABASE_NAME", "fund_tracker")]
+    try:
+        await ensure_indexes(db)
+        if args.check:
+            failures = await check_query_plans(db)
+            if failures:
+                logger.error(f"Queries without index: {', '.join(failures)}")
+                return 1
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes for fund tracker")
+    parser.add_argument("--check", action="store_true", help="explain route queries and fail on COLLSCAN")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
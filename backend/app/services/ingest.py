@@ -0,0 +1,127 @@
+"""批量导入基金净值
+
+按批校验并写入：每批只用一次 $in 查询校验未见过的基金代码，
+再用一次无序 bulk_write 完成全部 upsert。
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Set, Tuple
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.models.fund import BulkPriceError, BulkPriceResult, FundPrice
+
+INGEST_BATCH_SIZE = 5000
+# 响应中最多返回的错误明细条数
+MAX_REPORTED_ERRORS = 100
+
+async def iter_json_array(request) -> AsyncIterator[Tuple[int, object]]:
+    rows = json.loads(await request.body())
+    if not isinstance(rows, list):
+        raise ValueError("Request body must be a JSON array")
+    for number, row in enumerate(rows, start=1):
+        yield number, row
+
+async def iter_ndjson(request) -> AsyncIterator[Tuple[int, object]]:
+    """逐行解析流式 NDJSON 请求体，解析失败的行以异常对象返回"""
+    buffer = b""
+    number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, _loads(line)
+    if buffer.strip():
+        yield number + 1, _loads(buffer)
+
+def _loads(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+class PriceIngestor:
+    def __init__(self, fund_collection, price_collection):
+        self.fund_collection = fund_collection
+        self.price_collection = price_collection
+        self.known_codes: Set[str] = set()
+        # 各基金已写入的最新一条净值，用于之后刷新 fund_stats 和发布变更事件
+        self.latest_prices: Dict[str, FundPrice] = {}
+        # 各基金写入的最早日期，降采样文档从该日期所在周期起重算
+        self.earliest_dates: Dict[str, datetime] = {}
+        self.result = BulkPriceResult()
+
+    def reject(self, number: int, detail: str):
+        self.result.rejected += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(BulkPriceError(row=number, detail=detail))
+
+    async def ingest(self, rows: AsyncIterator[Tuple[int, object]]) -> BulkPriceResult:
+        batch = []
+        async for number, row in rows:
+            self.result.received += 1
+            if isinstance(row, Exception):
+                self.reject(number, f"Invalid JSON: {row}")
+                continue
+            if not isinstance(row, dict):
+                self.reject(number, "Row must be a JSON object")
+                continue
+            try:
+                batch.append((number, FundPrice(**row)))
+            except ValidationError as e:
+                self.reject(number, "; ".join(
+                    f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+                ))
+                continue
+
+            if len(batch) >= INGEST_BATCH_SIZE:
+                await self.write_batch(batch)
+                batch = []
+
+        if batch:
+            await self.write_batch(batch)
+        return self.result
+
+    async def write_batch(self, batch):
+        # 一次查询校验本批中尚未确认的基金代码
+        unknown = {price.fund_code for _, price in batch} - self.known_codes
+        if unknown:
+            async for fund in self.fund_collection.find({"code": {"$in": list(unknown)}}, {"code": 1}):
+                self.known_codes.add(fund["code"])
+
+        # 同一基金同一日期以最后一行为准
+        operations = {}
+        for number, price in batch:
+            if price.fund_code not in self.known_codes:
+                self.reject(number, f"Fund with code {price.fund_code} not found")
+                continue
+            self.result.accepted += 1
+            operations[(price.fund_code, price.date)] = UpdateOne(
+                {"fund_code": price.fund_code, "date": price.date},
+                {"$set": {"price": price.price, "daily_change": price.daily_change}},
+                upsert=True
+            )
+
+        if not operations:
+            return
+
+        for number, price in batch:
+            latest = self.latest_prices.get(price.fund_code)
+            if price.fund_code in self.known_codes and (latest is None or price.date >= latest.date):
+                self.latest_prices[price.fund_code] = price
+            earliest = self.earliest_dates.get(price.fund_code)
+            if price.fund_code in self.known_codes and (earliest is None or price.date < earliest):
+                self.earliest_dates[price.fund_code] = price.date
+        try:
+            result = await self.price_collection.bulk_write(list(operations.values()), ordered=False)
+            self.result.upserted += result.upserted_count
+            self.result.modified += result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            self.result.upserted += details.get("nUpserted", 0)
+            self.result.modified += details.get("nModified", 0)
+            self.result.failed += len(details.get("writeErrors", []))
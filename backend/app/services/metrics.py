@@ -0,0 +1,137 @@
+"""Prometheus 指标
+
+- MetricsMiddleware: 按路由模板统计请求耗时直方图和进行中的请求数（含响应缓存命中和 SSE 连接）
+- MongoCommandMetrics: pymongo 命令监听器，按命令和集合统计 Mongo 操作耗时和失败数
+- ProfilerMiddleware: 开启 PROFILING_ENABLED 后，请求带 profile=1 参数时用 pyinstrument
+  采样该请求，返回火焰图 HTML 而不是原响应；未安装 pyinstrument 时不生效
+指标由 GET /metrics 以 Prometheus 文本格式输出；设置 PROMETHEUS_MULTIPROC_DIR 时
+（gunicorn 多 worker 运行），各 worker 的指标写入该目录，输出时汇总。
+"""
+import os
+import time
+from typing import Dict, Tuple
+from urllib.parse import parse_qsl
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from pymongo import monitoring
+from starlette.responses import Response
+from starlette.routing import Match
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being processed", ["method", "route"],
+    multiprocess_mode="livesum",
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ["command", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands", ["command", "collection"]
+)
+
+def route_name(scope) -> str:
+    """请求匹配的路由模板，如 /api/funds/{fund_code}/prices；未匹配时为 unmatched，避免标签基数过高"""
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def metrics_response() -> Response:
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope["method"], route_name(scope)
+        status = 500
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - started_at)
+
+class ProfilerMiddleware:
+    def __init__(self, app, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or Profiler is None or not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        async def discard(message):
+            pass
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+
+        body = profiler.output_html().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+def _profile_requested(scope) -> bool:
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"))
+    return ("profile", "1") in query
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """在驱动线程中调用，只记录命令名和集合，耗时取自 pymongo 事件"""
+
+    def __init__(self):
+        self.pending: Dict[Tuple[int, object], Tuple[str, str]] = {}
+
+    def started(self, event):
+        value = event.command.get(event.command_name)
+        # getMore 的第一个字段是游标 id，集合在 collection 字段中
+        collection = value if isinstance(value, str) else event.command.get("collection", "")
+        self.pending[(event.request_id, event.connection_id)] = (event.command_name, collection)
+
+    def _finish(self, event):
+        return self.pending.pop((event.request_id, event.connection_id), (event.command_name, ""))
+
+    def succeeded(self, event):
+        command, collection = self._finish(event)
+        MONGO_COMMAND_DURATION.labels(command, collection).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        command, collection = self._finish(event)
+        MONGO_COMMAND_DURATION.labels(command, collection).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(command, collection).inc()
@@ -0,0 +1,29 @@
+"""游标分页
+
+游标是对上一页最后一条记录排序键的不透明编码（base64 JSON），
+下一页从该键之后开始查询，翻页代价与页码无关。
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+# 下一页游标通过响应头返回，保持原有列表响应格式不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(position: dict) -> str:
+    data = {k: v.isoformat() if isinstance(v, datetime) else v for k, v in position.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(position, dict):
+            raise ValueError("cursor must encode an object")
+        if "date" in position:
+            position["date"] = datetime.fromisoformat(position["date"])
+        return position
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,225 @@
+"""进程内响应缓存
+
+ResponseCacheMiddleware 缓存被路由标记（cache_response）的 GET 响应的完整响应体，
+键为路径加排序后的查询参数，容量按条数和字节数限制（LRU），并有 TTL。
+每条缓存带若干标签（如 fund:000001、prices:000001），写操作按标签精确失效；
+爬虫的写入通过轮询 fund_stats.updated_at 发现，其他 worker 的写入和删除通过变更事件发现。
+
+响应带 ETag 和 Last-Modified，请求的 If-None-Match 命中时返回 304。
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl
+
+logger = logging.getLogger("fund-tracker.response-cache")
+
+# 轮询 fund_stats 时回看的时间，覆盖 updated_at 早于上次同步、但之后才提交的写入
+SYNC_MARGIN = timedelta(seconds=1)
+
+# 回放缓存时保留的响应头
+REPLAY_HEADERS = {b"content-type", b"x-next-cursor"}
+
+def fund_tags(fund_code: str) -> List[str]:
+    """基金信息或净值变更时需要失效的全部标签"""
+    return ["funds", f"fund:{fund_code}", f"prices:{fund_code}"]
+
+def cache_response(request, *tags: str):
+    """在路由中调用，标记本次响应可缓存及其失效标签"""
+    request.state.cache_tags = tags
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: List[Tuple[bytes, bytes]]
+    etag: str
+    last_modified: str
+    expires_at: float
+    tags: Tuple[str, ...] = field(default_factory=tuple)
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, max_bytes: int = 64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self.tag_keys: Dict[str, Set[tuple]] = {}
+        self.size = 0
+        # 每次失效加一，请求期间发生过失效的响应不写入缓存
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        # 回看范围内已失效过的 (基金代码, updated_at)，再次查到时不重复失效
+        self.synced: Set[Tuple[str, datetime]] = set()
+
+    def get(self, key) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def build(self, body: bytes, headers: List[Tuple[bytes, bytes]], tags: Tuple[str, ...]) -> CachedResponse:
+        return CachedResponse(
+            body=body,
+            headers=headers,
+            etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+            last_modified=formatdate(usegmt=True),
+            expires_at=time.monotonic() + self.ttl,
+            tags=tags,
+        )
+
+    def set(self, key, entry: CachedResponse):
+        if key in self.entries:
+            self._remove(key)
+        if len(entry.body) > self.max_bytes:
+            return
+
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        for tag in entry.tags:
+            self.tag_keys.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.maxsize or self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def invalidate(self, *tags: str):
+        self.version += 1
+        for tag in tags:
+            for key in self.tag_keys.pop(tag, ()):
+                if key in self.entries:
+                    self._remove(key)
+
+    def invalidate_funds(self, fund_codes):
+        for fund_code in fund_codes:
+            self.invalidate(*fund_tags(fund_code))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self.tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tag_keys[tag]
+
+    async def sync(self, stats_collection, since: Optional[datetime]) -> Optional[datetime]:
+        """失效 fund_stats 中上次同步后更新的基金（爬虫写入后会刷新 fund_stats），返回新的同步时间"""
+        if since is None:
+            # 首次只记录当前进度
+            latest = await stats_collection.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)])
+            return latest["updated_at"] if latest else datetime.utcnow()
+
+        seen = set()
+        query = {"updated_at": {"$gte": since - SYNC_MARGIN}}
+        async for stats in stats_collection.find(query, {"code": 1, "updated_at": 1}):
+            mark = (stats["code"], stats["updated_at"])
+            seen.add(mark)
+            if mark in self.synced:
+                continue
+            self.invalidate(*fund_tags(stats["code"]))
+            if stats["updated_at"] > since:
+                since = stats["updated_at"]
+        self.synced = {mark for mark in seen if mark[1] >= since - SYNC_MARGIN}
+        return since
+
+    async def sync_forever(self, stats_collection, interval: int):
+        since = None
+        while True:
+            try:
+                since = await self.sync(stats_collection, since)
+            except Exception as e:
+                logger.error(f"Error syncing response cache: {str(e)}")
+            await asyncio.sleep(interval)
+
+def cache_key(scope) -> tuple:
+    query = sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=False))
+    return scope["path"], tuple(query)
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+class ResponseCacheMiddleware:
+    """纯 ASGI 中间件：命中时直接返回缓存的响应体，不进入路由"""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope)
+        if_none_match = _header(scope, b"if-none-match")
+        entry = self.cache.get(key)
+        if entry is not None:
+            await self._send_entry(send, entry, if_none_match)
+            return
+
+        version = self.cache.version
+        state = scope.setdefault("state", {})
+        start = None
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if message["status"] != 200 or not state.get("cache_tags"):
+                    state["cache_tags"] = None
+                    await send(message)
+                    return
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            # 可缓存的响应先缓冲完整响应体
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            headers = [(k, v) for k, v in start["headers"] if k.lower() in REPLAY_HEADERS]
+            body = b"".join(chunks)
+            entry = self.cache.build(body, headers, tuple(state["cache_tags"]))
+            # 请求期间有写入时响应可能已过期，只返回不缓存
+            if self.cache.version == version:
+                self.cache.set(key, entry)
+            await self._send_entry(send, entry, if_none_match)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_entry(self, send, entry: CachedResponse, if_none_match: Optional[str]):
+        headers = [
+            (b"etag", entry.etag.encode()),
+            (b"last-modified", entry.last_modified.encode()),
+            (b"cache-control", b"no-cache"),
+        ]
+        if _etag_matches(if_none_match, entry.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers += entry.headers
+        headers.append((b"content-length", str(len(entry.body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
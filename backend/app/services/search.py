@@ -0,0 +1,153 @@
+"""基金搜索索引
+
+在进程内维护基金目录的倒排索引（字符 1-gram/2-gram），支持中文名称、基金代码片段、
+跟踪指数、基金公司以及名称拼音首字母的子串匹配，结果按匹配字段和位置排序。
+API 的增删改会直接更新索引，爬虫写入的变更通过 updated_at 增量同步，
+其他 worker 删除的基金通过 delete 事件移除。
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时不支持拼音首字母搜索
+    lazy_pinyin = None
+
+logger = logging.getLogger("fund-tracker.search")
+
+# 索引字段及其排序权重，权重越小越靠前
+SEARCH_FIELDS = {
+    "code": 0,
+    "name": 1,
+    "pinyin": 2,
+    "tracking_index": 3,
+    "company": 4,
+}
+
+SEARCH_PROJECTION = {"code": 1, "name": 1, "tracking_index": 1, "company": 1, "updated_at": 1}
+
+def normalize(text) -> str:
+    return "".join(str(text).lower().split()) if text else ""
+
+def pinyin_initials(text: str) -> str:
+    if not text or lazy_pinyin is None:
+        return ""
+    return normalize("".join(lazy_pinyin(text, style=Style.FIRST_LETTER)))
+
+def ngrams(text: str) -> Set[str]:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+class FundSearchIndex:
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, str]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.synced_at: Optional[datetime] = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, fund: dict):
+        """新增或更新一只基金"""
+        code = fund["code"]
+        self.remove(code)
+
+        document = {
+            "code": normalize(code),
+            "name": normalize(fund.get("name")),
+            "pinyin": pinyin_initials(fund.get("name")),
+            "tracking_index": normalize(fund.get("tracking_index")),
+            "company": normalize(fund.get("company")),
+        }
+        self.documents[code] = document
+
+        for text in document.values():
+            for gram in ngrams(text):
+                self.postings.setdefault(gram, set()).add(code)
+
+    def remove(self, code: str):
+        document = self.documents.pop(code, None)
+        if document is None:
+            return
+
+        for text in document.values():
+            for gram in ngrams(text):
+                codes = self.postings.get(gram)
+                if codes is None:
+                    continue
+                codes.discard(code)
+                if not codes:
+                    del self.postings[gram]
+
+    def apply_event(self, event: dict):
+        """处理变更事件：删除的基金不再有 updated_at 可以同步，只能通过事件移除"""
+        if event.get("type") == "delete":
+            self.remove(event["code"])
+
+    def _candidates(self, query: str) -> Set[str]:
+        grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+        posting_lists = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        if not posting_lists or not posting_lists[0]:
+            return set()
+        return posting_lists[0].intersection(*posting_lists[1:])
+
+    def _score(self, document: Dict[str, str], query: str):
+        best = None
+        for field, weight in SEARCH_FIELDS.items():
+            text = document[field]
+            position = text.find(query)
+            if position < 0:
+                continue
+            # 完全匹配 > 前缀匹配 > 子串匹配，其次比较字段权重和文本长度
+            score = (0 if text == query else 1 if position == 0 else 2, weight, position, len(text))
+            if best is None or score < best:
+                best = score
+        return best
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """返回按相关度排序的基金代码"""
+        query = normalize(query)
+        if not query:
+            return []
+
+        scored = []
+        for code in self._candidates(query):
+            score = self._score(self.documents[code], query)
+            if score is not None:
+                scored.append((score, code))
+
+        scored = heapq.nsmallest(limit, scored) if limit is not None else sorted(scored)
+        return [code for _, code in scored]
+
+    async def load(self, collection):
+        """从数据库全量构建索引"""
+        self.documents.clear()
+        self.postings.clear()
+        self.synced_at = None
+        await self.sync(collection)
+        logger.info(f"Search index built with {len(self)} funds")
+
+    async def sync(self, collection):
+        """增量同步 updated_at 晚于上次同步时间的基金（例如爬虫写入的变更）"""
+        query = {}
+        if self.synced_at is not None:
+            # 留出余量，避免遗漏与上次同步时间相同的写入
+            query = {"updated_at": {"$gte": self.synced_at - timedelta(seconds=1)}}
+
+        async for fund in collection.find(query, SEARCH_PROJECTION):
+            self.add(fund)
+            updated_at = fund.get("updated_at")
+            if updated_at and (self.synced_at is None or updated_at > self.synced_at):
+                self.synced_at = updated_at
+
+    async def sync_forever(self, collection, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(collection)
+            except Exception as e:
+                logger.error(f"Error syncing search index: {str(e)}")
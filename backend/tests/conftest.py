@@ -0,0 +1,94 @@
+"""测试用的应用和数据库
+
+FastAPI 0.68 的 TestClient 不执行 lifespan，这里按 app/main.py 的方式装配一个新的应用：
+内存版 Mongo（mongomock-motor）、进程内事件代理、响应缓存和搜索索引。
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from app.routes import export, funds
+from app.services.events import EventHub, InMemoryBroker
+from app.services.response_cache import ResponseCache, ResponseCacheMiddleware, fund_tags
+from app.services.search import FundSearchIndex
+
+@pytest.fixture
+def loop():
+    # TestClient 与测试代码共用同一个事件循环
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+    asyncio.set_event_loop(None)
+
+@pytest.fixture
+def run(loop):
+    return loop.run_until_complete
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["fund_tracker_test"]
+
+@pytest.fixture
+def app(db, loop):
+    app = FastAPI()
+    app.mongodb = db
+    app.mongodb_read = db
+    app.response_cache = ResponseCache()
+    app.add_middleware(ResponseCacheMiddleware, cache=app.response_cache)
+    app.fund_search = FundSearchIndex()
+    app.event_hub = EventHub()
+    app.events = InMemoryBroker()
+    app.events.subscribe(app.event_hub.publish)
+    app.events.subscribe(lambda event: app.response_cache.invalidate(*fund_tags(event["code"])))
+    app.events.subscribe(app.fund_search.apply_event)
+    app.include_router(funds.router, prefix="/api/funds")
+    app.include_router(export.router, prefix="/api/export")
+    return app
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+def fund_document(code: str, **fields) -> dict:
+    now = datetime(2026, 1, 5)
+    document = {
+        "code": code,
+        "name": f"沪深300指数{code}",
+        "type": "指数基金",
+        "tracking_index": "沪深300",
+        "fund_size": 10.0,
+        "company": "华夏基金",
+        "manager": "张三",
+        "experience_years": 3.0,
+        "tracking_error": 0.5,
+        "rating": 3,
+        "expense_ratio": 0.5,
+        "establishment_date": datetime(2020, 1, 1),
+        "created_at": now,
+        "updated_at": now,
+    }
+    document.update(fields)
+    return document
+
+def price_documents(code: str, end: datetime, days: int) -> list:
+    return [
+        {"fund_code": code, "date": end - timedelta(days=days - 1 - i), "price": 1.0 + 0.01 * i, "daily_change": 1.0}
+        for i in range(days)
+    ]
+
+@pytest.fixture
+def seed(app, db, run):
+    """写入 count 只基金和每只 days 天的净值，并加载搜索索引"""
+    def seed(count: int = 5, days: int = 30, end: datetime = datetime(2026, 1, 5)):
+        codes = [f"{i:06d}" for i in range(1, count + 1)]
+        run(db.funds.insert_many([fund_document(code) for code in codes]))
+        for code in codes:
+            run(db.fund_prices.insert_many(price_documents(code, end, days)))
+        run(app.fund_search.load(db.funds))
+        return codes
+    return seed
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services import analytics
+from app.services.analytics import compute_analytics, window_returns
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # 缓存按 (基金代码, 最新净值日期) 区分，各测试的数据库不同
+    analytics._cache.data.clear()
+
+def series(prices, start=datetime(2026, 1, 1)):
+    dates = np.array([start + timedelta(days=i) for i in range(len(prices))], dtype="datetime64[D]")
+    return dates, np.array(prices, dtype=float)
+
+def test_window_returns_start_after_cutoff():
+    dates, prices = series([1.0 + 0.1 * i for i in range(10)])
+    returns = window_returns(dates, prices)
+    assert returns["1w"] == pytest.approx((1.9 / 1.3 - 1) * 100)
+    assert returns["1m"] is None
+    assert returns["inception"] == pytest.approx(90.0)
+
+def test_volatility_drawdown_and_sharpe():
+    prices = [1.0, 2.0, 1.0, 1.5]
+    result = compute_analytics(*series(prices), days=365)
+    daily = np.array([1.0, -0.5, 0.5])
+    assert result["observations"] == 4
+    assert result["max_drawdown"] == pytest.approx(-50.0)
+    assert result["volatility"] == pytest.approx(daily.std(ddof=1) * np.sqrt(252) * 100)
+    assert result["sharpe_ratio"] is not None
+    assert result["tracking_error"] is None
+
+def test_tracking_error_against_peers():
+    dates, prices = series([1.0, 1.1, 1.0, 1.2, 1.1])
+    assert compute_analytics(dates, prices, 365, [(dates, prices)])["tracking_error"] == pytest.approx(0.0)
+
+    # 基准只有部分日期有数据时只比较重叠的日期
+    peer = (dates[:4], np.array([1.0, 1.0, 1.0, 1.0]))
+    active = np.array([0.1, -1 / 11, 0.2])
+    result = compute_analytics(dates, prices, 365, [peer])
+    assert result["tracking_error"] == pytest.approx(active.std(ddof=1) * np.sqrt(252) * 100)
+
+def test_analytics_route_uses_peers_tracking_same_index(client, seed):
+    seed(count=3, days=60)
+    response = client.get("/api/funds/000001/analytics", params={"days": 30})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["benchmark"] == "沪深300 同类基金均值"
+    assert result["tracking_error"] == pytest.approx(0.0)
+    assert result["returns"]["1m"] == pytest.approx((1.59 / 1.30 - 1) * 100)
+    assert client.get("/api/funds/999999/analytics").status_code == 404
+
+def test_analytics_skips_zero_prices(client, seed, db, run):
+    seed(count=1, days=30)
+    run(db.fund_prices.update_one({"fund_code": "000001", "date": datetime(2025, 12, 20)}, {"$set": {"price": 0.0}}))
+    response = client.get("/api/funds/000001/analytics", params={"days": 30})
+    assert response.status_code == 200
+    assert response.json()["max_drawdown"] == pytest.approx(0.0)
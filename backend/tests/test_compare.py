@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.analytics import correlation_matrix, forward_fill
+from tests.conftest import fund_document, price_documents
+
+def test_forward_fill_keeps_leading_gaps():
+    matrix = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan], [3.0, 4.0]])
+    filled = forward_fill(matrix)
+    assert np.isnan(filled[0, 0])
+    assert filled[1:, 0].tolist() == [2.0, 2.0, 3.0]
+    assert filled[:, 1].tolist() == [1.0, 1.0, 1.0, 4.0]
+
+def test_correlation_uses_common_dates():
+    returns = np.array([[1.0, 2.0, -1.0], [2.0, 4.0, -2.0], [-1.0, -2.0, 1.0], [3.0, np.nan, -3.0]])
+    corr = correlation_matrix(returns)
+    assert corr[0, 1] == pytest.approx(1.0)
+    assert corr[0, 2] == pytest.approx(-1.0)
+    assert np.diag(corr) == pytest.approx([1.0, 1.0, 1.0])
+
+def test_compare_route_aligns_dates(client, db, run):
+    end = datetime(2026, 1, 5)
+    run(db.funds.insert_many([fund_document("000001"), fund_document("000002")]))
+    run(db.fund_prices.insert_many(price_documents("000001", end, 5)))
+    # 000002 缺少 1 月 3 日的净值，用前值填充
+    run(db.fund_prices.insert_many([
+        price for price in price_documents("000002", end, 5) if price["date"] != datetime(2026, 1, 3)
+    ]))
+    response = client.get("/api/funds/compare", params={"codes": "000001,000002,999999", "days": 10, "end_date": end.isoformat()})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["codes"] == ["000001", "000002", "999999"]
+    assert len(result["dates"]) == 5
+    assert [row[1] for row in result["prices"]] == [1.0, 1.01, 1.01, 1.03, 1.04]
+    # 未知基金为全空的列
+    assert all(row[2] is None for row in result["prices"] + result["returns"])
+    assert result["correlation"][2] == [None, None, None]
+    assert result["correlation"][0][0] == pytest.approx(1.0)
+
+def test_compare_with_zero_price_is_serializable(client, db, run):
+    end = datetime(2026, 1, 5)
+    prices = price_documents("000001", end, 4)
+    prices[1]["price"] = 0.0
+    run(db.fund_prices.insert_many(prices))
+    response = client.get("/api/funds/compare", params={"codes": "000001", "days": 10, "end_date": end.isoformat()})
+    assert response.status_code == 200
+    returns = [row[0] for row in response.json()["returns"]]
+    assert returns[0] == pytest.approx(-100.0)
+    assert returns[1] is None
@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from app.routes import stream
+from app.services.events import SUBSCRIBER_QUEUE_SIZE, EventHub
+from tests.conftest import fund_document
+
+def drain(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+def test_subscriptions_filter_by_code(loop):
+    hub = EventHub()
+    one = hub.subscribe(["000001"])
+    both = hub.subscribe(["000001", "000002"])
+    everything = hub.subscribe()
+    for code in ("000001", "000002", "000003"):
+        hub.publish({"type": "price", "code": code})
+
+    assert [event["code"] for event in drain(one)] == ["000001"]
+    assert [event["code"] for event in drain(both)] == ["000001", "000002"]
+    assert [event["code"] for event in drain(everything)] == ["000001", "000002", "000003"]
+    assert hub.subscribers == 3
+
+def test_full_queue_drops_oldest(loop):
+    hub = EventHub()
+    subscription = hub.subscribe(["000001"])
+    for i in range(SUBSCRIBER_QUEUE_SIZE + 5):
+        hub.publish({"type": "price", "code": "000001", "price": i})
+    prices = [event["price"] for event in drain(subscription)]
+    assert prices == list(range(5, SUBSCRIBER_QUEUE_SIZE + 5))
+
+def test_stream_unsubscribes_on_disconnect(run, monkeypatch):
+    monkeypatch.setattr(stream, "HEARTBEAT_INTERVAL", 0.01)
+    hub = EventHub()
+    disconnected = False
+
+    async def is_disconnected():
+        return disconnected
+
+    request = SimpleNamespace(app=SimpleNamespace(event_hub=hub), is_disconnected=is_disconnected)
+    subscription = hub.subscribe(["000001"])
+    frames = stream.event_stream(request, subscription)
+
+    async def client():
+        nonlocal disconnected
+        received = [await frames.__anext__()]
+        hub.publish({"type": "price", "code": "000001", "price": 1.5})
+        received.append(await frames.__anext__())
+        received.append(await frames.__anext__())  # 心跳
+        disconnected = True
+        async for frame in frames:
+            received.append(frame)
+        return received
+
+    received = run(client())
+    assert received == [
+        b"retry: 5000\n\n",
+        b'event: price\ndata: {"type":"price","code":"000001","price":1.5}\n\n',
+        b": heartbeat\n\n",
+    ]
+    assert hub.subscribers == 0
+
+def test_delete_and_details_events_reach_subscribers(client, app, db, run):
+    subscription = app.event_hub.subscribe(["000001"])
+    fund = {key: value for key, value in fund_document("000001").items() if key not in ("created_at", "updated_at")}
+    created = client.post("/api/funds/", json=dict(fund, establishment_date="2020-01-01T00:00:00"))
+    assert created.status_code == 200
+    fund_id = created.json()["_id"]
+    assert client.put(f"/api/funds/{fund_id}", json={"rating": 5}).status_code == 200
+    assert client.delete(f"/api/funds/{fund_id}").status_code == 204
+
+    created_event, updated_event, deleted_event = drain(subscription)
+    assert created_event == {
+        "type": "details", "code": "000001", "name": "沪深300指数000001", "tracking_index": "沪深300",
+        "fund_size": 10.0, "tracking_error": 0.5, "rating": 3, "expense_ratio": 0.5,
+    }
+    assert (updated_event["type"], updated_event["rating"]) == ("details", 5)
+    assert deleted_event == {"type": "delete", "code": "000001"}
+    # 事件经过 JSON 编码，与 RabbitMQ 投递的一致
+    assert json.loads(json.dumps(deleted_event)) == deleted_event
+    assert run(db.funds.find_one({"_id": ObjectId(fund_id)})) is None
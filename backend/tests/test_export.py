@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services import export
+
+def test_ndjson_prices_filtered_by_code_and_date(client, seed):
+    seed(count=2, days=5)
+    response = client.get("/api/export/prices", params={
+        "codes": "000002", "start_date": "2026-01-04T00:00:00", "format": "ndjson",
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="fund_prices.ndjson"'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["fund_code"], row["date"], row["price"]) for row in rows] == [
+        ("000002", "2026-01-04T00:00:00", 1.03), ("000002", "2026-01-05T00:00:00", 1.04),
+    ]
+
+def test_csv_funds(client, seed):
+    codes = seed(count=3, days=1)
+    response = client.get("/api/export/funds", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["code"] for row in rows] == codes
+    assert list(rows[0]) == list(export.FUND_COLUMNS)
+    assert rows[0]["establishment_date"] == "2020-01-01T00:00:00"
+    assert rows[0]["description"] == ""
+
+def test_csv_yields_one_chunk_per_batch(run):
+    async def batches():
+        for batch in ([{"fund_code": "000001", "price": 1.0}], [{"fund_code": "000002", "price": 2.0}]):
+            yield batch
+
+    async def collect():
+        return [chunk async for chunk in export.csv_stream(batches(), export.PRICE_COLUMNS)]
+
+    chunks = run(collect())
+    # 表头随第一批输出，之后每批只含本批的行
+    assert chunks == [b"fund_code,date,price,daily_change\r\n000001,,1.0,\r\n", b"000002,,2.0,\r\n"]
+
+def test_arrow_stream_round_trips(client, seed):
+    pa = pytest.importorskip("pyarrow")
+    seed(count=2, days=3)
+    response = client.get("/api/export/prices", params={"format": "arrow"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.names == list(export.PRICE_COLUMNS)
+    assert table.num_rows == 6
+    assert table.column("date")[0].as_py() == datetime(2026, 1, 3)
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/api/export/funds", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,11 @@
+from fund_common.indexes import INDEXES
+
+from app.services.indexes import query_shapes
+
+def test_every_query_shape_has_a_leading_index_field():
+    for shape in query_shapes():
+        fields = shape["find"] if "find" in shape else shape["aggregate"][0]["$match"]
+        leading = {index["keys"][0][0] for index in INDEXES[shape["collection"]]}
+        # 空条件只按排序字段读取
+        fields = fields or dict(shape["sort"])
+        assert leading & set(fields), shape["name"]
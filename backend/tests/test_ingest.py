@@ -0,0 +1,45 @@
+import json
+from datetime import datetime
+
+from app.models.fund import FundPrice
+
+def test_price_date_is_normalized_to_naive_utc():
+    price = FundPrice(fund_code="000001", date="2026-01-06T00:00:00+08:00", price=1.0, daily_change=0.0)
+    assert price.date == datetime(2026, 1, 5, 16, 0)
+    assert price.date.tzinfo is None
+
+def test_add_price_with_timezone_offset(client, seed, db, run):
+    seed(count=1, days=5, end=datetime(2026, 1, 5))
+    response = client.post("/api/funds/prices", json={
+        "fund_code": "000001", "date": "2026-01-06T00:00:00+08:00", "price": 1.2, "daily_change": 2.0,
+    })
+    assert response.status_code == 200
+    assert run(db.fund_prices.count_documents({"fund_code": "000001", "date": datetime(2026, 1, 5, 16)})) == 1
+    week = run(db.fund_price_rollups.find_one({"fund_code": "000001", "resolution": "week", "date": datetime(2026, 1, 5)}))
+    assert week["price"] == 1.2
+    assert run(db.fund_stats.find_one({"code": "000001"}))["latest_date"] == datetime(2026, 1, 5, 16)
+
+def test_bulk_ingest_with_mixed_offsets(client, seed, db, run):
+    seed(count=1, days=1, end=datetime(2026, 1, 1))
+    rows = [
+        {"fund_code": "000001", "date": "2026-01-05T16:00:00", "price": 1.1, "daily_change": 1.0},
+        # 与上一行是同一时刻，以最后一行为准
+        {"fund_code": "000001", "date": "2026-01-06T00:00:00+08:00", "price": 1.2, "daily_change": 2.0},
+        {"fund_code": "000001", "date": "2026-01-07T00:00:00Z", "price": 1.3, "daily_change": 3.0},
+        {"fund_code": "000001", "date": "2026-01-02T00:00:00", "price": 1.0, "daily_change": 0.0},
+    ]
+    response = client.post(
+        "/api/funds/prices/bulk",
+        data="\n".join(json.dumps(row) for row in rows),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["accepted"], result["upserted"], result["failed"]) == (4, 3, 0)
+
+    prices = run(db.fund_prices.find({"date": {"$gt": datetime(2026, 1, 1)}}, {"_id": 0}).sort("date", 1).to_list(length=None))
+    assert [(price["date"], price["price"]) for price in prices] == [
+        (datetime(2026, 1, 2), 1.0), (datetime(2026, 1, 5, 16), 1.2), (datetime(2026, 1, 7), 1.3),
+    ]
+    stats = run(db.fund_stats.find_one({"code": "000001"}))
+    assert stats["latest_date"] == datetime(2026, 1, 7)
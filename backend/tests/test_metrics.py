@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.metrics import MetricsMiddleware, metrics_response
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_metrics_endpoint_reports_route_templates():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    @app.get("/metrics")
+    async def metrics():
+        return metrics_response()
+
+    client = TestClient(app)
+    assert client.get("/metrics-test/1").status_code == 200
+    assert client.get("/metrics-test/2").status_code == 200
+    assert client.get("/metrics-test-missing").status_code == 404
+
+    text = client.get("/metrics").text
+    # 按路由模板而不是实际路径聚合
+    assert 'http_request_duration_seconds_count{method="GET",route="/metrics-test/{item_id}",status="200"} 2.0' in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'http_requests_in_progress{method="GET",route="/metrics-test/{item_id}"} 0.0' in text
+
+WORKER = """
+from app.services.metrics import REQUEST_LATENCY
+REQUEST_LATENCY.labels("GET", "/api/funds/", "200").observe(0.01)
+"""
+
+READER = """
+from app.services.metrics import metrics_response
+print(metrics_response().body.decode())
+"""
+
+def run_python(code, multiproc_dir):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+    env["PYTHONPATH"] = os.pathsep.join([BACKEND_DIR, os.path.join(BACKEND_DIR, "..", "common")])
+    return subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+
+def test_multiprocess_mode_sums_workers(tmp_path):
+    # 两个 worker 进程各记录一次请求，/metrics 汇总两者
+    run_python(WORKER, tmp_path)
+    run_python(WORKER, tmp_path)
+    text = run_python(READER, tmp_path)
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/funds/",status="200"} 2.0' in text
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    position = {"code": "000001", "date": datetime(2026, 1, 5, 15, 0)}
+    assert decode_cursor(encode_cursor(position)) == position
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90IGpzb24", encode_cursor({"date": "yesterday"})])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def collect_pages(client, url, params):
+    pages = []
+    cursor = None
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+def test_fund_list_cursor_visits_every_fund_once(client, seed):
+    codes = seed(count=7, days=1)
+    pages = collect_pages(client, "/api/funds/", {"limit": 3})
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [fund["code"] for page in pages for fund in page] == codes
+
+def test_search_cursor_continues_by_rank(client, seed):
+    seed(count=5, days=1)
+    first = client.get("/api/funds/", params={"search": "沪深300", "limit": 2})
+    expected = client.get("/api/funds/", params={"search": "沪深300", "limit": 10}).json()
+    pages = collect_pages(client, "/api/funds/", {"search": "沪深300", "limit": 2})
+    assert pages[0] == first.json()
+    assert [fund["code"] for page in pages for fund in page] == [fund["code"] for fund in expected]
+
+def test_price_cursor_pages_through_history(client, seed):
+    seed(count=1, days=25)
+    pages = collect_pages(client, "/api/funds/000001/prices", {"limit": 10})
+    dates = [price["date"] for page in pages for price in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert dates == sorted(set(dates))
+
+def test_price_cursor_without_date_is_rejected(client, seed):
+    seed(count=1, days=3)
+    response = client.get("/api/funds/000001/prices", params={"cursor": encode_cursor({"code": "000001"})})
+    assert response.status_code == 400
+
+def test_rollup_resolution_rejects_cursor(client, seed):
+    seed(count=1, days=3)
+    cursor = encode_cursor({"date": datetime(2026, 1, 1)})
+    response = client.get("/api/funds/000001/prices", params={"cursor": cursor, "resolution": "week"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("position", [{"rank": "x"}, {"rank": -1}, {"rank": 1.5}, {"rank": True}, {"code": "000001"}])
+def test_invalid_search_cursor_is_rejected(client, seed, position):
+    seed(count=3, days=1)
+    response = client.get("/api/funds/", params={"search": "沪深300", "cursor": encode_cursor(position)})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("position", [{"rank": 2}, {"code": 1}])
+def test_invalid_list_cursor_is_rejected(client, seed, position):
+    seed(count=3, days=1)
+    response = client.get("/api/funds/", params={"cursor": encode_cursor(position)})
+    assert response.status_code == 400
@@ -0,0 +1,113 @@
+from datetime import datetime
+
+from app.services.response_cache import ResponseCache, fund_tags
+from app.services.search import FundSearchIndex
+
+def test_repeated_get_is_served_from_cache(app, client, seed):
+    seed(count=2, days=5)
+    first = client.get("/api/funds/")
+    second = client.get("/api/funds/")
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert app.response_cache.hits == 1
+
+def test_if_none_match_returns_304(client, seed):
+    seed(count=2, days=5)
+    etag = client.get("/api/funds/000001/prices").headers["etag"]
+    response = client.get("/api/funds/000001/prices", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_price_write_invalidates_fund_responses(app, client, seed):
+    seed(count=2, days=5)
+    params = {"end_date": "2026-01-06T00:00:00"}
+    before = client.get("/api/funds/000001/prices", params=params).json()
+    client.get("/api/funds/000002/prices", params=params)
+
+    response = client.post("/api/funds/prices", json={
+        "fund_code": "000001", "date": "2026-01-05T12:00:00", "price": 2.0, "daily_change": 1.0,
+    })
+    assert response.status_code == 200
+
+    after = client.get("/api/funds/000001/prices", params=params).json()
+    assert len(before) == 5
+    assert len(after) == 6
+    # 其他基金的缓存不受影响
+    client.get("/api/funds/000002/prices", params=params)
+    assert app.response_cache.hits == 1
+
+def test_lru_eviction_by_count_and_bytes():
+    cache = ResponseCache(maxsize=2, max_bytes=10)
+    for key in ("a", "b", "c"):
+        cache.set(key, cache.build(b"xx", [], ("funds",)))
+    assert list(cache.entries) == ["b", "c"]
+
+    cache.set("d", cache.build(b"x" * 9, [], ("funds",)))
+    assert list(cache.entries) == ["d"]
+    assert cache.size == 9
+
+def test_invalidate_by_tag():
+    cache = ResponseCache()
+    cache.set("list", cache.build(b"[]", [], ("funds",)))
+    cache.set("fund", cache.build(b"{}", [], ("fund:000001",)))
+    version = cache.version
+    cache.invalidate("fund:000001")
+    assert cache.get("fund") is None
+    assert cache.get("list") is not None
+    assert cache.version == version + 1
+
+def test_sync_invalidates_crawler_writes(db, run):
+    cache = ResponseCache()
+    run(db.fund_stats.insert_one({"code": "000001", "updated_at": datetime(2026, 1, 5, 10)}))
+    since = run(cache.sync(db.fund_stats, None))
+    cache.set("fund", cache.build(b"{}", [], ("fund:000001",)))
+
+    run(db.fund_stats.update_one({"code": "000001"}, {"$set": {"updated_at": datetime(2026, 1, 5, 11)}}))
+    since = run(cache.sync(db.fund_stats, since))
+    assert since == datetime(2026, 1, 5, 11)
+    assert cache.get("fund") is None
+
+def test_sync_without_writes_invalidates_nothing(db, run):
+    cache = ResponseCache()
+    run(db.fund_stats.insert_one({"code": "000001", "updated_at": datetime(2026, 1, 5, 10)}))
+    since = run(cache.sync(db.fund_stats, None))
+    run(db.fund_stats.update_one({"code": "000001"}, {"$set": {"updated_at": datetime(2026, 1, 5, 11)}}))
+    since = run(cache.sync(db.fund_stats, since))
+
+    version = cache.version
+    cache.set("list", cache.build(b"[]", [], ("funds",)))
+    for _ in range(3):
+        since = run(cache.sync(db.fund_stats, since))
+    assert cache.version == version
+    assert cache.get("list") is not None
+
+def test_sync_catches_write_with_boundary_timestamp(db, run):
+    cache = ResponseCache()
+    boundary = datetime(2026, 1, 5, 11)
+    run(db.fund_stats.insert_one({"code": "000001", "updated_at": datetime(2026, 1, 5, 10)}))
+    since = run(cache.sync(db.fund_stats, None))
+    run(db.fund_stats.update_one({"code": "000001"}, {"$set": {"updated_at": boundary}}))
+    since = run(cache.sync(db.fund_stats, since))
+
+    # 另一只基金以相同的时间戳稍后提交
+    cache.set("fund", cache.build(b"{}", [], ("fund:000002",)))
+    run(db.fund_stats.insert_one({"code": "000002", "updated_at": boundary}))
+    run(cache.sync(db.fund_stats, since))
+    assert cache.get("fund") is None
+
+def test_delete_reaches_other_workers(app, client, seed):
+    seed(count=2, days=1)
+    # 另一个 worker 的缓存和搜索索引，订阅同一个事件代理
+    other_cache = ResponseCache()
+    other_search = FundSearchIndex()
+    other_search.add({"code": "000001", "name": "沪深300指数000001"})
+    other_cache.set("fund", other_cache.build(b"{}", [], ("fund:000001",)))
+    app.events.subscribe(lambda event: other_cache.invalidate(*fund_tags(event["code"])))
+    app.events.subscribe(other_search.apply_event)
+
+    fund_id = client.get("/api/funds/code/000001").json()["_id"]
+    assert client.delete(f"/api/funds/{fund_id}").status_code == 204
+    assert other_cache.get("fund") is None
+    assert other_search.search("000001") == []
+    assert app.fund_search.search("000001") == []
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.pagination import NEXT_CURSOR_HEADER
+from tests.conftest import fund_document
+
+END = "2026-01-05T00:00:00"
+
+def summaries(client, **params):
+    response = client.get("/api/funds/summary", params={"end_date": END, **params})
+    assert response.status_code == 200
+    return response
+
+def test_latest_price_and_period_change(client, seed):
+    seed(count=2, days=30)
+    funds = summaries(client).json()
+    assert [fund["code"] for fund in funds] == ["000001", "000002"]
+    fund = funds[0]
+    assert (fund["latest_date"], fund["latest_price"], fund["daily_change"]) == ("2026-01-05T00:00:00", 1.29, 1.0)
+    # 30 天窗口内的首个净值为 1.00
+    assert fund["period_change"] == pytest.approx(29.0)
+
+def test_days_window_moves_first_price(client, seed):
+    seed(count=1, days=30)
+    fund, = summaries(client, days=10).json()
+    # 窗口从 2025-12-26 开始，首个净值为 1.19
+    assert fund["period_change"] == pytest.approx((1.29 - 1.19) / 1.19 * 100)
+
+def test_fund_without_prices_in_window(client, seed, db, run):
+    seed(count=1, days=30)
+    run(db.funds.insert_one(fund_document("000099", name="红利低波", tracking_index="中证红利")))
+    run(db.fund_prices.insert_one({"fund_code": "000099", "date": datetime(2025, 6, 1), "price": 2.0, "daily_change": 0.5}))
+    funds = {fund["code"]: fund for fund in summaries(client).json()}
+    assert funds["000001"]["latest_price"] == 1.29
+    stale = funds["000099"]
+    assert (stale["latest_date"], stale["latest_price"], stale["daily_change"], stale["period_change"]) == (
+        None, None, None, None
+    )
+
+def test_search_filters_funds(client, seed, db, run, app):
+    seed(count=2, days=5)
+    run(db.funds.insert_one(fund_document("000099", name="红利低波", tracking_index="中证红利")))
+    run(app.fund_search.load(db.funds))
+    assert [fund["code"] for fund in summaries(client, search="红利").json()] == ["000099"]
+
+def test_cursor_pages_through_summaries(client, seed):
+    codes = seed(count=5, days=5)
+    first = summaries(client, limit=2)
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    second = summaries(client, limit=10, cursor=cursor)
+    assert NEXT_CURSOR_HEADER not in second.headers
+    funds = first.json() + second.json()
+    assert [fund["code"] for fund in funds] == codes
+    assert all(fund["latest_price"] == pytest.approx(1.04) for fund in funds)
@@ -0,0 +1 @@
+"""backend 和 data-crawler 共用的模块，两个镜像构建时都会安装此包"""
@@ -0,0 +1,141 @@
+"""基金变更事件
+
+爬虫批量写入落库后和后端写接口把净值、基金详情的变更作为紧凑的 JSON 事件发布到 RabbitMQ 的
+topic 交换机（路由键 price.<基金代码> / details.<基金代码> / delete.<基金代码>），由后端消费并推送给浏览器。
+pika 为阻塞式客户端，发布在独立线程中运行；后端的 RabbitMQBroker 在此基础上增加消费线程。
+"""
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("fund-common.events")
+
+EVENT_EXCHANGE = "fund.events"
+# 发布线程的本地缓冲上限，RabbitMQ 不可用时超出的事件直接丢弃
+PUBLISH_QUEUE_SIZE = 10000
+RECONNECT_DELAY = 5
+
+# 详情事件中携带的基金字段
+DETAIL_EVENT_FIELDS = ["name", "tracking_index", "fund_size", "tracking_error", "rating", "expense_ratio"]
+
+def price_event(fund_code: str, date: datetime, price: float, daily_change: float) -> dict:
+    return {"type": "price", "code": fund_code, "date": date, "price": price, "daily_change": daily_change}
+
+def details_event(fund_code: str, fields: dict) -> dict:
+    event = {"type": "details", "code": fund_code}
+    event.update({name: fields[name] for name in DETAIL_EVENT_FIELDS if name in fields})
+    return event
+
+def delete_event(fund_code: str) -> dict:
+    return {"type": "delete", "code": fund_code}
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(event: dict) -> bytes:
+    return json.dumps(event, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def events_from_writes(collection: str, writes: List[Tuple[dict, dict]]) -> List[dict]:
+    """把 BulkWriter 写入的 (query, update) 转换为变更事件"""
+    events = []
+    for query, update in writes:
+        fields = update.get("$set", {})
+        if collection == "fund_prices":
+            events.append(price_event(query["fund_code"], query["date"], fields.get("price"), fields.get("daily_change")))
+        elif collection == "funds":
+            events.append(details_event(query["code"], fields))
+    return events
+
+def routing_key(event: dict) -> str:
+    return f"{event['type']}.{event['code']}"
+
+def rabbitmq_parameters(host: str, user: str, password: str):
+    import pika
+
+    return pika.ConnectionParameters(
+        host=host,
+        credentials=pika.PlainCredentials(user, password),
+        heartbeat=30,
+        blocked_connection_timeout=30,
+    )
+
+class RabbitMQPublisher:
+    """发布线程从本地队列取事件写入交换机"""
+
+    def __init__(self, parameters, exchange: str = EVENT_EXCHANGE):
+        self.parameters = parameters
+        self.exchange = exchange
+        self.outbox = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def publish(self, event: dict):
+        try:
+            self.outbox.put_nowait(event)
+        except queue.Full:
+            logger.warning(f"Event queue full, dropping {routing_key(event)}")
+
+    def start(self):
+        self._start_thread(self._publish_forever)
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target, name=target.__name__, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def close(self):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+
+    def _connect(self):
+        import pika
+
+        connection = pika.BlockingConnection(self.parameters)
+        channel = connection.channel()
+        channel.exchange_declare(exchange=self.exchange, exchange_type="topic", durable=True)
+        return connection, channel
+
+    def _publish_forever(self):
+        import pika
+
+        properties = pika.BasicProperties(content_type="application/json")
+        pending = None
+        while not self.stopping.is_set():
+            try:
+                connection, channel = self._connect()
+            except Exception as e:
+                logger.error(f"Cannot connect to RabbitMQ for publishing: {str(e)}")
+                self.stopping.wait(RECONNECT_DELAY)
+                continue
+
+            try:
+                while not self.stopping.is_set() or pending is not None or not self.outbox.empty():
+                    if pending is None:
+                        try:
+                            pending = self.outbox.get(timeout=1)
+                        except queue.Empty:
+                            if self.stopping.is_set():
+                                break
+                            # 空闲时处理心跳
+                            connection.process_data_events(0)
+                            continue
+                    channel.basic_publish(self.exchange, routing_key(pending), dumps(pending), properties)
+                    pending = None
+                connection.close()
+            except Exception as e:
+                # 发送失败的事件在重连后重发
+                logger.error(f"Error publishing events: {str(e)}")
+                self.stopping.wait(RECONNECT_DELAY)
+
+def create_publisher(host: Optional[str], user: str, password: str) -> Optional[RabbitMQPublisher]:
+    """未配置 RabbitMQ 时不发布事件"""
+    if host:
+        return RabbitMQPublisher(rabbitmq_parameters(host, user, password))
+    return None
@@ -0,0 +1,162 @@
+"""基金统计物化集合 fund_stats
+
+每只基金一条文档，包含基金基本字段、最新净值、各区间收益率和年化波动率，
+供筛选和排序直接按索引查询，不再关联净值历史。
+净值写入后调用 refresh_fund_stats 只重算受影响的基金，每只基金最多读取一年多的净值；
+统计未变化的文档不写入，updated_at 只在内容变化时更新（后端据此失效响应缓存）。
+backend 的写接口和爬虫写入净值后都调用这里的函数。
+
+全量重建：python -m fund_common.fund_stats
+"""
+import asyncio
+import logging
+import math
+import os
+import statistics
+import sys
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+import pymongo
+from pymongo import UpdateOne
+
+logger = logging.getLogger("fund-common.fund-stats")
+
+TRADING_DAYS_PER_YEAR = 252
+
+# 收益率区间（自然日），字段名为 return_<区间>
+STATS_WINDOWS = {
+    "1w": 7,
+    "1m": 30,
+    "3m": 90,
+    "6m": 180,
+    "1y": 365,
+}
+# 波动率按最近一年计算
+VOLATILITY_DAYS = 365
+# 从 funds 复制到 fund_stats 的字段
+FUND_FIELDS = ["name", "type", "tracking_index", "company", "fund_size", "expense_ratio", "tracking_error", "rating"]
+
+# 筛选接口可过滤和排序的数值字段，均有索引
+SCREENER_FIELDS = [
+    "latest_price",
+    "daily_change",
+    *(f"return_{name}" for name in STATS_WINDOWS),
+    "volatility",
+    "fund_size",
+    "expense_ratio",
+    "tracking_error",
+    "rating",
+]
+
+REFRESH_BATCH_SIZE = 500
+
+def compute_stats(rows: List[dict]) -> dict:
+    """根据按日期升序的净值计算统计字段，区间起点为区间开始后的第一个净值"""
+    latest = rows[-1]
+    dates = [row["date"] for row in rows]
+    stats = {
+        "latest_date": latest["date"],
+        "latest_price": latest["price"],
+        "daily_change": latest.get("daily_change"),
+    }
+
+    for name, days in STATS_WINDOWS.items():
+        cutoff = latest["date"] - timedelta(days=days)
+        value = None
+        if dates[0] <= cutoff:
+            start = rows[min(bisect_right(dates, cutoff), len(rows) - 1)]["price"]
+            if start:
+                value = (latest["price"] / start - 1) * 100
+        stats[f"return_{name}"] = value
+
+    start = bisect_right(dates, latest["date"] - timedelta(days=VOLATILITY_DAYS))
+    prices = [row["price"] for row in rows[max(start - 1, 0):]]
+    daily_returns = [current / previous - 1 for previous, current in zip(prices, prices[1:]) if previous]
+    stats["volatility"] = (
+        statistics.stdev(daily_returns) * math.sqrt(TRADING_DAYS_PER_YEAR) * 100
+        if len(daily_returns) >= 2 else None
+    )
+    return stats
+
+async def refresh_fund_stats(db, fund_codes: Iterable[str]) -> int:
+    """重算指定基金的统计文档，基金已删除时同时删除其统计文档；返回写入的文档数"""
+    fund_codes = list(dict.fromkeys(fund_codes))
+    written = 0
+    for i in range(0, len(fund_codes), REFRESH_BATCH_SIZE):
+        written += await _refresh_batch(db, fund_codes[i:i + REFRESH_BATCH_SIZE])
+    return written
+
+async def _refresh_batch(db, fund_codes: List[str]) -> int:
+    funds = {
+        fund["code"]: fund
+        async for fund in db.funds.find({"code": {"$in": fund_codes}}, {"_id": 0, "code": 1, **{f: 1 for f in FUND_FIELDS}})
+    }
+    removed = [code for code in fund_codes if code not in funds]
+    if removed:
+        await db.fund_stats.delete_many({"code": {"$in": removed}})
+    if not funds:
+        return 0
+
+    # 先用 (fund_code, date) 索引逐只取最新净值日期，再一次查询取回各基金自己最近一年多的净值，
+    # 停更的基金不会拉长其他基金的读取区间
+    latest = await asyncio.gather(*(
+        db.fund_prices.find_one({"fund_code": code}, {"_id": 0, "date": 1}, sort=[("date", pymongo.DESCENDING)])
+        for code in funds
+    ))
+    window = timedelta(days=max(max(STATS_WINDOWS.values()), VOLATILITY_DAYS) + 7)
+    clauses = [
+        {"fund_code": code, "date": {"$gte": row["date"] - window}}
+        for code, row in zip(funds, latest) if row is not None
+    ]
+    history = {}
+    if clauses:
+        async for row in db.fund_prices.find(
+            {"$or": clauses},
+            {"_id": 0, "fund_code": 1, "date": 1, "price": 1, "daily_change": 1}
+        ).sort([("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)]):
+            history.setdefault(row["fund_code"], []).append(row)
+
+    stored = {
+        stats["code"]: stats
+        async for stats in db.fund_stats.find({"code": {"$in": list(funds)}}, {"_id": 0, "updated_at": 0})
+    }
+
+    now = datetime.utcnow()
+    operations = []
+    for code, fund in funds.items():
+        document = {field: fund.get(field) for field in FUND_FIELDS}
+        if code in history:
+            document.update(compute_stats(history[code]))
+        if code in stored and all(stored[code].get(field) == value for field, value in document.items()):
+            continue
+        document["updated_at"] = now
+        operations.append(UpdateOne({"code": code}, {"$set": document}, upsert=True))
+
+    if operations:
+        await db.fund_stats.bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def rebuild_fund_stats(db) -> int:
+    """按 funds 全量重建 fund_stats，返回内容变化的文档数"""
+    fund_codes = [fund["code"] async for fund in db.funds.find({}, {"code": 1})]
+    written = await refresh_fund_stats(db, fund_codes)
+    await db.fund_stats.delete_many({"code": {"$nin": fund_codes}})
+    return written
+
+async def _main() -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://mongo:27017"))
+    db = client[os.getenv("DATABASE_NAME", "fund_tracker")]
+    try:
+        written = await rebuild_fund_stats(db)
+        logger.info(f"Rebuilt fund_stats, {written} funds changed")
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,116 @@
+"""数据库索引定义，backend 和爬虫启动时调用 ensure_indexes 确保索引存在"""
+import logging
+
+import pymongo
+from pymongo.errors import OperationFailure
+
+from fund_common.fund_stats import SCREENER_FIELDS
+
+logger = logging.getLogger("fund-common.indexes")
+
+# 各集合需要的索引，backend 和爬虫启动时都会确保存在
+INDEXES = {
+    "funds": [
+        {"keys": [("code", pymongo.ASCENDING)], "name": "code_unique", "unique": True},
+        # 搜索索引按 updated_at 增量同步
+        {"keys": [("updated_at", pymongo.ASCENDING)], "name": "updated_at"},
+        # 按跟踪指数查找同类基金
+        {"keys": [("tracking_index", pymongo.ASCENDING)], "name": "tracking_index"},
+    ],
+    "fund_prices": [
+        {
+            "keys": [("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)],
+            "name": "fund_code_date_unique",
+            "unique": True,
+        },
+    ],
+    # 爬取任务登记，到期自动删除
+    "crawl_tasks": [
+        {"keys": [("expires_at", pymongo.ASCENDING)], "name": "expires_at_ttl", "expire_after": 0},
+    ],
+    # 历史净值已回填完成的基金
+    "price_backfills": [
+        {"keys": [("fund_code", pymongo.ASCENDING)], "name": "fund_code_unique", "unique": True},
+    ],
+    # 爬虫的页面条件请求缓存，90 天未变化的条目自动删除
+    "http_cache": [
+        {"keys": [("updated_at", pymongo.ASCENDING)], "name": "updated_at_ttl", "expire_after": 90 * 86400},
+    ],
+    # 按周/月降采样的净值，长区间价格曲线按粒度读取
+    "fund_price_rollups": [
+        {
+            "keys": [("fund_code", pymongo.ASCENDING), ("resolution", pymongo.ASCENDING), ("date", pymongo.ASCENDING)],
+            "name": "fund_code_resolution_date_unique",
+            "unique": True,
+        },
+    ],
+    "fund_estimates": [
+        {"keys": [("code", pymongo.ASCENDING)], "name": "code_unique", "unique": True},
+    ],
+    "fund_stats": [
+        {"keys": [("code", pymongo.ASCENDING)], "name": "code_unique", "unique": True},
+        {"keys": [("tracking_index", pymongo.ASCENDING)], "name": "tracking_index"},
+        # 后端按 updated_at 发现爬虫写入，失效响应缓存
+        {"keys": [("updated_at", pymongo.ASCENDING)], "name": "updated_at"},
+        # 筛选排序字段，附加 code 保证分页顺序稳定
+        *(
+            {"keys": [(field, pymongo.ASCENDING), ("code", pymongo.ASCENDING)], "name": f"{field}_code"}
+            for field in SCREENER_FIELDS
+        ),
+    ],
+}
+
+async def _find_duplicate(collection, keys) -> bool:
+    pipeline = [
+        {"$group": {"_id": {field: f"${field}" for field, _ in keys}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1},
+    ]
+    async for _ in collection.aggregate(pipeline, allowDiskUse=True):
+        return True
+    return False
+
+async def ensure_index(collection, spec):
+    keys = spec["keys"]
+    name = spec["name"]
+    unique = spec.get("unique", False)
+    options = {"expireAfterSeconds": spec["expire_after"]} if "expire_after" in spec else {}
+
+    existing = await collection.index_information()
+    for index_name, info in existing.items():
+        if list(info["key"]) != keys:
+            continue
+        if index_name == name and info.get("unique", False) == unique:
+            return
+        if info.get("unique", False) and not unique:
+            # 已有同字段的唯一索引，足以满足查询
+            return
+        if index_name != name and info.get("unique", False) == unique:
+            logger.info(f"Index {collection.name}.{index_name} already covers {name}, skipping")
+            return
+
+    if unique and await _find_duplicate(collection, keys):
+        # 已有重复数据时不能建唯一索引，退化为普通索引，保证查询仍能走索引
+        logger.warning(
+            f"Duplicate values found for {collection.name}.{name}, "
+            f"creating non-unique index until the duplicates are removed"
+        )
+        if not any(list(info["key"]) == keys for info in existing.values()):
+            await collection.create_index(keys, name=name)
+        return
+
+    # 同字段的旧索引选项不同（例如之前退化的非唯一索引），先删除再重建
+    for index_name, info in existing.items():
+        if list(info["key"]) == keys:
+            await collection.drop_index(index_name)
+
+    await collection.create_index(keys, name=name, unique=unique, **options)
+    logger.info(f"Created index {collection.name}.{name}")
+
+async def ensure_indexes(db):
+    for collection_name, specs in INDEXES.items():
+        for spec in specs:
+            try:
+                await ensure_index(db[collection_name], spec)
+            except OperationFailure as e:
+                logger.error(f"Failed to ensure index {collection_name}.{spec['name']}: {str(e)}")
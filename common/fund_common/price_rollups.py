@@ -0,0 +1,162 @@
+"""净值降采样物化集合 fund_price_rollups
+
+每只基金每个周期（周/月）一条文档：date 为周期起点（周一或月初），
+price 为期末净值（收盘），open/high/low 为期内首个、最高和最低净值，
+daily_change 为期内各日涨跌幅复合得到的周期涨跌幅，end_date 为期内最后一个净值日期。
+多年的价格曲线按周或按月读取几百条预聚合文档，不再扫描全部日净值。
+
+净值写入后调用 refresh_price_rollups 只重算受影响的周期：
+传入各基金最早变更的日期时从该日期所在周期起重算，否则从已有的最后一个月起重算。
+
+全量重建：python -m fund_common.price_rollups
+"""
+import asyncio
+import logging
+import math
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+import pymongo
+from pymongo import UpdateOne
+
+logger = logging.getLogger("fund-common.price-rollups")
+
+ROLLUP_COLLECTION = "fund_price_rollups"
+
+def week_start(date: datetime) -> datetime:
+    return (date - timedelta(days=date.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def month_start(date: datetime) -> datetime:
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+# 降采样粒度 -> 周期起点
+RESOLUTIONS = {
+    "week": week_start,
+    "month": month_start,
+}
+
+# 每批重算的基金数，全量重建时每只基金会读取全部历史
+REFRESH_BATCH_SIZE = 100
+
+def compute_rollups(rows: List[dict], resolution: str) -> List[dict]:
+    """把按日期升序的日净值聚合为各周期的 OHLC 文档"""
+    period_of = RESOLUTIONS[resolution]
+    rollups = []
+    current = None
+    growth = 1.0
+    for row in rows:
+        period = period_of(row["date"])
+        if current is None or current["date"] != period:
+            current = {
+                "resolution": resolution,
+                "date": period,
+                "open": row["price"],
+                "high": row["price"],
+                "low": row["price"],
+                "count": 0,
+            }
+            rollups.append(current)
+            growth = 1.0
+        current["high"] = max(current["high"], row["price"])
+        current["low"] = min(current["low"], row["price"])
+        current["price"] = row["price"]
+        current["end_date"] = row["date"]
+        current["count"] += 1
+        daily_change = row.get("daily_change")
+        if growth is not None and daily_change is not None and not math.isnan(daily_change):
+            growth *= 1 + daily_change / 100
+        else:
+            growth = None
+        current["daily_change"] = (growth - 1) * 100 if growth is not None else None
+    return rollups
+
+async def refresh_price_rollups(
+    db,
+    fund_codes: Iterable[str],
+    since: Optional[Dict[str, datetime]] = None,
+    full: bool = False
+) -> int:
+    """重算指定基金的降采样文档；since 为各基金最早变更的净值日期，full 时重算全部历史；返回写入的文档数"""
+    fund_codes = list(dict.fromkeys(fund_codes))
+    # 带时区的日期换算为 UTC 并去掉时区，才能与 Mongo 读出的日期比较
+    since = {
+        code: date.astimezone(timezone.utc).replace(tzinfo=None) if date.tzinfo is not None else date
+        for code, date in (since or {}).items()
+    }
+    written = 0
+    for i in range(0, len(fund_codes), REFRESH_BATCH_SIZE):
+        written += await _refresh_batch(db, fund_codes[i:i + REFRESH_BATCH_SIZE], since, full)
+    return written
+
+async def _refresh_batch(db, fund_codes: List[str], since: Dict[str, datetime], full: bool) -> int:
+    starts = {code: since.get(code) for code in fund_codes}
+    if not full:
+        # 未指定变更日期的基金从已有的最后一个月起重算，没有降采样文档的基金重算全部历史
+        missing = [code for code, start in starts.items() if start is None]
+        if missing:
+            async for row in db[ROLLUP_COLLECTION].aggregate([
+                {"$match": {"fund_code": {"$in": missing}, "resolution": "month"}},
+                {"$group": {"_id": "$fund_code", "date": {"$max": "$date"}}},
+            ]):
+                starts[row["_id"]] = row["date"]
+    else:
+        starts = dict.fromkeys(fund_codes)
+
+    # 周可能跨月，从两种周期起点中较早的一个开始读取
+    clauses = []
+    for code, start in starts.items():
+        if start is None:
+            clauses.append({"fund_code": code})
+        else:
+            clauses.append({"fund_code": code, "date": {"$gte": min(period_of(start) for period_of in RESOLUTIONS.values())}})
+    history = {}
+    async for row in db.fund_prices.find(
+        {"$or": clauses},
+        {"_id": 0, "fund_code": 1, "date": 1, "price": 1, "daily_change": 1}
+    ).sort([("fund_code", pymongo.ASCENDING), ("date", pymongo.ASCENDING)]):
+        history.setdefault(row["fund_code"], []).append(row)
+
+    now = datetime.utcnow()
+    operations = []
+    for code, rows in history.items():
+        start = starts[code]
+        for resolution, period_of in RESOLUTIONS.items():
+            for rollup in compute_rollups(rows, resolution):
+                # 起点之前的周期读取的净值不完整，保持不变
+                if start is not None and rollup["date"] < period_of(start):
+                    continue
+                rollup["updated_at"] = now
+                operations.append(UpdateOne(
+                    {"fund_code": code, "resolution": resolution, "date": rollup["date"]},
+                    {"$set": rollup},
+                    upsert=True
+                ))
+
+    if operations:
+        await db[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def rebuild_price_rollups(db) -> int:
+    """按 fund_prices 全量重建 fund_price_rollups"""
+    fund_codes = await db.fund_prices.distinct("fund_code")
+    written = await refresh_price_rollups(db, fund_codes, full=True)
+    await db[ROLLUP_COLLECTION].delete_many({"fund_code": {"$nin": fund_codes}})
+    return written
+
+async def _main() -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://mongo:27017"))
+    db = client[os.getenv("DATABASE_NAME", "fund_tracker")]
+    try:
+        written = await rebuild_price_rollups(db)
+        logger.info(f"Rebuilt {written} price rollups")
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main()))
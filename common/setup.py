@@ -0,0 +1,10 @@
+from setuptools import setup
+
+# backend 和爬虫共用的数据层：物化集合的重算、索引定义和变更事件格式
+setup(
+    name="fund-common",
+    version="0.1.0",
+    packages=["fund_common"],
+    python_requires=">=3.8",
+    install_requires=["pymongo>=3.12.0"],
+)
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from fund_common.fund_stats import compute_stats, refresh_fund_stats
+
+def rows(days: int, end: datetime = datetime(2026, 1, 5)) -> list:
+    return [{"date": end - timedelta(days=days - 1 - i), "price": 1.0 + 0.01 * i, "daily_change": 1.0} for i in range(days)]
+
+def test_compute_stats_windows():
+    stats = compute_stats(rows(40))
+    assert stats["latest_price"] == pytest.approx(1.39)
+    # 区间起点为区间开始后的第一个净值
+    assert stats["return_1m"] == pytest.approx((1.39 / 1.10 - 1) * 100)
+    # 历史不足的区间没有收益率
+    assert stats["return_3m"] is None
+    assert stats["volatility"] is not None
+
+def test_refresh_fund_stats_writes_and_removes():
+    async def main():
+        db = AsyncMongoMockClient()["stats"]
+        await db.funds.insert_one({"code": "000001", "name": "沪深300指数", "tracking_index": "沪深300"})
+        await db.fund_prices.insert_many([dict(row, fund_code="000001") for row in rows(10)])
+        await db.fund_stats.insert_one({"code": "000002"})
+
+        assert await refresh_fund_stats(db, ["000001", "000002"]) == 1
+        stats = await db.fund_stats.find_one({"code": "000001"})
+        assert stats["name"] == "沪深300指数"
+        assert stats["latest_date"] == datetime(2026, 1, 5)
+        assert await db.fund_stats.find_one({"code": "000002"}) is None
+
+    asyncio.run(main())
+
+def test_unchanged_stats_keep_updated_at():
+    async def main():
+        db = AsyncMongoMockClient()["stats"]
+        await db.funds.insert_one({"code": "000001", "name": "沪深300指数", "tracking_index": "沪深300"})
+        await db.fund_prices.insert_many([dict(row, fund_code="000001") for row in rows(10)])
+        await refresh_fund_stats(db, ["000001"])
+        updated_at = (await db.fund_stats.find_one({"code": "000001"}))["updated_at"]
+
+        assert await refresh_fund_stats(db, ["000001"]) == 0
+        assert (await db.fund_stats.find_one({"code": "000001"}))["updated_at"] == updated_at
+
+        await db.funds.update_one({"code": "000001"}, {"$set": {"name": "沪深300联接"}})
+        assert await refresh_fund_stats(db, ["000001"]) == 1
+
+    asyncio.run(main())
+
+def test_stale_fund_does_not_widen_other_windows(monkeypatch):
+    async def main():
+        db = AsyncMongoMockClient()["stats"]
+        await db.funds.insert_many([{"code": "000001", "name": "活跃"}, {"code": "000002", "name": "停更"}])
+        await db.fund_prices.insert_many([dict(row, fund_code="000001") for row in rows(900)])
+        await db.fund_prices.insert_many([dict(row, fund_code="000002") for row in rows(10, datetime(2020, 1, 5))])
+
+        queries = []
+        collection = type(db.fund_prices)
+        find = collection.find
+
+        def record_find(self, query, *args, **kwargs):
+            queries.append(query)
+            return find(self, query, *args, **kwargs)
+
+        monkeypatch.setattr(collection, "find", record_find)
+        assert await refresh_fund_stats(db, ["000001", "000002"]) == 2
+        # 每只基金只读取自己最新净值之前 372 天的窗口
+        history_query, = [query for query in queries if "$or" in query]
+        windows = {clause["fund_code"]: clause["date"]["$gte"] for clause in history_query["$or"]}
+        assert windows == {
+            "000001": datetime(2026, 1, 5) - timedelta(days=372),
+            "000002": datetime(2020, 1, 5) - timedelta(days=372),
+        }
+        stats = await db.fund_stats.find_one({"code": "000002"})
+        assert stats["latest_date"] == datetime(2020, 1, 5)
+
+    asyncio.run(main())
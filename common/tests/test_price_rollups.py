@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from fund_common.price_rollups import (
+    ROLLUP_COLLECTION, compute_rollups, month_start, rebuild_price_rollups, refresh_price_rollups, week_start
+)
+
+def daily_prices(code: str, start: datetime, days: int) -> list:
+    return [
+        {"fund_code": code, "date": start + timedelta(days=i), "price": 1.0 + 0.01 * (i % 7), "daily_change": 1.0}
+        for i in range(days)
+    ]
+
+async def rollup_documents(db) -> list:
+    return await db[ROLLUP_COLLECTION].find(
+        {}, {"_id": 0, "updated_at": 0}
+    ).sort([("fund_code", 1), ("resolution", 1), ("date", 1)]).to_list(length=None)
+
+def test_period_starts():
+    assert week_start(datetime(2026, 1, 8, 15)) == datetime(2026, 1, 5)
+    assert month_start(datetime(2026, 1, 31, 15)) == datetime(2026, 1, 1)
+
+def test_compute_rollups_ohlc():
+    rows = [
+        {"date": datetime(2026, 1, 5), "price": 1.0, "daily_change": 10.0},
+        {"date": datetime(2026, 1, 6), "price": 1.3, "daily_change": 10.0},
+        {"date": datetime(2026, 1, 7), "price": 0.9, "daily_change": None},
+        {"date": datetime(2026, 1, 12), "price": 1.1, "daily_change": 10.0},
+    ]
+    first, second = compute_rollups(rows, "week")
+    assert (first["date"], first["open"], first["high"], first["low"], first["price"]) == (
+        datetime(2026, 1, 5), 1.0, 1.3, 0.9, 0.9
+    )
+    assert first["end_date"] == datetime(2026, 1, 7)
+    assert first["count"] == 3
+    # 期内缺少涨跌幅时周期涨跌幅未知
+    assert first["daily_change"] is None
+    assert round(second["daily_change"], 6) == 10.0
+
+def test_incremental_refresh_matches_rebuild():
+    async def main():
+        db = AsyncMongoMockClient()["rollups"]
+        await db.fund_prices.insert_many(daily_prices("000001", datetime(2025, 11, 1), 60))
+        await rebuild_price_rollups(db)
+
+        new_prices = daily_prices("000001", datetime(2025, 12, 31), 10)
+        await db.fund_prices.insert_many(new_prices)
+        await refresh_price_rollups(db, ["000001"], {"000001": new_prices[0]["date"]})
+        incremental = await rollup_documents(db)
+
+        await db[ROLLUP_COLLECTION].delete_many({})
+        await rebuild_price_rollups(db)
+        assert incremental == await rollup_documents(db)
+
+    asyncio.run(main())
+
+def test_refresh_without_since_resumes_from_last_month():
+    async def main():
+        db = AsyncMongoMockClient()["rollups"]
+        await db.fund_prices.insert_many(daily_prices("000001", datetime(2025, 11, 1), 40))
+        await rebuild_price_rollups(db)
+        await db.fund_prices.insert_many(daily_prices("000001", datetime(2025, 12, 11), 5))
+
+        written = await refresh_price_rollups(db, ["000001"])
+        months = await db[ROLLUP_COLLECTION].find({"resolution": "month"}).to_list(length=None)
+        assert {month["date"]: month["count"] for month in months} == {
+            datetime(2025, 11, 1): 30, datetime(2025, 12, 1): 15,
+        }
+        # 只重算最后一个月（12 月）及其中的三周
+        assert written == 4
+
+    asyncio.run(main())
+
+def test_refresh_accepts_timezone_aware_since():
+    async def main():
+        db = AsyncMongoMockClient()["rollups"]
+        await db.fund_prices.insert_many(daily_prices("000001", datetime(2025, 12, 1), 10))
+        since = datetime(2025, 12, 6, 0, 0, tzinfo=timezone(timedelta(hours=8)))
+        await refresh_price_rollups(db, ["000001"], {"000001": since})
+        weeks = await db[ROLLUP_COLLECTION].distinct("date", {"resolution": "week"})
+        # 换算为 UTC 后是 12 月 5 日所在的周及之后
+        assert sorted(weeks) == [datetime(2025, 12, 1), datetime(2025, 12, 8)]
+
+    asyncio.run(main())
+
+def test_rebuild_removes_rollups_of_deleted_funds():
+    async def main():
+        db = AsyncMongoMockClient()["rollups"]
+        await db[ROLLUP_COLLECTION].insert_one({"fund_code": "999999", "resolution": "month", "date": datetime(2025, 1, 1)})
+        await db.fund_prices.insert_many(daily_prices("000001", datetime(2025, 11, 1), 3))
+        await rebuild_price_rollups(db)
+        assert await db[ROLLUP_COLLECTION].distinct("fund_code") == ["000001"]
+
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+"""爬虫基准测试
+
+- 解析吞吐：各解析后端（html.parser/lxml）和解析进程数下，每种 fixture 页面每秒可解析的页数
+- 爬取吞吐：本地假服务器按 URL 类型返回 crawlers/fixtures 中录制的东方财富页面
+  （支持 ETag/304），FundCrawler 对一批合成基金执行 estimate、price、details 任务，
+  details 分别统计首次（全部解析）和再次（304/正文未变）的爬取，写入独立的基准数据库
+结果写为 JSON，传入 --baseline 时与之前的结果对比。
+
+    python -m app.benchmark --funds 500 --output crawler-bench.json
+    python -m app.benchmark --skip-crawl   # 只测解析，不需要 MongoDB
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from aiohttp import web
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.crawlers.engine import CrawlEngine
+from app.crawlers.fund_crawler import FundCrawler
+from app.crawlers.parsers import DEFAULT_BACKEND, FIXTURE_PARSERS, FIXTURES_DIR, REFERENCE_BACKEND, ParserPool
+from app.services.bulk_writer import BulkWriter
+from app.services.metrics import page_type
+
+BENCH_DATABASE = "fund_crawler_bench"
+
+# 页面类型 -> fixture 文件
+PAGE_FIXTURES = {
+    "lsjz": "lsjz.html",
+    "estimate": "fundgz.js",
+    "fund": "fund.html",
+    "tracking": "tsdata.html",
+    "rating": "jjpj.html",
+    "manager": "manager.html",
+}
+
+def load_fixtures() -> Dict[str, str]:
+    fixtures = {}
+    for filename in set(PAGE_FIXTURES.values()) | set(FIXTURE_PARSERS):
+        with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+            fixtures[filename] = f.read()
+    return fixtures
+
+async def parse_throughput(fixtures: Dict[str, str], backend: str, workers: int, pages: int) -> Dict[str, float]:
+    """每种页面并发解析 pages 次，返回每秒解析页数"""
+    pool = ParserPool(workers, backend)
+    results = {}
+    try:
+        for filename, parser in FIXTURE_PARSERS.items():
+            html = fixtures[filename]
+            await pool.parse(parser, html)  # 预热进程池
+            started_at = time.perf_counter()
+            await asyncio.gather(*(pool.parse(parser, html) for _ in range(pages)))
+            results[filename] = round(pages / (time.perf_counter() - started_at), 1)
+    finally:
+        pool.close()
+    return results
+
+class FakeUpstream:
+    """按 URL 类型返回 fixture 的假上游，带 ETag，可模拟网络延迟"""
+
+    def __init__(self, fixtures: Dict[str, str], latency: float = 0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+        self.runner = None
+        self.base_url = None
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        filename = PAGE_FIXTURES.get(page_type(request.path_qs))
+        if filename is None:
+            return web.Response(status=404)
+        body = self.fixtures[filename]
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def close(self):
+        await self.runner.cleanup()
+
+class BenchCrawler(FundCrawler):
+    """把东方财富的 URL 改写到假上游，路径中保留原域名以便按页面类型统计"""
+
+    def __init__(self, db, base_url: str, **kwargs):
+        super().__init__(db, **kwargs)
+        self.base_url = base_url
+
+    async def request(self, url, headers=None):
+        return await super().request(f"{self.base_url}/{url.split('://', 1)[1]}", headers)
+
+async def crawl_throughput(args, fixtures: Dict[str, str]) -> Dict[str, dict]:
+    upstream = FakeUpstream(fixtures, args.latency / 1000)
+    await upstream.start()
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.database)
+    db = client[args.database]
+    writer = BulkWriter(db, args.write_batch_size)
+    writer.start()
+    crawler = BenchCrawler(db, upstream.base_url, parser=ParserPool(args.workers, args.backend), writer=writer)
+    engine = CrawlEngine(args.concurrency)
+    codes = [f"{i:06d}" for i in range(args.funds)]
+    rounds = [
+        ("estimate", crawler.crawl_fund_estimate),
+        ("price", crawler.crawl_fund_price),
+        ("details_cold", crawler.crawl_fund_details),
+        ("details_warm", crawler.crawl_fund_details),
+    ]
+
+    results = {}
+    try:
+        for name, task in rounds:
+            requests_before = upstream.requests
+            started_at = time.perf_counter()
+            stats = await engine.run(name, codes, task)
+            await writer.flush()
+            elapsed = time.perf_counter() - started_at
+            results[name] = {
+                "funds": stats.total,
+                "failed": stats.failed,
+                "seconds": round(elapsed, 3),
+                "funds_per_second": round(stats.total / elapsed, 1),
+                "upstream_requests": upstream.requests - requests_before,
+            }
+            print(f"{name:14} {results[name]['funds_per_second']:8.1f} funds/s  "
+                  f"{results[name]['upstream_requests']} requests  {stats.failed} failed")
+        results["details_warm"]["page_cache"] = str(crawler.http_cache.metrics)
+        results["details_warm"]["skipped_writes"] = crawler.skipped_writes
+    finally:
+        await writer.close()
+        await crawler.close()
+        crawler.parser.close()
+        await upstream.close()
+        await client.drop_database(args.database)
+        client.close()
+    return results
+
+def compare(results: dict, baseline: dict):
+    """打印与基准结果的吞吐差异"""
+    def delta(new, old):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else "    n/a"
+
+    print()
+    for key, runs in results["parsers"].items():
+        for filename, rate in runs.items():
+            old = baseline.get("parsers", {}).get(key, {}).get(filename)
+            if old is not None:
+                print(f"parse {key:22} {filename:14} {rate:9.1f}/s {delta(rate, old)}")
+    for name, current in results.get("crawl", {}).items():
+        old = baseline.get("crawl", {}).get(name)
+        if old is not None:
+            print(f"crawl {name:37} {current['funds_per_second']:9.1f}/s "
+                  f"{delta(current['funds_per_second'], old['funds_per_second'])}")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> dict:
+    fixtures = load_fixtures()
+    parsers = {}
+    for backend in sorted({REFERENCE_BACKEND, args.backend}):
+        for workers in sorted({0, args.workers}):
+            key = f"{backend}/{workers} workers"
+            parsers[key] = await parse_throughput(fixtures, backend, workers, args.pages)
+            print(f"parse {key:22} " + "  ".join(f"{name} {rate:.0f}/s" for name, rate in parsers[key].items()))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "funds": args.funds,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "backend": args.backend,
+            "latency_ms": args.latency,
+        },
+        "parsers": parsers,
+    }
+    if not args.skip_crawl:
+        results["crawl"] = await crawl_throughput(args, fixtures)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Fund crawler benchmark")
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default=BENCH_DATABASE)
+    parser.add_argument("--funds", type=int, default=500, help="synthetic funds per crawl round")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND)
+    parser.add_argument("--pages", type=int, default=200, help="parses per fixture for parse throughput")
+    parser.add_argument("--latency", type=float, default=0, help="simulated upstream latency (ms)")
+    parser.add_argument("--write-batch-size", type=int, default=500)
+    parser.add_argument("--skip-crawl", action="store_true", help="only measure parsing, no MongoDB needed")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare with a previous JSON result")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable
+from urllib.parse import urlsplit
+
+from app.services.metrics import TASKS
+
+logger = logging.getLogger("crawl-engine")
+
+class TokenBucket:
+    """令牌桶限速：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    """按域名分别限速，避免对同一上游请求过于频繁"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str):
+        host = urlsplit(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        await bucket.acquire()
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """指数退避加全抖动"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+@dataclass
+class CrawlStats:
+    kind: str
+    total: int = 0
+    fetched: int = 0
+    failed: int = 0
+    duration: float = 0.0
+
+    def __str__(self):
+        return (f"{self.kind} crawl: {self.fetched}/{self.total} fetched, "
+                f"{self.failed} failed in {self.duration:.2f}s")
+
+class CrawlEngine:
+    """以有限并发对一批基金执行爬取任务，并统计每轮结果"""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(concurrency, 1)
+
+    async def run(self, kind: str, fund_codes: Iterable[str], task: Callable[[str], Awaitable[bool]]) -> CrawlStats:
+        fund_codes = list(fund_codes)
+        stats = CrawlStats(kind=kind, total=len(fund_codes))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started_at = time.monotonic()
+
+        async def worker(code):
+            async with semaphore:
+                try:
+                    ok = await task(code)
+                except Exception as e:
+                    logger.error(f"Unexpected error in {kind} crawl for fund {code}: {str(e)}")
+                    ok = False
+            if ok:
+                stats.fetched += 1
+            else:
+                stats.failed += 1
+            TASKS.labels(kind, "ok" if ok else "failed").inc()
+
+        await asyncio.gather(*(worker(code) for code in fund_codes))
+
+        stats.duration = time.monotonic() - started_at
+        logger.info(str(stats))
+        return stats
@@ -0,0 +1 @@
+jsonpgz({"fundcode":"510300","name":"华泰柏瑞沪深300ETF","jzrq":"2026-10-16","dwjz":"4.5231","gsz":"4.5612","gszzl":"0.84","gztime":"2026-10-19 14:35"});
\ No newline at end of file
@@ -1,239 +1,398 @@
 import aiohttp
 import asyncio
 import logging
-import re
-from datetime import datetime
-from bs4 import BeautifulSoup
+from datetime import datetime, timedelta
 import json
+import time
+
+from fund_common.price_rollups import refresh_price_rollups
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from app.crawlers.engine import backoff_delay
+from app.crawlers.http_cache import HttpCache, body_hash
+from app.crawlers.parsers import (
+    ParserPool,
+    parse_estimate_feed,
+    parse_fund_page,
+    parse_manager_page,
+    parse_price_page,
+    parse_price_page_count,
+    parse_rating_page,
+    parse_tracking_page,
+)
+from app.services.bulk_writer import BulkWriter
+from app.services.metrics import FETCH_DURATION, PAGE_CACHE, PARSE_DURATION, UPSTREAM_RESPONSES, WRITE_DURATION, page_type
 
 logger = logging.getLogger("fund-crawler")
 
+# 需要重试的上游状态码（5xx 及限流）
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 回填历史净值时每页条数和每次批量写入的条数；
+# F10DataApi 的 per 参数超过 49 时按默认的 10 条返回，49 是单页可取的最大条数，页数多时并发获取
+BACKFILL_PAGE_SIZE = 49
+BACKFILL_WRITE_BATCH = 1000
+# 历史净值已完整回填的基金，之后的回填只补最新日期之后的净值
+BACKFILL_COLLECTION = "price_backfills"
+
+# 详情爬取各阶段的超时(秒)，包含重试时间；次要页面超时或失败时保留库中的值
+DETAIL_STAGE_TIMEOUTS = {
+    "main": 30,
+    "tracking": 15,
+    "rating": 15,
+    "manager": 15,
+}
+
+# 次要页面提供的字段，页面失败时不覆盖库中的值；新基金先写入默认值，满足 API 模型的必填字段
+SECONDARY_DEFAULTS = {
+    "tracking_error": 0.0,
+    "rating": 3,  # 默认3星
+    "experience_years": 0.0,
+}
+
+# 写入 funds 的详情字段，全部未变化时不写库
+DETAIL_FIELDS = [
+    "name", "type", "tracking_index", "fund_size", "company", "manager", "experience_years",
+    "tracking_error", "rating", "expense_ratio", "establishment_date",
+]
+
 class FundCrawler:
-    def __init__(self, db):
+    def __init__(self, db, rate_limiter=None, max_retries=3, request_timeout=10, parser=None, writer=None):
         self.db = db
         self.session = None
+        # 解析进程池归 crawler 所有，close 时一并关闭
+        self.parser = parser or ParserPool()
+        # 未指定时每次写入立即落库
+        self.writer = writer or BulkWriter(db, batch_size=1)
+        self.http_cache = HttpCache(db, self.writer)
+        self.skipped_writes = 0
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        # 每只基金最近写入的估值时间，估值未更新时不写库
+        self.estimate_times = {}
         
     async def get_session(self):
         if self.session is None:
             self.session = aiohttp.ClientSession(
                 headers={
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-                }
+                },
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
             )
         return self.session
     
+    async def request(self, url, headers=None):
+        """限速请求页面，5xx 和超时按抖动退避重试；返回 200/304 的 (状态码, 正文, 响应头)，失败返回 None"""
+        session = await self.get_session()
+        page = page_type(url)
+        
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(url)
+            
+            # 耗时只统计请求本身，不含限速等待
+            started_at = time.perf_counter()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    UPSTREAM_RESPONSES.labels(page, str(response.status)).inc()
+                    if response.status in (200, 304):
+                        text = await response.text()
+                        FETCH_DURATION.labels(page).observe(time.perf_counter() - started_at)
+                        return response.status, text, response.headers
+                    if response.status not in RETRY_STATUSES:
+                        logger.error(f"Failed to fetch {url}: {response.status}")
+                        return None
+                    error = f"status {response.status}"
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                UPSTREAM_RESPONSES.labels(page, "timeout" if isinstance(e, asyncio.TimeoutError) else "error").inc()
+                error = str(e) or type(e).__name__
+            FETCH_DURATION.labels(page).observe(time.perf_counter() - started_at)
+            
+            if attempt < self.max_retries:
+                delay = backoff_delay(attempt)
+                logger.warning(f"Retrying {url} in {delay:.1f}s after {error}")
+                await asyncio.sleep(delay)
+        
+        logger.error(f"Giving up on {url} after {self.max_retries + 1} attempts: {error}")
+        return None
+    
+    async def fetch(self, url):
+        """请求页面正文，失败返回 None"""
+        response = await self.request(url)
+        return response[1] if response is not None else None
+    
+    async def fetch_parsed(self, url, parser):
+        """条件请求并解析页面，304 或正文未变时使用缓存的解析结果；请求失败返回 None"""
+        entry = await self.http_cache.get(url)
+        response = await self.request(url, self.http_cache.request_headers(entry))
+        if response is None:
+            return None
+        
+        status, text, headers = response
+        if status == 304 and entry is not None:
+            self.http_cache.metrics.not_modified += 1
+            PAGE_CACHE.labels("not_modified").inc()
+            return entry["result"]
+        
+        digest = body_hash(text)
+        if entry is not None and entry.get("body_hash") == digest:
+            self.http_cache.metrics.unchanged += 1
+            PAGE_CACHE.labels("unchanged").inc()
+            return entry["result"]
+        
+        result = await self.parser.parse(parser, text)
+        self.http_cache.metrics.parsed += 1
+        PAGE_CACHE.labels("parsed").inc()
+        await self.http_cache.set(url, headers, digest, result)
+        return result
+    
     async def close(self):
         if self.session:
             await self.session.close()
             self.session = None
+        self.parser.close()
     
     async def crawl_fund_price(self, fund_code):
         """爬取基金最新价格"""
         try:
-            session = await self.get_session()
             url = f"http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code={fund_code}&page=1&per=1"
             
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to fetch price for fund {fund_code}: {response.status}")
-                    return
-                
-                html = await response.text()
-                
-                # 解析HTML
-                soup = BeautifulSoup(html, "html.parser")
-                table = soup.find("table", class_="w782 comm lsjz")
-                
-                if not table:
-                    logger.error(f"No price data found for fund {fund_code}")
-                    return
-                
-                rows = table.find_all("tr")
-                if len(rows) < 2:  # 第一行是表头
-                    logger.error(f"No price data rows for fund {fund_code}")
-                    return
-                
-                cells = rows[1].find_all("td")
-                if len(cells) < 3:
-                    logger.error(f"Invalid price data format for fund {fund_code}")
-                    return
+            html = await self.fetch(url)
+            if html is None:
+                logger.error(f"Failed to fetch price for fund {fund_code}")
+                return False
+            
+            # 解析HTML（第一行为最新净值）
+            prices = await self.parser.parse(parse_price_page, html)
+            if not prices:
+                logger.error(f"No price data found for fund {fund_code}")
+                return False
+            
+            date = prices[0]["date"]
+            price = prices[0]["price"]
+            daily_change = prices[0]["daily_change"]
+            date_str = date.strftime("%Y-%m-%d")
+            
+            # 存储到数据库
+            await self.writer.upsert(
+                "fund_prices",
+                {"fund_code": fund_code, "date": date},
+                {"$set": {
+                    "price": price,
+                    "daily_change": daily_change
+                }}
+            )
+            
+            logger.info(f"Updated price for fund {fund_code}: {price} ({daily_change}%) on {date_str}")
+            return True
                 
-                date_str = cells[0].text.strip()
-                price_str = cells[1].text.strip()
-                change_str = cells[3].text.strip().replace("%", "")
+        except Exception as e:
+            logger.error(f"Error crawling price for fund {fund_code}: {str(e)}")
+            return False
+    
+    async def crawl_fund_estimate(self, fund_code):
+        """爬取盘中估值（fundgz 接口返回一行 JSON，比净值表格轻得多），写入 fund_estimates"""
+        try:
+            url = f"http://fundgz.1234567.com.cn/js/{fund_code}.js"
+            
+            text = await self.fetch(url)
+            if text is None:
+                logger.error(f"Failed to fetch estimate for fund {fund_code}")
+                return False
+            
+            estimate = parse_estimate_feed(text)
+            if estimate is None:  # 该基金没有盘中估值
+                return True
+            if self.estimate_times.get(fund_code) == estimate["estimate_time"]:
+                return True
+            
+            await self.writer.upsert(
+                "fund_estimates",
+                {"code": fund_code},
+                {"$set": dict(estimate, updated_at=datetime.utcnow())}
+            )
+            self.estimate_times[fund_code] = estimate["estimate_time"]
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error crawling estimate for fund {fund_code}: {str(e)}")
+            return False
+    
+    async def backfill_fund_prices(self, fund_code, page_size=BACKFILL_PAGE_SIZE):
+        """回填基金历史净值：历史未回填完成时补齐已有最早日期之前的全部净值，并补齐最新日期之后缺失的净值"""
+        try:
+            earliest = await self.db.fund_prices.find_one(
+                {"fund_code": fund_code}, {"date": 1}, sort=[("date", ASCENDING)]
+            )
+            latest = await self.db.fund_prices.find_one(
+                {"fund_code": fund_code}, {"date": 1}, sort=[("date", DESCENDING)]
+            )
+            completed = await self.db[BACKFILL_COLLECTION].find_one({"fund_code": fund_code})
+            
+            # (sdate, edate)，空字符串表示不限
+            ranges = []
+            if completed is None or earliest is None:
+                # 只有最近净值（如日常净值任务先写入）的基金也要补齐更早的历史
+                ranges.append(("", (earliest["date"] - timedelta(days=1)).strftime("%Y-%m-%d") if earliest else ""))
+            if latest is not None:
+                ranges.append(((latest["date"] + timedelta(days=1)).strftime("%Y-%m-%d"), ""))
+            
+            history_complete = False
+            written_since = None
+            for sdate, edate in ranges:
+                prices, pages, failed_pages = await self._fetch_price_range(fund_code, sdate, edate, page_size)
+                if pages is None:
+                    logger.error(f"Failed to fetch price history for fund {fund_code}")
+                    return False
                 
-                # 转换格式
-                date = datetime.strptime(date_str, "%Y-%m-%d")
-                price = float(price_str)
-                daily_change = float(change_str) if change_str else 0.0
+                operations = [
+                    UpdateOne(
+                        {"fund_code": fund_code, "date": row["date"]},
+                        {"$set": {"price": row["price"], "daily_change": row["daily_change"]}},
+                        upsert=True
+                    )
+                    for row in prices
+                ]
+                for i in range(0, len(operations), BACKFILL_WRITE_BATCH):
+                    with WRITE_DURATION.labels("fund_prices").time():
+                        await self.db.fund_prices.bulk_write(operations[i:i + BACKFILL_WRITE_BATCH], ordered=False)
+                if prices:
+                    first_date = min(row["date"] for row in prices)
+                    written_since = min(written_since, first_date) if written_since else first_date
                 
-                # 存储到数据库
-                await self.db.fund_prices.update_one(
-                    {"fund_code": fund_code, "date": date},
-                    {"$set": {
-                        "price": price,
-                        "daily_change": daily_change
-                    }},
-                    upsert=True
+                logger.info(
+                    f"Backfilled {len(prices)} prices for fund {fund_code} from {sdate or 'inception'} "
+                    f"to {edate or 'latest'} ({pages} pages, {failed_pages} failed)"
                 )
-                
-                logger.info(f"Updated price for fund {fund_code}: {price} ({daily_change}%) on {date_str}")
-                
+                if failed_pages:
+                    # 可能遗漏中间页，不记录完成，下次重新补齐
+                    return False
+                if not sdate:
+                    history_complete = True
+            
+            if history_complete:
+                await self.db[BACKFILL_COLLECTION].update_one(
+                    {"fund_code": fund_code}, {"$set": {"completed_at": datetime.utcnow()}}, upsert=True
+                )
+            # 补齐的早期净值不在已有降采样的最后一个月之后，从最早写入的日期起重算
+            if written_since is not None:
+                await refresh_price_rollups(self.db, [fund_code], {fund_code: written_since})
+            return True
+        
         except Exception as e:
-            logger.error(f"Error crawling price for fund {fund_code}: {str(e)}")
+            logger.error(f"Error backfilling prices for fund {fund_code}: {str(e)}")
+            return False
+    
+    async def _fetch_price_range(self, fund_code, sdate, edate, page_size):
+        """获取日期区间内的全部净值页，返回 (净值列表, 页数, 失败页数)；第一页失败时页数为 None"""
+        base_url = (
+            f"http://fund.eastmoney.com/f10/F10DataApi.aspx?type=lsjz&code={fund_code}"
+            f"&sdate={sdate}&edate={edate}&per={page_size}"
+        )
+        
+        # 第一页同时返回总页数，其余页并发获取（请求频率由限速器控制）
+        html = await self.fetch(f"{base_url}&page=1")
+        if html is None:
+            return [], None, 0
+        
+        pages = parse_price_page_count(html)
+        htmls = [html]
+        if pages > 1:
+            htmls += await asyncio.gather(*(
+                self.fetch(f"{base_url}&page={page}") for page in range(2, pages + 1)
+            ))
+        
+        failed_pages = sum(1 for page_html in htmls if page_html is None)
+        prices = []
+        for page_prices in await asyncio.gather(*(
+            self.parser.parse(parse_price_page, page_html) for page_html in htmls if page_html is not None
+        )):
+            prices.extend(page_prices)
+        return prices, pages, failed_pages
+    
+    async def fetch_stage(self, stage, fund_code, url, parser):
+        """带阶段超时的条件请求和解析；失败或超时返回 None，主页的解析错误向上抛出"""
+        try:
+            result = await asyncio.wait_for(self.fetch_parsed(url, parser), DETAIL_STAGE_TIMEOUTS[stage])
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out fetching {stage} page for fund {fund_code}")
+            return None
+        except Exception as e:
+            if stage == "main":
+                raise
+            logger.error(f"Error parsing {stage} page for fund {fund_code}: {str(e)}")
+            return None
+        
+        if result is None:
+            logger.error(f"Failed to fetch {stage} page for fund {fund_code}")
+        return result
     
     async def crawl_fund_details(self, fund_code):
-        """爬取基金详细信息"""
+        """爬取基金详细信息，页面和提取的字段都未变化时不写库"""
         try:
-            session = await self.get_session()
+            # 主页、特色数据页和评级页互不依赖，并发获取
+            info, tracking_error, rating = await asyncio.gather(
+                self.fetch_stage("main", fund_code, f"http://fund.eastmoney.com/{fund_code}.html", parse_fund_page),
+                self.fetch_stage("tracking", fund_code, f"http://fund.eastmoney.com/f10/tsdata_{fund_code}.html",
+                                 parse_tracking_page),
+                self.fetch_stage("rating", fund_code, f"http://fund.eastmoney.com/f10/jjpj_{fund_code}.html",
+                                 parse_rating_page),
+            )
             
-            # 获取基金基本信息
-            url = f"http://fund.eastmoney.com/{fund_code}.html"
+            if info is None:
+                return False
             
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to fetch details for fund {fund_code}: {response.status}")
-                    return
-                
-                html = await response.text()
-                
-                # 解析HTML
-                soup = BeautifulSoup(html, "html.parser")
-                
-                # 基金名称
-                fund_name_tag = soup.find("div", class_="fundDetail-tit")
-                fund_name = fund_name_tag.find("div").text.strip() if fund_name_tag else "未知"
-                
-                # 基金公司
-                company_tag = soup.find("a", attrs={"href": re.compile(r"Company")})
-                company = company_tag.text.strip() if company_tag else "未知"
-                
-                # 基金经理
-                manager_tag = soup.find("a", attrs={"href": re.compile(r"manager")})
-                manager = manager_tag.text.strip() if manager_tag else "未知"
-                
-                # 成立日期和规模
-                setup_size_tag = soup.find("div", class_="infoOfFund")
-                if setup_size_tag:
-                    setup_date_text = setup_size_tag.find("div", class_="col-left").text
-                    setup_date_match = re.search(r"成立日期：(\d{4}-\d{2}-\d{2})", setup_date_text)
-                    establishment_date = datetime.strptime(setup_date_match.group(1), "%Y-%m-%d") if setup_date_match else None
-                    
-                    size_text = setup_size_tag.find("div", class_="col-right").text
-                    size_match = re.search(r"基金规模：([\d\.]+)亿元", size_text)
-                    fund_size = float(size_match.group(1)) if size_match else 0.0
-                else:
-                    establishment_date = None
-                    fund_size = 0.0
-                
-                # 跟踪指数
-                index_tag = soup.find("div", string=re.compile("跟踪标的"))
-                tracking_index = index_tag.find_next("td").text.strip() if index_tag else "未知"
-                
-                # 基金费率
-                fee_tag = soup.find("div", string=re.compile("基金费率"))
-                expense_ratio = 0.0
-                if fee_tag:
-                    fee_text = fee_tag.find_next("table").text
-                    fee_match = re.search(r"管理费：([\d\.]+)%", fee_text)
-                    if fee_match:
-                        expense_ratio = float(fee_match.group(1))
-                
-                # 获取更多指标数据
-                detail_url = f"http://fund.eastmoney.com/f10/tsdata_{fund_code}.html"
-                async with session.get(detail_url) as detail_response:
-                    if detail_response.status != 200:
-                        logger.error(f"Failed to fetch tracking details for fund {fund_code}")
-                        tracking_error = 0.0
-                    else:
-                        detail_html = await detail_response.text()
-                        detail_soup = BeautifulSoup(detail_html, "html.parser")
-                        
-                        # 跟踪误差
-                        error_tag = detail_soup.find("td", string=re.compile("跟踪误差"))
-                        if error_tag:
-                            error_value = error_tag.find_next("td").text.strip().replace("%", "")
-                            tracking_error = float(error_value) if error_value and error_value != "--" else 0.0
-                        else:
-                            tracking_error = 0.0
-                
-                # 获取基金评级
-                rating_url = f"http://fund.eastmoney.com/f10/jjpj_{fund_code}.html"
-                async with session.get(rating_url) as rating_response:
-                    if rating_response.status != 200:
-                        logger.error(f"Failed to fetch rating for fund {fund_code}")
-                        rating = 3  # 默认3星
-                    else:
-                        rating_html = await rating_response.text()
-                        rating_soup = BeautifulSoup(rating_html, "html.parser")
-                        
-                        # 晨星评级
-                        rating_tag = rating_soup.find("span", string=re.compile("晨星评级"))
-                        rating = 3  # 默认3星
-                        if rating_tag:
-                            rating_img = rating_tag.find_next("img")
-                            if rating_img and "src" in rating_img.attrs:
-                                rating_src = rating_img["src"]
-                                rating_match = re.search(r"(\d+)star", rating_src)
-                                if rating_match:
-                                    rating = int(rating_match.group(1))
-                
-                # 获取基金经理的从业年限
-                experience_years = 0.0
-                if manager != "未知":
-                    manager_code = None
-                    if manager_tag and "href" in manager_tag.attrs:
-                        href = manager_tag["href"]
-                        manager_code_match = re.search(r"manager=(\w+)", href)
-                        if manager_code_match:
-                            manager_code = manager_code_match.group(1)
-                    
-                    if manager_code:
-                        manager_url = f"http://fund.eastmoney.com/manager/{manager_code}.html"
-                        async with session.get(manager_url) as manager_response:
-                            if manager_response.status == 200:
-                                manager_html = await manager_response.text()
-                                manager_soup = BeautifulSoup(manager_html, "html.parser")
-                                
-                                experience_tag = manager_soup.find("span", string=re.compile("从业年限："))
-                                if experience_tag:
-                                    experience_text = experience_tag.text
-                                    experience_match = re.search(r"从业年限：([\d\.]+)年", experience_text)
-                                    if experience_match:
-                                        experience_years = float(experience_match.group(1))
-                
-                # 构建基金数据
-                fund_data = {
-                    "code": fund_code,
-                    "name": fund_name,
-                    "type": "指数基金",
-                    "tracking_index": tracking_index,
-                    "fund_size": fund_size,
-                    "company": company,
-                    "manager": manager,
-                    "experience_years": experience_years,
-                    "tracking_error": tracking_error,
-                    "rating": rating,
-                    "expense_ratio": expense_ratio,
-                    "establishment_date": establishment_date,
-                    "updated_at": datetime.now()
-                }
-                
-                # 检查数据库中是否已存在该基金
-                existing_fund = await self.db.funds.find_one({"code": fund_code})
-                
-                if existing_fund:
-                    # 更新现有记录
-                    await self.db.funds.update_one(
-                        {"code": fund_code},
-                        {"$set": fund_data}
-                    )
-                    logger.info(f"Updated fund details for {fund_code} - {fund_name}")
-                else:
-                    # 创建新记录
-                    fund_data["created_at"] = datetime.now()
-                    await self.db.funds.insert_one(fund_data)
-                    logger.info(f"Added new fund {fund_code} - {fund_name}")
+            fund_name = info["name"]
+            
+            # 基金经理页依赖主页中的经理链接
+            experience_years = 0.0
+            if info["manager_code"]:
+                experience_years = await self.fetch_stage(
+                    "manager", fund_code, f"http://fund.eastmoney.com/manager/{info['manager_code']}.html",
+                    parse_manager_page
+                )
+            
+            # 构建基金数据
+            fund_data = {
+                "code": fund_code,
+                "name": fund_name,
+                "type": "指数基金",
+                "tracking_index": info["tracking_index"],
+                "fund_size": info["fund_size"],
+                "company": info["company"],
+                "manager": info["manager"],
+                "experience_years": experience_years,
+                "tracking_error": tracking_error,
+                "rating": rating,
+                "expense_ratio": info["expense_ratio"],
+                "establishment_date": info["establishment_date"],
+            }
+            # 次要页面失败的字段不写入 $set，保留库中的值
+            insert_defaults = {}
+            for field, default in SECONDARY_DEFAULTS.items():
+                if fund_data[field] is None:
+                    del fund_data[field]
+                    insert_defaults[field] = default
+            
+            # 与库中的基金对比，未变化时不写库，updated_at 只在详情变化时更新
+            stored = await self.db.funds.find_one({"code": fund_code}, {"_id": 0, **{f: 1 for f in DETAIL_FIELDS}})
+            if stored is not None and all(stored.get(f) == fund_data[f] for f in DETAIL_FIELDS if f in fund_data):
+                self.skipped_writes += 1
+                logger.info(f"Fund details unchanged for {fund_code} - {fund_name}")
+                return True
+            
+            fund_data["updated_at"] = datetime.utcnow()
+            # 新基金同时写入创建时间和次要页面失败字段的默认值
+            await self.writer.upsert(
+                "funds",
+                {"code": fund_code},
+                {"$set": fund_data, "$setOnInsert": {"created_at": fund_data["updated_at"], **insert_defaults}}
+            )
+            logger.info(f"Updated fund details for {fund_code} - {fund_name}")
+            
+            return True
                 
         except Exception as e:
-            logger.error(f"Error crawling details for fund {fund_code}: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error crawling details for fund {fund_code}: {str(e)}")
+            return False
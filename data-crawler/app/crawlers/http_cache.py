@@ -0,0 +1,54 @@
+"""页面条件请求缓存
+
+按 URL 在 http_cache 集合中保存响应的校验信息（ETag/Last-Modified）、正文哈希和解析结果，
+多个爬虫副本共享：
+- 请求时带上 If-None-Match/If-Modified-Since，上游返回 304 时直接使用缓存的解析结果
+- 上游不支持条件请求时，正文哈希与缓存一致也跳过解析
+缓存写入经 BulkWriter 批量落库；长期未变化的条目由 TTL 索引清理，清理后只需重新解析一次。
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+HTTP_CACHE_COLLECTION = "http_cache"
+
+@dataclass
+class PageCacheMetrics:
+    not_modified: int = 0  # 304
+    unchanged: int = 0  # 200 但正文哈希未变
+    parsed: int = 0
+
+    def __str__(self):
+        return f"{self.not_modified} not modified, {self.unchanged} unchanged, {self.parsed} parsed"
+
+def body_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class HttpCache:
+    def __init__(self, db, writer):
+        self.collection = db[HTTP_CACHE_COLLECTION]
+        self.writer = writer
+        self.metrics = PageCacheMetrics()
+
+    async def get(self, url: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": url})
+
+    @staticmethod
+    def request_headers(entry: Optional[dict]) -> dict:
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def set(self, url: str, response_headers, digest: str, result):
+        await self.writer.upsert(HTTP_CACHE_COLLECTION, {"_id": url}, {"$set": {
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "body_hash": digest,
+            "result": result,
+            "updated_at": datetime.utcnow(),
+        }})
@@ -1,10 +1,23 @@
+import argparse
 import asyncio
 import os
 import logging
-from datetime import datetime, time, timedelta
+import signal
+from datetime import time
+from fund_common.events import create_publisher, events_from_writes, rabbitmq_parameters
+from fund_common.fund_stats import refresh_fund_stats
+from fund_common.indexes import ensure_indexes
+from fund_common.price_rollups import refresh_price_rollups
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.crawlers.engine import CrawlEngine, HostRateLimiter
 from app.crawlers.fund_crawler import FundCrawler
+from app.crawlers.parsers import DEFAULT_BACKEND, ParserPool
+from app.services.bulk_writer import BulkWriter, WriteFailed
+from app.services.crawl_scheduler import CrawlScheduler
+from app.services.metrics import start_metrics_server
+from app.services.task_queue import TaskLedger, create_task_queue, make_task
+from app.services.trading_calendar import TradingCalendar, market_now
 
 # 配置日志
 logging.basicConfig(
@@ -18,67 +31,280 @@ logger = logging.getLogger("data-crawler")
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "fund_tracker")
 FUND_CODES = os.getenv("FUND_CODES", "").split(",")  # 逗号分隔的基金代码列表
-CRAWL_INTERVAL = int(os.getenv("CRAWL_INTERVAL", "3600"))  # 爬取间隔(秒)，默认1小时
+UNIVERSE_REFRESH_INTERVAL = int(os.getenv("UNIVERSE_REFRESH_INTERVAL", "600"))  # 重新加载基金列表的间隔(秒)
+ESTIMATE_INTERVAL = int(os.getenv("ESTIMATE_INTERVAL", "60"))  # 交易时段内请求盘中估值的间隔(秒)
+NAV_CHECK_TIME = time.fromisoformat(os.getenv("NAV_CHECK_TIME", "18:00"))  # 交易日开始检查官方净值的时间
+NAV_RETRY_INTERVAL = int(os.getenv("NAV_RETRY_INTERVAL", "1800"))  # 净值尚未公布时的首次重试间隔(秒)
+DETAILS_TIME = time.fromisoformat(os.getenv("DETAILS_TIME", "17:00"))  # 交易日爬取基金详情的时间
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "10"))  # 同时爬取的基金数
+RATE_LIMIT = float(os.getenv("RATE_LIMIT", "5"))  # 每个域名每秒请求数
+RATE_BURST = int(os.getenv("RATE_BURST", "10"))  # 每个域名允许的突发请求数
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))  # 5xx/超时的最大重试次数
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", str(os.cpu_count() or 1)))  # 解析进程数，0表示在事件循环中解析
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", DEFAULT_BACKEND)  # lxml 或 html.parser
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))  # 批量写入条数
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))  # 批量写入最长间隔(秒)
+BACKFILL_ON_START = os.getenv("BACKFILL_ON_START", "true").lower() == "true"  # 启动时回填缺失的历史净值
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")  # 未配置时不发布变更事件
+RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
+RABBITMQ_PASSWORD = os.getenv("RABBITMQ_PASSWORD", "guest")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # /metrics 端口，0表示不启动
+STATS_REFRESH_INTERVAL = int(os.getenv("STATS_REFRESH_INTERVAL", "10"))  # worker 刷新 fund_stats 的间隔(秒)
 
-# 交易时间判断（9:30-15:00为交易时间）
-def is_trading_time():
-    now = datetime.now()
-    # 检查是否是工作日（周一至周五）
-    if now.weekday() >= 5:  # 5=周六, 6=周日
-        return False
+# 交易日历（周末和交易所休市日不爬取）
+CALENDAR = TradingCalendar.from_env()
+
+# 写入净值、需要刷新降采样文档的任务类型
+PRICE_TASKS = ("price", "backfill")
+
+def create_crawler(db, writer=None):
+    return FundCrawler(
+        db,
+        rate_limiter=HostRateLimiter(RATE_LIMIT, RATE_BURST),
+        max_retries=MAX_RETRIES,
+        parser=ParserPool(PARSER_WORKERS, PARSER_BACKEND),
+        writer=writer
+    )
+
+async def load_fund_codes(db):
+    # 如果没有配置基金代码，从数据库获取
+    fund_codes = FUND_CODES
+    if not fund_codes or (len(fund_codes) == 1 and not fund_codes[0]):
+        funds = await db.funds.find({}, {"_id": 0, "code": 1}).to_list(length=None)
+        fund_codes = [fund["code"] for fund in funds]
+    return fund_codes
+
+async def backfill(fund_codes=None):
+    """回填历史净值后退出：未回填完成的基金补齐最早日期之前的历史，并补齐最新日期之后的净值"""
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DATABASE_NAME]
+    await ensure_indexes(db)
     
-    # 检查是否在交易时间内
-    current_time = now.time()
-    morning_start = time(9, 30)
-    morning_end = time(11, 30)
-    afternoon_start = time(13, 0)
-    afternoon_end = time(15, 0)
+    fund_crawler = create_crawler(db)
+    try:
+        fund_codes = fund_codes or await load_fund_codes(db)
+        stats = await CrawlEngine(CRAWL_CONCURRENCY).run("backfill", fund_codes, fund_crawler.backfill_fund_prices)
+        await refresh_fund_stats(db, fund_codes)
+        await refresh_price_rollups(db, fund_codes)
+        return stats.failed == 0
+    finally:
+        await fund_crawler.close()
+        client.close()
+
+def create_scheduler(db):
+    return CrawlScheduler(
+        db,
+        CALENDAR,
+        lambda: load_fund_codes(db),
+        estimate_interval=ESTIMATE_INTERVAL,
+        nav_check_time=NAV_CHECK_TIME,
+        nav_retry_interval=NAV_RETRY_INTERVAL,
+        details_time=DETAILS_TIME,
+        universe_interval=UNIVERSE_REFRESH_INTERVAL,
+    )
+
+def create_writer(db):
+    """创建批量写入器，落库后把净值和详情的变更发布到 RabbitMQ；返回 (writer, publisher)"""
+    publisher = create_publisher(RABBITMQ_HOST, RABBITMQ_USER, RABBITMQ_PASSWORD)
+    on_write = None
+    if publisher is not None:
+        publisher.start()
+        
+        def on_write(collection, writes):
+            for event in events_from_writes(collection, writes):
+                publisher.publish(event)
     
-    return (morning_start <= current_time <= morning_end) or \
-           (afternoon_start <= current_time <= afternoon_end)
+    # 写入先缓冲，按条数或时间批量落库
+    writer = BulkWriter(db, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, on_write)
+    writer.start()
+    return writer, publisher
 
 async def start_crawling():
     # 连接数据库
     client = AsyncIOMotorClient(MONGO_URL)
     db = client[DATABASE_NAME]
+    await ensure_indexes(db)
     
-    fund_crawler = FundCrawler(db)
+    writer, publisher = create_writer(db)
+    fund_crawler = create_crawler(db, writer)
+    engine = CrawlEngine(CRAWL_CONCURRENCY)
     
-    # 如果没有配置基金代码，从数据库获取
-    fund_codes = FUND_CODES
-    if not fund_codes or (len(fund_codes) == 1 and not fund_codes[0]):
-        funds = await db.funds.find({}, {"code": 1}).to_list(length=100)
-        fund_codes = [fund["code"] for fund in funds]
+    # 收到 SIGTERM 时取消主任务，确保缓冲的数据写入后再退出
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    
+    scheduler = create_scheduler(db)
+    tasks = {
+        "estimate": fund_crawler.crawl_fund_estimate,
+        "price": fund_crawler.crawl_fund_price,
+        "details": fund_crawler.crawl_fund_details,
+        "backfill": fund_crawler.backfill_fund_prices,
+    }
     
-    logger.info(f"Starting crawler with fund codes: {fund_codes}")
+    async def run_cycle(kind, fund_codes):
+        # 请求频率由按域名的令牌桶限制
+        await engine.run(kind, fund_codes, tasks[kind])
+        await writer.flush()
+        logger.info(f"Write stats: {writer.metrics}")
+        if kind == "details":
+            logger.info(f"Detail pages: {fund_crawler.http_cache.metrics}, "
+                        f"{fund_crawler.skipped_writes} unchanged funds not rewritten")
+        # 写入落库后更新筛选用的 fund_stats（盘中估值不影响统计）和净值降采样文档
+        if kind != "estimate":
+            await refresh_fund_stats(db, fund_codes)
+        if kind in PRICE_TASKS:
+            await refresh_price_rollups(db, fund_codes)
+    
+    try:
+        if BACKFILL_ON_START:
+            # 新加入的基金一次性补齐历史净值，已有历史的基金只需请求一页
+            await run_cycle("backfill", await load_fund_codes(db))
+        
+        while True:
+            try:
+                # 只爬取到期的基金，休眠到下一个任务到期
+                for kind, fund_codes in (await scheduler.due_tasks()).items():
+                    logger.info(f"Crawling {kind} for {len(fund_codes)} funds...")
+                    await run_cycle(kind, fund_codes)
+                await asyncio.sleep(max(scheduler.next_wakeup(), 1))
+            
+            except Exception as e:
+                logger.error(f"Error during crawling: {str(e)}")
+                await asyncio.sleep(60)  # 发生错误后暂停一分钟
+    finally:
+        await writer.close()
+        logger.info(f"Crawler stopped, write stats: {writer.metrics}")
+        if publisher is not None:
+            publisher.close()
+        await fund_crawler.close()
+        client.close()
+
+async def enqueue(queue, ledger, kind, fund_codes):
+    """发布当天尚未登记的任务"""
+    date = market_now().strftime("%Y-%m-%d")
+    published = 0
+    for code in fund_codes:
+        task = make_task(kind, code, date)
+        if await ledger.claim(task):
+            await queue.publish(task)
+            published += 1
+    logger.info(f"Scheduled {published} {kind} tasks ({len(fund_codes) - published} already queued or done)")
+
+async def schedule_forever(db, queue):
+    """调度进程：把到期的任务发布到任务队列，本身不爬取"""
+    ledger = TaskLedger(db.crawl_tasks)
+    scheduler = create_scheduler(db)
+    
+    if BACKFILL_ON_START:
+        await enqueue(queue, ledger, "backfill", await load_fund_codes(db))
     
     while True:
         try:
-            # 检查是否为交易时间，如果是则更频繁爬取
-            if is_trading_time():
-                logger.info("Trading time detected, crawling fund prices...")
-                for code in fund_codes:
-                    await fund_crawler.crawl_fund_price(code)
-                
-                # 交易时间内每5分钟爬取一次
-                await asyncio.sleep(300)
-            else:
-                # 爬取基金详情（每天一次即可）
-                current_time = datetime.now().time()
-                if time(17, 0) <= current_time <= time(18, 0):
-                    logger.info("Crawling fund details...")
-                    for code in fund_codes:
-                        await fund_crawler.crawl_fund_details(code)
-                        await asyncio.sleep(1)  # 避免请求过于频繁
-                
-                # 非交易时间按配置的间隔爬取
-                logger.info(f"Not trading time, sleeping for {CRAWL_INTERVAL} seconds...")
-                await asyncio.sleep(CRAWL_INTERVAL)
-        
+            for kind, fund_codes in (await scheduler.due_tasks()).items():
+                await enqueue(queue, ledger, kind, fund_codes)
+            await asyncio.sleep(max(scheduler.next_wakeup(), 1))
         except Exception as e:
-            logger.error(f"Error during crawling: {str(e)}")
-            await asyncio.sleep(60)  # 发生错误后暂停一分钟
+            logger.error(f"Error scheduling tasks: {str(e)}")
+            await asyncio.sleep(60)
+
+async def work_forever(db, queue):
+    """worker：消费任务，写入落库后才确认，并定期刷新受影响基金的 fund_stats"""
+    ledger = TaskLedger(db.crawl_tasks)
+    writer, publisher = create_writer(db)
+    fund_crawler = create_crawler(db, writer)
+    tasks = {
+        "estimate": fund_crawler.crawl_fund_estimate,
+        "price": fund_crawler.crawl_fund_price,
+        "details": fund_crawler.crawl_fund_details,
+        "backfill": fund_crawler.backfill_fund_prices,
+    }
+    updated_codes = set()
+    price_codes = set()
+    
+    async def handle(task):
+        with writer.track() as writes:
+            ok = await tasks[task["kind"]](task["code"])
+        if ok:
+            try:
+                await writer.wait_flushed(writes)
+            except WriteFailed as e:
+                # 写入未落库时不确认任务，由队列重试
+                logger.error(f"Task {task['kind']}:{task['code']} writes lost: {str(e)}")
+                ok = False
+        if ok:
+            await ledger.complete(task)
+            if task["kind"] != "estimate":
+                updated_codes.add(task["code"])
+            if task["kind"] in PRICE_TASKS:
+                price_codes.add(task["code"])
+        elif not queue.should_retry(task):
+            await ledger.fail(task)
+        return ok
+    
+    async def refresh_stats_periodically():
+        while True:
+            await asyncio.sleep(STATS_REFRESH_INTERVAL)
+            codes, rollup_codes = list(updated_codes), list(price_codes)
+            updated_codes.clear()
+            price_codes.clear()
+            try:
+                await refresh_fund_stats(db, codes)
+                await refresh_price_rollups(db, rollup_codes)
+            except Exception as e:
+                logger.error(f"Error refreshing fund stats: {str(e)}")
+    
+    refresher = asyncio.create_task(refresh_stats_periodically())
+    try:
+        await queue.consume(handle, CRAWL_CONCURRENCY)
+    finally:
+        refresher.cancel()
+        await writer.close()
+        logger.info(f"Worker stopped, write stats: {writer.metrics}")
+        await refresh_fund_stats(db, updated_codes)
+        await refresh_price_rollups(db, price_codes)
+        if publisher is not None:
+            publisher.close()
+        await fund_crawler.close()
+
+async def run_task_queue(schedule=True, work=True):
+    """schedule/work 分别运行调度进程和 worker；两者都运行时未配置 RabbitMQ 也可使用进程内队列"""
+    parameters = rabbitmq_parameters(RABBITMQ_HOST, RABBITMQ_USER, RABBITMQ_PASSWORD) if RABBITMQ_HOST else None
+    if parameters is None and not (schedule and work):
+        raise SystemExit("RABBITMQ_HOST is required to run the scheduler and workers separately")
+    
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DATABASE_NAME]
+    await ensure_indexes(db)
+    queue = create_task_queue(parameters)
+    
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        jobs = []
+        if schedule:
+            jobs.append(schedule_forever(db, queue))
+        if work:
+            jobs.append(work_forever(db, queue))
+        await asyncio.gather(*jobs)
+    finally:
+        await queue.close()
+        client.close()
 
 if __name__ == "__main__":
-    logger.info("Data crawler service starting...")
-    asyncio.run(start_crawling())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fund data crawler")
+    # crawl: 单进程按时间爬取；schedule/work: 调度进程和可水平扩展的 worker；queue: 二者在同一进程中运行
+    parser.add_argument("mode", nargs="?", choices=["crawl", "backfill", "schedule", "work", "queue"], default="crawl")
+    parser.add_argument("codes", nargs="*", help="fund codes to backfill, defaults to FUND_CODES or all funds")
+    args = parser.parse_args()
+    
+    if args.mode == "backfill":
+        logger.info("Backfilling fund price history...")
+        raise SystemExit(0 if asyncio.run(backfill(args.codes)) else 1)
+    
+    logger.info(f"Data crawler service starting in {args.mode} mode...")
+    start_metrics_server(METRICS_PORT)
+    try:
+        if args.mode == "crawl":
+            asyncio.run(start_crawling())
+        else:
+            asyncio.run(run_task_queue(schedule=args.mode != "work", work=args.mode != "schedule"))
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        logger.info("Data crawler service stopped")
\ No newline at end of file
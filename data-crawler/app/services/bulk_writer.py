@@ -0,0 +1,208 @@
+"""批量写入
+
+爬虫的 upsert 先写入内存缓冲，按条数或时间间隔合并为无序 bulk_write，
+同一条记录在缓冲期内的多次更新会合并成一次写入。
+写入成功的记录以 (query, update) 列表交给 on_write 回调（如发布变更事件）。
+在 track() 中缓冲的写入会被记录下来，wait_flushed 等待这些写入落库，有写入失败时抛出 WriteFailed。
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.services.metrics import WRITE_DURATION, WRITE_OPERATIONS
+
+logger = logging.getLogger("bulk-writer")
+
+class WriteFailed(Exception):
+    """记录的写入有未能落库的部分"""
+
+@dataclass
+class TrackedWrites:
+    """一个任务缓冲的写入：尚未刷新的记录数和写入失败的记录"""
+    pending: int = 0
+    failed: List[tuple] = field(default_factory=list)
+
+# 当前任务（及其创建的子任务）的写入记录，未调用 track() 时为 None
+_tracked_writes: ContextVar[Optional[TrackedWrites]] = ContextVar("tracked_writes", default=None)
+
+@dataclass
+class WriteMetrics:
+    flushes: int = 0
+    operations: int = 0
+    upserted: int = 0
+    modified: int = 0
+    failed: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def avg_latency(self):
+        return self.total_latency / self.flushes if self.flushes else 0.0
+
+    def __str__(self):
+        return (f"{self.operations} writes in {self.flushes} bulk calls "
+                f"({self.upserted} upserted, {self.modified} modified, {self.failed} failed), "
+                f"latency avg {self.avg_latency * 1000:.1f}ms max {self.max_latency * 1000:.1f}ms")
+
+class BulkWriter:
+    def __init__(self, db, batch_size=500, flush_interval=2.0, on_write=None):
+        self.db = db
+        self.on_write = on_write
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.buffers = {}
+        self.trackers = {}  # (collection, key) -> 记录了该写入的 TrackedWrites
+        self.pending = 0
+        self.metrics = WriteMetrics()
+        self.lock = asyncio.Lock()
+        self.task = None
+        self.flush_waiters = []
+
+    def start(self):
+        """启动定时刷新任务"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        """停止定时刷新并写入剩余数据"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+    @contextmanager
+    def track(self):
+        """记录上下文中缓冲的写入，交给 wait_flushed 确认是否全部落库"""
+        writes = TrackedWrites()
+        token = _tracked_writes.set(writes)
+        try:
+            yield writes
+        finally:
+            _tracked_writes.reset(token)
+
+    async def upsert(self, collection, query, update):
+        buffer = self.buffers.setdefault(collection, {})
+        key = tuple(sorted(query.items()))
+
+        writes = _tracked_writes.get()
+        if writes is not None:
+            trackers = self.trackers.setdefault((collection, key), [])
+            if not any(tracker is writes for tracker in trackers):
+                trackers.append(writes)
+                writes.pending += 1
+
+        if key in buffer:
+            # 合并缓冲期内对同一记录的更新
+            merged = buffer[key]
+            for operator, fields in update.items():
+                merged.setdefault(operator, {}).update(fields)
+            # 同一字段同时出现在 $set 和 $setOnInsert 时 Mongo 会拒绝写入，以 $set 为准
+            if "$set" in merged and "$setOnInsert" in merged:
+                for name in merged["$set"]:
+                    merged["$setOnInsert"].pop(name, None)
+        else:
+            buffer[key] = {operator: dict(fields) for operator, fields in update.items()}
+            self.pending += 1
+
+        if self.pending >= self.batch_size:
+            await self.flush()
+
+    async def wait_flushed(self, writes: TrackedWrites):
+        """等待 track() 记录的写入被刷新（由定时或批满的刷新完成），有写入失败时抛出 WriteFailed"""
+        while writes.pending:
+            waiter = asyncio.get_running_loop().create_future()
+            self.flush_waiters.append(waiter)
+            await waiter
+        if writes.failed:
+            collection, key = writes.failed[0]
+            raise WriteFailed(f"{len(writes.failed)} writes failed, e.g. {collection} {dict(key)}")
+
+    async def flush(self):
+        async with self.lock:
+            buffers, self.buffers, self.pending = self.buffers, {}, 0
+            trackers, self.trackers = self.trackers, {}
+            failed = set()
+            written = set()
+            try:
+                for collection, buffer in buffers.items():
+                    if buffer:
+                        failed.update((collection, key) for key in await self._write(collection, buffer))
+                    written.add(collection)
+            finally:
+                # 未执行到的集合（刷新被取消等）按失败处理
+                for (collection, key), tracked in trackers.items():
+                    for writes in tracked:
+                        writes.pending -= 1
+                        if collection not in written or (collection, key) in failed:
+                            writes.failed.append((collection, key))
+                # 刷新结束后唤醒等待者，由等待者检查自己的写入是否都已刷新
+                waiters, self.flush_waiters = self.flush_waiters, []
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    async def _write(self, collection, buffer):
+        """执行一次 bulk_write，返回写入失败的记录 key"""
+        operations = [UpdateOne(dict(key), update, upsert=True) for key, update in buffer.items()]
+        failed_indexes = set()
+        started_at = time.monotonic()
+        try:
+            result = await self.db[collection].bulk_write(operations, ordered=False)
+            upserted, modified, failed = result.upserted_count, result.modified_count, 0
+        except BulkWriteError as e:
+            # 无序写入时其余操作仍会执行，只记录失败的部分
+            details = e.details
+            upserted, modified = details.get("nUpserted", 0), details.get("nModified", 0)
+            errors = details.get("writeErrors", [])
+            failed = len(errors)
+            failed_indexes = {error.get("index") for error in errors}
+            for error in errors[:5]:
+                logger.error(f"Bulk write to {collection} failed for {error.get('op', {}).get('q')}: {error.get('errmsg')}")
+            logger.error(f"{failed}/{len(operations)} writes to {collection} failed")
+        except Exception as e:
+            upserted, modified, failed = 0, 0, len(operations)
+            failed_indexes = set(range(len(operations)))
+            logger.error(f"Bulk write to {collection} failed: {str(e)}")
+
+        latency = time.monotonic() - started_at
+        WRITE_DURATION.labels(collection).observe(latency)
+        WRITE_OPERATIONS.labels(collection, "ok").inc(len(operations) - failed)
+        if failed:
+            WRITE_OPERATIONS.labels(collection, "failed").inc(failed)
+        self.metrics.flushes += 1
+        self.metrics.operations += len(operations)
+        self.metrics.upserted += upserted
+        self.metrics.modified += modified
+        self.metrics.failed += failed
+        self.metrics.total_latency += latency
+        self.metrics.max_latency = max(self.metrics.max_latency, latency)
+
+        if self.on_write is not None and len(failed_indexes) < len(operations):
+            try:
+                self.on_write(collection, [
+                    (dict(key), update) for i, (key, update) in enumerate(buffer.items()) if i not in failed_indexes
+                ])
+            except Exception as e:
+                logger.error(f"Error handling writes to {collection}: {str(e)}")
+
+        keys = list(buffer)
+        return [keys[i] for i in failed_indexes if i is not None]
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing bulk writes: {str(e)}")
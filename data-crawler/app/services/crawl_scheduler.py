@@ -0,0 +1,152 @@
+"""按基金的自适应爬取调度
+
+为每只基金的每类任务维护下次到期时间，只爬取到期的基金：
+- estimate: 交易时段内每 estimate_interval 秒请求一次盘中估值（fundgz 单行 JSON），
+  非交易时段推迟到下一个交易时段开始
+- price: 官方净值每个交易日晚上公布一次，nav_check_time 之后才检查；
+  已存储当日净值的基金直接跳到下一个交易日，尚未公布的按指数退避重试
+- details: 每个交易日 details_time 之后一次
+- backfill: 运行期间新加入的基金立即回填一次历史净值（启动时已有的基金由 BACKFILL_ON_START 回填）
+基金列表每 universe_interval 秒重新加载，新增的基金按上述规则加入调度，删除的基金移出调度。
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.services.trading_calendar import TradingCalendar, market_now
+
+logger = logging.getLogger("fund-crawler.scheduler")
+
+RECURRING_TASK_KINDS = ("estimate", "price", "details")
+TASK_KINDS = RECURRING_TASK_KINDS + ("backfill",)
+
+class CrawlScheduler:
+    def __init__(
+        self,
+        db,
+        calendar: TradingCalendar,
+        load_codes: Callable[[], Awaitable[List[str]]],
+        estimate_interval: int = 60,
+        nav_check_time: time = time(18, 0),
+        nav_retry_interval: int = 1800,
+        nav_retry_max: int = 4 * 3600,
+        details_time: time = time(17, 0),
+        universe_interval: int = 600,
+    ):
+        self.db = db
+        self.calendar = calendar
+        self.load_codes = load_codes
+        self.estimate_interval = timedelta(seconds=estimate_interval)
+        self.nav_check_time = nav_check_time
+        self.nav_retry_interval = nav_retry_interval
+        self.nav_retry_max = nav_retry_max
+        self.details_time = details_time
+        self.universe_interval = timedelta(seconds=universe_interval)
+        self.next_due: Dict[str, Dict[str, datetime]] = {kind: {} for kind in TASK_KINDS}
+        self.nav_retries: Dict[str, int] = {}
+        self.universe_due: Optional[datetime] = None
+
+    @property
+    def fund_codes(self) -> List[str]:
+        return list(self.next_due["price"])
+
+    def nav_date(self, now: datetime) -> date:
+        """now 时应已公布官方净值的最近交易日"""
+        day = self.calendar.previous_trading_day(now.date())
+        if now < datetime.combine(day, self.nav_check_time):
+            day = self.calendar.previous_trading_day(day - timedelta(days=1))
+        return day
+
+    def next_details_time(self, now: datetime) -> datetime:
+        day = now.date()
+        if not self.calendar.is_trading_day(day) or now >= datetime.combine(day, self.details_time):
+            day = self.calendar.next_trading_day(day)
+        return datetime.combine(day, self.details_time)
+
+    def first_due(self, kind: str, now: datetime) -> datetime:
+        if kind == "estimate":
+            return self.calendar.next_session_start(now)
+        if kind == "details":
+            return self.next_details_time(now)
+        return now  # 先检查数据库中是否已有最新净值
+
+    async def refresh_universe(self, now: datetime):
+        codes = set(await self.load_codes())
+        new_codes = codes - set(self.next_due["price"])
+        for kind, due in self.next_due.items():
+            for code in set(due) - codes:
+                del due[code]
+            if kind in RECURRING_TASK_KINDS:
+                for code in new_codes:
+                    due[code] = self.first_due(kind, now)
+        if self.universe_due is not None:
+            # 首次加载之后出现的基金没有历史净值，安排一次性回填
+            for code in new_codes:
+                self.next_due["backfill"][code] = now
+        for code in set(self.nav_retries) - codes:
+            del self.nav_retries[code]
+        self.universe_due = now + self.universe_interval
+        logger.info(f"Scheduling {len(codes)} funds")
+
+    async def due_tasks(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """返回到期的 {任务类型: 基金代码列表}，并为这些基金安排下次到期时间"""
+        now = now or market_now()
+        if self.universe_due is None or now >= self.universe_due:
+            await self.refresh_universe(now)
+
+        tasks = {}
+        for kind, due in self.next_due.items():
+            codes = [code for code, when in due.items() if when <= now]
+            if kind == "price":
+                codes = await self._missing_navs(codes, now)
+            elif kind == "estimate":
+                trading = self.calendar.is_trading_time(now)
+                for code in codes:
+                    due[code] = self.calendar.next_session_start(now + self.estimate_interval if trading else now)
+                if not trading:  # 休眠跨过了交易时段的结束
+                    codes = []
+            elif kind == "details":
+                for code in codes:
+                    due[code] = self.next_details_time(now)
+            elif kind == "backfill":
+                for code in codes:
+                    del due[code]
+            if codes:
+                tasks[kind] = codes
+        return tasks
+
+    async def _missing_navs(self, codes: List[str], now: datetime) -> List[str]:
+        """过滤掉已存储最新净值的基金；其余基金按退避间隔安排下次检查"""
+        if not codes:
+            return []
+        nav_date = self.nav_date(now)
+        stored = set(await self.db.fund_prices.distinct(
+            "fund_code", {"fund_code": {"$in": codes}, "date": datetime.combine(nav_date, time())}
+        ))
+        next_publish = datetime.combine(self.calendar.next_trading_day(nav_date), self.nav_check_time)
+
+        missing = []
+        due = self.next_due["price"]
+        for code in codes:
+            if code in stored:
+                due[code] = next_publish
+                self.nav_retries.pop(code, None)
+                continue
+            # 尚未公布时逐次加倍重试间隔；QDII 等 T+1/T+2 公布的基金按上限间隔检查
+            retries = self.nav_retries.get(code, 0)
+            delay = min(self.nav_retry_interval * 2 ** retries, self.nav_retry_max)
+            due[code] = now + timedelta(seconds=delay)
+            self.nav_retries[code] = retries + 1
+            missing.append(code)
+        logger.info(f"{len(stored)} funds already have NAV for {nav_date}, {len(missing)} to fetch")
+        return missing
+
+    def next_wakeup(self, now: Optional[datetime] = None) -> float:
+        """距最早到期的任务或基金列表刷新的秒数"""
+        now = now or market_now()
+        times = [when for due in self.next_due.values() for when in due.values()]
+        if self.universe_due is not None:
+            times.append(self.universe_due)
+        if not times:
+            return self.universe_interval.total_seconds()
+        return max((min(times) - now).total_seconds(), 0)
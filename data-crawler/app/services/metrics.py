@@ -0,0 +1,55 @@
+"""爬虫的 Prometheus 指标
+
+按页面类型统计请求耗时和上游状态码，按解析函数统计解析耗时，按集合统计批量写入耗时，
+按任务类型统计爬取结果。start_metrics_server 在独立线程中提供 /metrics。
+"""
+import logging
+import re
+
+from prometheus_client import Counter, Histogram, start_http_server
+
+logger = logging.getLogger("fund-crawler.metrics")
+
+FETCH_DURATION = Histogram(
+    "crawler_fetch_duration_seconds", "Upstream request latency including retries", ["page"]
+)
+UPSTREAM_RESPONSES = Counter(
+    "crawler_upstream_responses_total", "Upstream responses by status, or timeout/error", ["page", "status"]
+)
+PARSE_DURATION = Histogram(
+    "crawler_parse_duration_seconds", "Page parse latency", ["parser"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PAGE_CACHE = Counter(
+    "crawler_page_cache_total", "Conditional detail page requests by outcome", ["result"]
+)
+WRITE_DURATION = Histogram(
+    "crawler_write_duration_seconds", "Bulk write latency", ["collection"]
+)
+WRITE_OPERATIONS = Counter(
+    "crawler_write_operations_total", "Write operations by outcome", ["collection", "result"]
+)
+TASKS = Counter(
+    "crawler_tasks_total", "Crawl tasks by kind and outcome", ["kind", "result"]
+)
+
+# URL 特征 -> 页面类型，按顺序匹配
+PAGE_TYPES = [
+    (re.compile(r"type=lsjz"), "lsjz"),
+    (re.compile(r"fundgz\."), "estimate"),
+    (re.compile(r"/tsdata_"), "tracking"),
+    (re.compile(r"/jjpj_"), "rating"),
+    (re.compile(r"/manager/"), "manager"),
+    (re.compile(r"fund\.eastmoney\.com/\d+\.html"), "fund"),
+]
+
+def page_type(url: str) -> str:
+    for pattern, name in PAGE_TYPES:
+        if pattern.search(url):
+            return name
+    return "other"
+
+def start_metrics_server(port: int):
+    if port > 0:
+        start_http_server(port)
+        logger.info(f"Serving metrics on :{port}/metrics")
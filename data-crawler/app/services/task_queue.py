@@ -0,0 +1,261 @@
+"""爬取任务队列
+
+调度进程把每只基金的爬取工作作为任务 {"kind", "code", "date", "attempt"} 发布到队列，
+多个 worker 副本共同消费，吞吐随副本数线性增加：
+- 去重：发布前在 crawl_tasks 中以 kind:code:date 为 _id 登记，已登记的任务不再发布；
+  price 任务完成后删除登记，details/backfill 任务当天只执行一次；登记由 TTL 索引过期清理
+- 确认：任务执行成功且写入落库后才 ack，worker 崩溃时 RabbitMQ 把未确认的任务重新投递
+- 重试：失败的任务经延迟队列重新进入任务队列，超过 MAX_TASK_ATTEMPTS 次后进入死信队列
+- 公平：prefetch 限制每个 worker 同时持有的任务数
+
+未配置 RabbitMQ 时使用进程内的 LocalTaskQueue，语义相同但不持久。
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app.services.metrics import TASKS
+
+logger = logging.getLogger("fund-crawler.task-queue")
+
+TASK_QUEUE = "crawl.tasks"
+RETRY_QUEUE = "crawl.tasks.retry"
+DEAD_LETTER_EXCHANGE = "crawl.tasks.dlx"
+DEAD_LETTER_QUEUE = "crawl.tasks.dead"
+
+MAX_TASK_ATTEMPTS = int(os.getenv("MAX_TASK_ATTEMPTS", "3"))
+TASK_RETRY_DELAY = int(os.getenv("TASK_RETRY_DELAY", "60"))  # 失败任务重新入队前的延迟(秒)
+TASK_TIMEOUT = int(os.getenv("TASK_TIMEOUT", "3600"))  # 登记后超过该时间未完成的任务可重新发布(秒)
+RECONNECT_DELAY = 5
+
+# 每天只需执行一次的任务类型，完成后保留登记直到次日
+DAILY_TASK_KINDS = {"details", "backfill"}
+
+TaskHandler = Callable[[dict], Awaitable[bool]]
+
+def make_task(kind: str, code: str, date: str) -> dict:
+    return {"kind": kind, "code": code, "date": date, "attempt": 0}
+
+def task_id(task: dict) -> str:
+    return f"{task['kind']}:{task['code']}:{task['date']}"
+
+class TaskLedger:
+    """crawl_tasks 集合中的任务登记，用于跨调度进程和 worker 去重"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def claim(self, task: dict) -> bool:
+        """登记任务，已有未过期的同一任务时返回 False"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": task_id(task),
+                "status": "queued",
+                "queued_at": now,
+                "expires_at": now + timedelta(seconds=TASK_TIMEOUT),
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def complete(self, task: dict):
+        if task["kind"] in DAILY_TASK_KINDS:
+            await self.collection.update_one({"_id": task_id(task)}, {"$set": {
+                "status": "done",
+                "expires_at": datetime.utcnow() + timedelta(days=1),
+            }})
+        else:
+            await self.collection.delete_one({"_id": task_id(task)})
+
+    async def fail(self, task: dict):
+        """最终失败的任务删除登记，下一轮调度可以重新发布"""
+        await self.collection.delete_one({"_id": task_id(task)})
+
+class TaskQueueBase:
+    async def run_task(self, handler: TaskHandler, task: dict) -> bool:
+        try:
+            ok = bool(await handler(task))
+        except Exception as e:
+            logger.error(f"Error running task {task_id(task)}: {str(e)}")
+            ok = False
+        TASKS.labels(task["kind"], "ok" if ok else "failed").inc()
+        return ok
+
+    @staticmethod
+    def should_retry(task: dict) -> bool:
+        return task.get("attempt", 0) + 1 < MAX_TASK_ATTEMPTS
+
+    @staticmethod
+    def next_attempt(task: dict) -> dict:
+        return dict(task, attempt=task.get("attempt", 0) + 1)
+
+class LocalTaskQueue(TaskQueueBase):
+    """进程内的任务队列，用于单进程运行和测试"""
+
+    def __init__(self, retry_delay: float = TASK_RETRY_DELAY):
+        self.queue = asyncio.Queue()
+        self.retry_delay = retry_delay
+        self.dead: List[dict] = []
+
+    async def publish(self, task: dict):
+        await self.queue.put(task)
+
+    async def consume(self, handler: TaskHandler, prefetch: int):
+        async def worker():
+            while True:
+                task = await self.queue.get()
+                try:
+                    if await self.run_task(handler, task):
+                        continue
+                    if self.should_retry(task):
+                        asyncio.get_running_loop().call_later(
+                            self.retry_delay, self.queue.put_nowait, self.next_attempt(task)
+                        )
+                    else:
+                        logger.error(f"Task {task_id(task)} failed {MAX_TASK_ATTEMPTS} times, dead-lettered")
+                        self.dead.append(task)
+                finally:
+                    self.queue.task_done()
+
+        await asyncio.gather(*(worker() for _ in range(max(prefetch, 1))))
+
+    async def close(self):
+        pass
+
+class RabbitMQTaskQueue(TaskQueueBase):
+    """基于 RabbitMQ 持久队列的任务队列。
+
+    pika 为阻塞式客户端：发布在单线程执行器中串行执行；消费在独立线程中运行，
+    任务交给事件循环执行，完成后通过 add_callback_threadsafe 回到消费线程 ack。
+    """
+
+    def __init__(self, parameters, retry_delay: int = TASK_RETRY_DELAY):
+        self.parameters = parameters
+        self.retry_delay = retry_delay
+        self.publisher = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stopping = threading.Event()
+        self.consumer_connection = None
+
+    def _connect(self):
+        import pika
+
+        connection = pika.BlockingConnection(self.parameters)
+        channel = connection.channel()
+        # 超过重试次数的任务被 nack 后经死信交换机进入死信队列
+        channel.exchange_declare(DEAD_LETTER_EXCHANGE, exchange_type="fanout", durable=True)
+        channel.queue_declare(DEAD_LETTER_QUEUE, durable=True)
+        channel.queue_bind(DEAD_LETTER_QUEUE, DEAD_LETTER_EXCHANGE)
+        channel.queue_declare(TASK_QUEUE, durable=True, arguments={
+            "x-dead-letter-exchange": DEAD_LETTER_EXCHANGE,
+        })
+        # 重试队列无消费者，消息过期后回到任务队列，实现延迟重试
+        channel.queue_declare(RETRY_QUEUE, durable=True, arguments={
+            "x-message-ttl": self.retry_delay * 1000,
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": TASK_QUEUE,
+        })
+        return connection, channel
+
+    @staticmethod
+    def _properties():
+        import pika
+
+        return pika.BasicProperties(content_type="application/json", delivery_mode=2)
+
+    def _publish_sync(self, task: dict):
+        for attempt in range(2):
+            try:
+                if self.publisher is None:
+                    self.publisher = self._connect()
+                _, channel = self.publisher
+                channel.basic_publish("", TASK_QUEUE, json.dumps(task).encode(), self._properties())
+                return
+            except Exception:
+                # 连接断开时重连后再试一次
+                self._close_publisher()
+                if attempt:
+                    raise
+
+    def _close_publisher(self):
+        if self.publisher is not None:
+            try:
+                self.publisher[0].close()
+            except Exception:
+                pass
+            self.publisher = None
+
+    async def publish(self, task: dict):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._publish_sync, task)
+
+    async def consume(self, handler: TaskHandler, prefetch: int):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._consume_forever, loop, handler, prefetch)
+
+    def _consume_forever(self, loop, handler: TaskHandler, prefetch: int):
+        while not self.stopping.is_set():
+            try:
+                connection, channel = self._connect()
+                self.consumer_connection = connection
+                channel.basic_qos(prefetch_count=max(prefetch, 1))
+
+                def on_message(channel, method, properties, body):
+                    try:
+                        task = json.loads(body)
+                    except ValueError:
+                        logger.error(f"Dropping malformed task: {body[:100]!r}")
+                        channel.basic_nack(method.delivery_tag, requeue=False)
+                        return
+                    future = asyncio.run_coroutine_threadsafe(self.run_task(handler, task), loop)
+                    future.add_done_callback(lambda done: connection.add_callback_threadsafe(
+                        partial(self._settle, channel, method.delivery_tag, task, done)
+                    ))
+
+                channel.basic_consume(TASK_QUEUE, on_message)
+                channel.start_consuming()
+            except Exception as e:
+                if self.stopping.is_set():
+                    break
+                # 未确认的任务会被重新投递
+                logger.error(f"Error consuming tasks: {str(e)}")
+                self.stopping.wait(RECONNECT_DELAY)
+            finally:
+                self.consumer_connection = None
+
+    def _settle(self, channel, delivery_tag, task: dict, done):
+        """在消费线程中确认任务"""
+        ok = not done.cancelled() and done.exception() is None and done.result()
+        if ok:
+            channel.basic_ack(delivery_tag)
+        elif self.should_retry(task):
+            channel.basic_publish("", RETRY_QUEUE, json.dumps(self.next_attempt(task)).encode(), self._properties())
+            channel.basic_ack(delivery_tag)
+        else:
+            logger.error(f"Task {task_id(task)} failed {MAX_TASK_ATTEMPTS} times, dead-lettered")
+            channel.basic_nack(delivery_tag, requeue=False)
+
+    async def close(self):
+        self.stopping.set()
+        connection = self.consumer_connection
+        if connection is not None:
+            try:
+                connection.add_callback_threadsafe(connection.close)
+            except Exception:
+                pass
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._close_publisher)
+        self.executor.shutdown(wait=False)
+
+def create_task_queue(parameters=None):
+    """传入 RabbitMQ 连接参数时使用 RabbitMQ，否则使用进程内队列"""
+    if parameters is not None:
+        return RabbitMQTaskQueue(parameters)
+    return LocalTaskQueue()
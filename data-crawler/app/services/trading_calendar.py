@@ -0,0 +1,108 @@
+"""A 股交易日历
+
+交易日为除周末和交易所休市日以外的日期，交易时段为 9:30-11:30、13:00-15:00（交易所当地时间）。
+日期和时间均为不带时区的交易所当地时间，由 market_now 取得，与容器的 TZ 设置无关。
+HOLIDAYS 为沪深交易所公布的休市安排（只列工作日），每年年底交易所公布次年安排后需补充；
+临时休市或尚未收录的年份可通过 MARKET_HOLIDAYS 环境变量（逗号分隔的日期）补充。
+"""
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Set, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger("fund-crawler.trading-calendar")
+
+MARKET_TIMEZONE = ZoneInfo(os.getenv("MARKET_TIMEZONE", "Asia/Shanghai"))  # 交易所所在时区
+SESSIONS = ((time(9, 30), time(11, 30)), (time(13, 0), time(15, 0)))
+
+# 休市日期区间（含两端），周末自动排除
+HOLIDAYS = {
+    2024: [
+        ("2024-01-01", "2024-01-01"),  # 元旦
+        ("2024-02-09", "2024-02-16"),  # 春节
+        ("2024-04-04", "2024-04-05"),  # 清明节
+        ("2024-05-01", "2024-05-03"),  # 劳动节
+        ("2024-06-10", "2024-06-10"),  # 端午节
+        ("2024-09-16", "2024-09-17"),  # 中秋节
+        ("2024-10-01", "2024-10-07"),  # 国庆节
+    ],
+    2025: [
+        ("2025-01-01", "2025-01-01"),
+        ("2025-01-28", "2025-02-04"),
+        ("2025-04-04", "2025-04-04"),
+        ("2025-05-01", "2025-05-05"),
+        ("2025-06-02", "2025-06-02"),
+        ("2025-10-01", "2025-10-08"),  # 国庆节、中秋节
+    ],
+    2026: [
+        ("2026-01-01", "2026-01-02"),
+        ("2026-02-16", "2026-02-23"),
+        ("2026-04-06", "2026-04-06"),
+        ("2026-05-01", "2026-05-05"),
+        ("2026-06-19", "2026-06-19"),
+        ("2026-09-25", "2026-09-25"),
+        ("2026-10-01", "2026-10-07"),
+    ],
+}
+
+def market_now() -> datetime:
+    """当前的交易所当地时间（不带时区）"""
+    return datetime.now(MARKET_TIMEZONE).replace(tzinfo=None)
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value.strip(), "%Y-%m-%d").date()
+
+def _expand(ranges: Iterable[Tuple[str, str]]) -> Set[date]:
+    days = set()
+    for start, end in ranges:
+        day, end = _parse_date(start), _parse_date(end)
+        while day <= end:
+            days.add(day)
+            day += timedelta(days=1)
+    return days
+
+class TradingCalendar:
+    def __init__(self, holidays: Iterable[date] = ()):
+        self.holidays = set(holidays)
+        for ranges in HOLIDAYS.values():
+            self.holidays |= _expand(ranges)
+        self.warned_years = set()
+
+    @classmethod
+    def from_env(cls) -> "TradingCalendar":
+        extra = os.getenv("MARKET_HOLIDAYS", "")
+        return cls(_parse_date(day) for day in extra.split(",") if day.strip())
+
+    def is_trading_day(self, day: date) -> bool:
+        if day.year not in HOLIDAYS and day.year not in self.warned_years:
+            self.warned_years.add(day.year)
+            logger.warning(f"No exchange holidays known for {day.year}, only weekends are skipped")
+        return day.weekday() < 5 and day not in self.holidays
+
+    def is_trading_time(self, now: datetime) -> bool:
+        if not self.is_trading_day(now.date()):
+            return False
+        current_time = now.time()
+        return any(start <= current_time <= end for start, end in SESSIONS)
+
+    def next_trading_day(self, day: date) -> date:
+        """day 之后的第一个交易日"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day: date) -> date:
+        """day 当天或之前的最近一个交易日"""
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_session_start(self, now: datetime) -> datetime:
+        """下一个交易时段的开始时间，当前处于交易时段时返回 now"""
+        if self.is_trading_day(now.date()):
+            for start, end in SESSIONS:
+                if now.time() <= end:
+                    return max(now, datetime.combine(now.date(), start))
+        return datetime.combine(self.next_trading_day(now.date()), SESSIONS[0][0])
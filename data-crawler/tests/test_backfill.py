@@ -0,0 +1,64 @@
+import asyncio
+import os
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.crawlers.fund_crawler import BACKFILL_COLLECTION, FundCrawler
+from app.crawlers.parsers import FIXTURES_DIR
+
+with open(os.path.join(FIXTURES_DIR, "lsjz.html"), encoding="utf-8") as f:
+    LSJZ = f.read().replace("pages:181", "pages:2")
+
+class HistoryCrawler(FundCrawler):
+    """lsjz 请求返回录制的两页净值，记录请求的日期区间"""
+
+    def __init__(self, db, fail=False):
+        super().__init__(db, max_retries=0)
+        self.fail = fail
+        self.ranges = []
+
+    async def request(self, url, headers=None):
+        query = parse_qs(urlsplit(url).query, keep_blank_values=True)
+        if query["page"] == ["1"]:
+            self.ranges.append((query["sdate"][0], query["edate"][0]))
+        if self.fail:
+            return None
+        return 200, LSJZ, {}
+
+def backfill(db, **options):
+    async def main():
+        crawler = HistoryCrawler(db, **options)
+        try:
+            return await crawler.backfill_fund_prices("000051"), crawler.ranges
+        finally:
+            await crawler.close()
+    return asyncio.run(main())
+
+def test_fund_with_recent_prices_gets_older_history():
+    db = AsyncMongoMockClient()["crawler"]
+    # 日常净值任务先写入了最新一天
+    asyncio.run(db.fund_prices.insert_one({"fund_code": "000051", "date": datetime(2026, 10, 16), "price": 1.2345}))
+
+    ok, ranges = backfill(db)
+    assert ok
+    assert ranges == [("", "2026-10-15"), ("2026-10-17", "")]
+    assert asyncio.run(db.fund_prices.count_documents({"fund_code": "000051"})) > 20
+    assert asyncio.run(db[BACKFILL_COLLECTION].find_one({"fund_code": "000051"})) is not None
+    # 早期净值也进入降采样
+    months = asyncio.run(db.fund_price_rollups.distinct("date", {"fund_code": "000051", "resolution": "month"}))
+    assert sorted(months) == [datetime(2026, 9, 1), datetime(2026, 10, 1)]
+
+def test_completed_fund_only_fills_forward_gap():
+    db = AsyncMongoMockClient()["crawler"]
+    assert backfill(db) == (True, [("", "")])
+
+    ok, ranges = backfill(db)
+    assert ok
+    assert ranges == [("2026-10-17", "")]
+
+def test_failed_backfill_is_not_marked_complete():
+    db = AsyncMongoMockClient()["crawler"]
+    assert backfill(db, fail=True) == (False, [("", "")])
+    assert asyncio.run(db[BACKFILL_COLLECTION].count_documents({})) == 0
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services.bulk_writer import BulkWriter, WriteFailed
+
+def test_updates_to_same_record_are_merged():
+    async def main():
+        db = AsyncMongoMockClient()["crawler"]
+        writer = BulkWriter(db, batch_size=10)
+        await writer.upsert("funds", {"code": "000001"}, {"$set": {"name": "沪深300"}})
+        await writer.upsert("funds", {"code": "000001"}, {"$set": {"rating": 4}, "$setOnInsert": {"created_at": 1}})
+        assert writer.pending == 1
+        await writer.flush()
+
+        fund = await db.funds.find_one({"code": "000001"}, {"_id": 0})
+        assert fund == {"code": "000001", "name": "沪深300", "rating": 4, "created_at": 1}
+        assert (writer.metrics.flushes, writer.metrics.operations, writer.metrics.upserted) == (1, 1, 1)
+
+    asyncio.run(main())
+
+def test_flushes_when_batch_is_full():
+    async def main():
+        db = AsyncMongoMockClient()["crawler"]
+        writer = BulkWriter(db, batch_size=2)
+        await writer.upsert("fund_prices", {"fund_code": "000001", "date": 1}, {"$set": {"price": 1.0}})
+        assert await db.fund_prices.count_documents({}) == 0
+        await writer.upsert("fund_prices", {"fund_code": "000001", "date": 2}, {"$set": {"price": 1.1}})
+        assert await db.fund_prices.count_documents({}) == 2
+        assert writer.pending == 0
+
+    asyncio.run(main())
+
+def test_on_write_receives_only_successful_writes():
+    async def main():
+        db = AsyncMongoMockClient()["crawler"]
+        await db.funds.create_index("name", unique=True)
+        await db.funds.insert_one({"code": "000009", "name": "重名"})
+        written = []
+        writer = BulkWriter(db, on_write=lambda collection, writes: written.extend(writes))
+        await writer.upsert("funds", {"code": "000001"}, {"$set": {"name": "沪深300"}})
+        await writer.upsert("funds", {"code": "000002"}, {"$set": {"name": "重名"}})
+        await writer.flush()
+
+        assert [query for query, _ in written] == [{"code": "000001"}]
+        assert writer.metrics.failed == 1
+
+    asyncio.run(main())
+
+def test_wait_flushed_returns_after_periodic_flush():
+    async def main():
+        db = AsyncMongoMockClient()["crawler"]
+        writer = BulkWriter(db, flush_interval=0.01)
+        writer.start()
+        with writer.track() as writes:
+            await writer.upsert("funds", {"code": "000001"}, {"$set": {"name": "沪深300"}})
+        await asyncio.wait_for(writer.wait_flushed(writes), timeout=1)
+        assert await db.funds.count_documents({}) == 1
+        await writer.close()
+
+    asyncio.run(main())
+
+def test_wait_flushed_raises_only_for_failed_writes():
+    async def main():
+        db = AsyncMongoMockClient()["crawler"]
+        await db.funds.create_index("name", unique=True)
+        await db.funds.insert_one({"code": "000009", "name": "重名"})
+        writer = BulkWriter(db, flush_interval=0.01)
+        writer.start()
+
+        async def task(code, name):
+            with writer.track() as writes:
+                await writer.upsert("funds", {"code": code}, {"$set": {"name": name}})
+            await writer.wait_flushed(writes)
+
+        ok, lost = await asyncio.gather(task("000001", "沪深300"), task("000002", "重名"), return_exceptions=True)
+        assert ok is None
+        assert isinstance(lost, WriteFailed)
+        await writer.close()
+
+    asyncio.run(main())
+
+def test_wait_flushed_sees_failure_of_flush_in_progress():
+    class SlowCollection:
+        async def bulk_write(self, operations, ordered):
+            await asyncio.sleep(0.05)
+            raise ConnectionError("connection reset")
+
+    async def main():
+        writer = BulkWriter({"funds": SlowCollection()}, batch_size=10)
+        with writer.track() as writes:
+            await writer.upsert("funds", {"code": "000001"}, {"$set": {"name": "沪深300"}})
+        flushing = asyncio.create_task(writer.flush())
+        await asyncio.sleep(0)
+        # 缓冲已被正在进行的刷新取走
+        assert writer.pending == 0
+        with pytest.raises(WriteFailed):
+            await asyncio.wait_for(writer.wait_flushed(writes), timeout=1)
+        await flushing
+
+    asyncio.run(main())
+
+def test_merged_set_overrides_set_on_insert_default():
+    async def main():
+        db = AsyncMongoMockClient()["crawler"]
+        writer = BulkWriter(db, batch_size=10)
+        await writer.upsert("funds", {"code": "000001"}, {"$set": {"name": "沪深300"}, "$setOnInsert": {"rating": 3}})
+        await writer.upsert("funds", {"code": "000001"}, {"$set": {"rating": 5}})
+        await writer.flush()
+        assert writer.metrics.failed == 0
+        assert (await db.funds.find_one({"code": "000001"}))["rating"] == 5
+
+    asyncio.run(main())
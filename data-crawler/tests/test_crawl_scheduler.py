@@ -0,0 +1,73 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app import main as crawler_main
+from app.services import crawl_scheduler
+from app.services.crawl_scheduler import CrawlScheduler
+from app.services.task_queue import LocalTaskQueue, TaskLedger
+from app.services.trading_calendar import TradingCalendar, market_now
+
+@pytest.fixture
+def utc_process(monkeypatch):
+    """与未设置 TZ 的容器一样，进程本地时间为 UTC"""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_new_fund_is_backfilled_once():
+    async def main():
+        codes = ["000001"]
+
+        async def load_codes():
+            return list(codes)
+
+        scheduler = CrawlScheduler(AsyncMongoMockClient()["crawler"], TradingCalendar(), load_codes, universe_interval=600)
+        now = datetime(2026, 1, 6, 20, 0)
+        # 启动时已有的基金不在调度中回填
+        assert "backfill" not in await scheduler.due_tasks(now)
+
+        codes.append("000002")
+        now += timedelta(seconds=600)
+        assert (await scheduler.due_tasks(now))["backfill"] == ["000002"]
+        assert "backfill" not in await scheduler.due_tasks(now + timedelta(seconds=600))
+
+        # 删除的基金移出回填
+        codes.append("000003")
+        await scheduler.refresh_universe(now)
+        assert "000003" in scheduler.next_due["backfill"]
+        codes.remove("000003")
+        assert "backfill" not in await scheduler.due_tasks(now + timedelta(seconds=1200))
+
+    asyncio.run(main())
+
+def test_market_now_is_exchange_time_in_utc_process(utc_process):
+    assert abs(market_now() - (datetime.utcnow() + timedelta(hours=8))) < timedelta(minutes=1)
+    assert abs(datetime.now() - datetime.utcnow()) < timedelta(minutes=1)
+
+def test_scheduler_and_enqueue_use_market_time(utc_process, monkeypatch):
+    # UTC 2026-01-06 01:30 是北京时间 09:30，交易时段开始
+    now = datetime(2026, 1, 6, 9, 30)
+    monkeypatch.setattr(crawl_scheduler, "market_now", lambda: now)
+    monkeypatch.setattr(crawler_main, "market_now", lambda: now)
+
+    async def main():
+        async def load_codes():
+            return ["000001"]
+
+        db = AsyncMongoMockClient()["crawler"]
+        scheduler = CrawlScheduler(db, TradingCalendar(), load_codes)
+        assert (await scheduler.due_tasks())["estimate"] == ["000001"]
+        assert scheduler.next_due["details"]["000001"] == datetime(2026, 1, 6, 17, 0)
+
+        queue = LocalTaskQueue()
+        await crawler_main.enqueue(queue, TaskLedger(db.crawl_tasks), "details", ["000001"])
+        task = queue.queue.get_nowait()
+        assert task["date"] == "2026-01-06"
+
+    asyncio.run(main())
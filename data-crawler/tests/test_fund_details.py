@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.crawlers.fund_crawler import FundCrawler
+from app.crawlers.http_cache import HTTP_CACHE_COLLECTION
+from app.crawlers.parsers import FIXTURES_DIR, parse_manager_page, parse_rating_page, parse_tracking_page
+from app.services.metrics import page_type
+
+PAGE_FIXTURES = {
+    "fund": "fund.html",
+    "tracking": "tsdata.html",
+    "rating": "jjpj.html",
+    "manager": "manager.html",
+}
+
+def fixture(filename: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+        return f.read()
+
+class FixtureCrawler(FundCrawler):
+    """按 URL 返回录制的页面；failing 中的页面类型请求失败，blank 中的返回不含数据的页面"""
+
+    def __init__(self, db, failing=(), blank=()):
+        super().__init__(db, max_retries=0)
+        self.failing = set(failing)
+        self.blank = set(blank)
+
+    async def request(self, url, headers=None):
+        page = page_type(url)
+        if page in self.failing:
+            return None
+        if page in self.blank:
+            return 200, "<html><body>访问过于频繁</body></html>", {}
+        return 200, fixture(PAGE_FIXTURES[page]), {}
+
+def crawl(db, **pages):
+    async def main():
+        crawler = FixtureCrawler(db, **pages)
+        try:
+            return await crawler.crawl_fund_details("000051")
+        finally:
+            await crawler.close()
+    return asyncio.run(main())
+
+def test_parsers_return_none_without_data():
+    blank = "<html><body></body></html>"
+    assert parse_tracking_page(blank) is None
+    assert parse_rating_page(blank) is None
+    assert parse_manager_page(blank) is None
+
+def test_failed_secondary_pages_keep_stored_values():
+    db = AsyncMongoMockClient()["crawler"]
+    assert crawl(db)
+    stored = asyncio.run(db.funds.find_one({"code": "000051"}))
+
+    assert crawl(db, failing={"tracking"}, blank={"rating", "manager"})
+    fund = asyncio.run(db.funds.find_one({"code": "000051"}))
+    assert fund == stored
+
+def test_new_fund_gets_defaults_for_failed_pages():
+    db = AsyncMongoMockClient()["crawler"]
+    assert crawl(db, failing={"tracking", "rating"})
+    fund = asyncio.run(db.funds.find_one({"code": "000051"}))
+    assert (fund["tracking_error"], fund["rating"]) == (0.0, 3)
+    assert fund["experience_years"] == parse_manager_page(fixture("manager.html"))
+
+    # 之后页面恢复时正常更新
+    assert crawl(db)
+    fund = asyncio.run(db.funds.find_one({"code": "000051"}))
+    assert fund["rating"] == parse_rating_page(fixture("jjpj.html"))
+    assert isinstance(fund["updated_at"], datetime)
+
+def test_updated_at_is_utc(monkeypatch):
+    # 在非 UTC 时区的容器中也写入 UTC 时间，与后端、fund_stats 一致
+    monkeypatch.setenv("TZ", "Asia/Shanghai")
+    time.tzset()
+    try:
+        db = AsyncMongoMockClient()["crawler"]
+        assert crawl(db)
+        fund = asyncio.run(db.funds.find_one({"code": "000051"}))
+        page = asyncio.run(db[HTTP_CACHE_COLLECTION].find_one({}))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    for value in (fund["updated_at"], fund["created_at"], page["updated_at"]):
+        assert abs(value - datetime.utcnow()) < timedelta(minutes=1)
@@ -0,0 +1,73 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.crawlers.fund_crawler import FundCrawler
+from app.crawlers.http_cache import HTTP_CACHE_COLLECTION
+
+URL = "http://fund.eastmoney.com/000051.html"
+
+class ConditionalCrawler(FundCrawler):
+    """etag 为 None 时模拟不支持条件请求的上游，始终返回 200"""
+
+    def __init__(self, db, body="<html>v1</html>", etag='"v1"'):
+        super().__init__(db, max_retries=0)
+        self.body = body
+        self.etag = etag
+        self.sent_headers = []
+
+    async def request(self, url, headers=None):
+        self.sent_headers.append(headers or {})
+        if self.etag is not None and (headers or {}).get("If-None-Match") == self.etag:
+            return 304, "", {}
+        return 200, self.body, {"ETag": self.etag} if self.etag else {}
+
+def count_parses():
+    calls = []
+
+    def parse_title(html, backend):
+        calls.append(html)
+        return {"title": html}
+
+    return parse_title, calls
+
+def fetch_twice(crawler, parser):
+    async def main():
+        try:
+            return await crawler.fetch_parsed(URL, parser), await crawler.fetch_parsed(URL, parser)
+        finally:
+            await crawler.close()
+    return asyncio.run(main())
+
+def test_not_modified_uses_cached_result():
+    db = AsyncMongoMockClient()["crawler"]
+    crawler = ConditionalCrawler(db)
+    parser, calls = count_parses()
+    first, second = fetch_twice(crawler, parser)
+
+    assert first == second == {"title": "<html>v1</html>"}
+    assert len(calls) == 1
+    assert crawler.sent_headers == [{}, {"If-None-Match": '"v1"'}]
+    assert (crawler.http_cache.metrics.not_modified, crawler.http_cache.metrics.parsed) == (1, 1)
+    entry = asyncio.run(db[HTTP_CACHE_COLLECTION].find_one({"_id": URL}))
+    assert entry["etag"] == '"v1"'
+
+def test_same_body_hash_skips_parse():
+    db = AsyncMongoMockClient()["crawler"]
+    crawler = ConditionalCrawler(db, etag=None)
+    parser, calls = count_parses()
+    first, second = fetch_twice(crawler, parser)
+
+    assert first == second
+    assert len(calls) == 1
+    assert crawler.http_cache.metrics.unchanged == 1
+
+def test_changed_body_is_parsed_again():
+    db = AsyncMongoMockClient()["crawler"]
+    parser, calls = count_parses()
+    fetch_twice(ConditionalCrawler(db, etag=None), parser)
+    crawler = ConditionalCrawler(db, body="<html>v2</html>", etag=None)
+    result, _ = fetch_twice(crawler, parser)
+
+    assert result == {"title": "<html>v2</html>"}
+    assert calls == ["<html>v1</html>", "<html>v2</html>"]
@@ -0,0 +1,29 @@
+import asyncio
+import os
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.crawlers.fund_crawler import FundCrawler
+from app.crawlers.parsers import FIXTURE_PARSERS, FIXTURES_DIR, REFERENCE_BACKEND, ParserPool
+
+@pytest.mark.parametrize("filename", sorted(FIXTURE_PARSERS))
+def test_lxml_matches_reference_parser(filename):
+    pytest.importorskip("lxml")
+    with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+        html = f.read()
+    parser = FIXTURE_PARSERS[filename]
+    expected = parser(html, REFERENCE_BACKEND)
+    assert expected
+    assert parser(html, "lxml") == expected
+
+def test_crawler_close_shuts_down_parser_pool():
+    async def main():
+        crawler = FundCrawler(AsyncMongoMockClient()["crawler"], parser=ParserPool(workers=1))
+        executor = crawler.parser.executor
+        await crawler.close()
+        assert crawler.parser.executor is None
+        with pytest.raises(RuntimeError):
+            executor.submit(len, "")
+
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app import main as crawler_main
+from app.services import task_queue
+from app.services.bulk_writer import BulkWriter
+from app.services.task_queue import (
+    MAX_TASK_ATTEMPTS, RETRY_QUEUE, LocalTaskQueue, RabbitMQTaskQueue, TaskLedger, make_task, task_id
+)
+
+def test_ledger_dedups_by_kind_code_and_date():
+    async def main():
+        ledger = TaskLedger(AsyncMongoMockClient()["crawler"].crawl_tasks)
+        price = make_task("price", "000001", "2026-01-05")
+        assert task_id(price) == "price:000001:2026-01-05"
+        assert await ledger.claim(price)
+        assert not await ledger.claim(dict(price, attempt=2))
+        # 同一基金的其他任务类型和其他日期不受影响
+        assert await ledger.claim(make_task("details", "000001", "2026-01-05"))
+        assert await ledger.claim(make_task("price", "000001", "2026-01-06"))
+
+        # price 完成后删除登记，details 当天保留
+        await ledger.complete(price)
+        assert await ledger.claim(price)
+        details = make_task("details", "000001", "2026-01-05")
+        await ledger.complete(details)
+        entry = await ledger.collection.find_one({"_id": task_id(details)})
+        assert entry["status"] == "done"
+        assert not await ledger.claim(details)
+
+        # 最终失败的任务下一轮可以重新发布
+        await ledger.fail(price)
+        assert await ledger.claim(price)
+
+    asyncio.run(main())
+
+def consume(queue, handler, until):
+    async def run():
+        consumer = asyncio.create_task(queue.consume(handler, 2))
+        while not until():
+            await asyncio.sleep(0.005)
+        consumer.cancel()
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+def test_local_queue_retries_after_delay():
+    queue = LocalTaskQueue(retry_delay=0.01)
+    attempts = []
+
+    async def handler(task):
+        attempts.append(task["attempt"])
+        return task["attempt"] == 1
+
+    asyncio.run(queue.publish(make_task("price", "000001", "2026-01-05")))
+    consume(queue, handler, lambda: len(attempts) == 2)
+    assert attempts == [0, 1]
+    assert queue.dead == []
+
+def test_local_queue_dead_letters_after_max_attempts():
+    queue = LocalTaskQueue(retry_delay=0.01)
+    attempts = []
+
+    async def handler(task):
+        attempts.append(task["attempt"])
+        raise RuntimeError("upstream down")
+
+    asyncio.run(queue.publish(make_task("details", "000001", "2026-01-05")))
+    consume(queue, handler, lambda: queue.dead)
+    assert attempts == list(range(MAX_TASK_ATTEMPTS))
+    assert queue.dead[0]["attempt"] == MAX_TASK_ATTEMPTS - 1
+
+class FakeChannel:
+    def __init__(self):
+        self.declared = {}
+        self.published = []
+        self.acked = []
+        self.nacked = []
+
+    def exchange_declare(self, *args, **kwargs):
+        pass
+
+    def queue_declare(self, queue, durable=False, arguments=None):
+        self.declared[queue] = arguments
+
+    def queue_bind(self, *args):
+        pass
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((routing_key, json.loads(body)))
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.nacked.append((delivery_tag, requeue))
+
+def test_rabbitmq_retry_queue_ttl_and_dead_letter(monkeypatch):
+    import pika
+
+    channel = FakeChannel()
+    monkeypatch.setattr(pika, "BlockingConnection", lambda parameters: SimpleNamespace(channel=lambda: channel))
+    queue = RabbitMQTaskQueue(None, retry_delay=30)
+    queue._connect()
+    # 重试队列的消息 30 秒后过期，经默认交换机回到任务队列
+    assert channel.declared[RETRY_QUEUE] == {
+        "x-message-ttl": 30000,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": task_queue.TASK_QUEUE,
+    }
+    assert channel.declared[task_queue.TASK_QUEUE] == {"x-dead-letter-exchange": task_queue.DEAD_LETTER_EXCHANGE}
+
+    failed = SimpleNamespace(cancelled=lambda: False, exception=lambda: None, result=lambda: False)
+    task = make_task("price", "000001", "2026-01-05")
+    queue._settle(channel, 1, task, failed)
+    assert channel.published == [(RETRY_QUEUE, dict(task, attempt=1))]
+    assert channel.acked == [1]
+
+    queue._settle(channel, 2, dict(task, attempt=MAX_TASK_ATTEMPTS - 1), failed)
+    assert channel.nacked == [(2, False)]
+    queue.executor.shutdown()
+
+class FailingCollection:
+    async def bulk_write(self, operations, ordered):
+        raise ConnectionError("connection reset")
+
+class WritingCrawler:
+    """price 任务只经 BulkWriter 写入一条净值"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    async def crawl_fund_price(self, code):
+        await self.writer.upsert("fund_prices", {"fund_code": code, "date": 1}, {"$set": {"price": 1.0}})
+        return True
+
+    crawl_fund_estimate = crawl_fund_details = backfill_fund_prices = crawl_fund_price
+
+    async def close(self):
+        pass
+
+def test_worker_does_not_complete_task_whose_writes_were_lost(monkeypatch):
+    db = AsyncMongoMockClient()["crawler"]
+    writers = []
+
+    def create_writer(db):
+        writer = BulkWriter({"fund_prices": FailingCollection()}, flush_interval=0.01)
+        writer.start()
+        writers.append(writer)
+        return writer, None
+
+    monkeypatch.setattr(crawler_main, "create_writer", create_writer)
+    monkeypatch.setattr(crawler_main, "create_crawler", lambda db, writer: WritingCrawler(writer))
+    monkeypatch.setattr(crawler_main, "STATS_REFRESH_INTERVAL", 3600)
+    queue = LocalTaskQueue(retry_delay=0.01)
+    ledger = TaskLedger(db.crawl_tasks)
+    task = make_task("price", "000001", "2026-01-05")
+
+    async def run():
+        assert await ledger.claim(task)
+        await queue.publish(task)
+        worker = asyncio.create_task(crawler_main.work_forever(db, queue))
+        while not queue.dead:
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(run(), timeout=5))
+    # 每次尝试的写入都失败，任务没有被确认完成，重试用尽后进入死信并删除登记
+    assert queue.dead[0]["attempt"] == MAX_TASK_ATTEMPTS - 1
+    assert writers[0].metrics.failed == MAX_TASK_ATTEMPTS
+    assert asyncio.run(db.crawl_tasks.count_documents({})) == 0
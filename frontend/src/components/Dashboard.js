@@ -38,33 +38,15 @@ const Dashboard = () => {
   const loadData = async () => {
     setLoading(true);
     try {
-      const response = await axios.get(`${API_BASE_URL}/funds`);
+      // 一次请求获取所有基金的最新净值和30天涨跌幅
+      const response = await axios.get(`${API_BASE_URL}/funds/summary`, {
+        params: { days: 30 }
+      });
       
-      // 获取最新价格数据
-      const fundsWithPrices = await Promise.all(
-        response.data.map(async (fund) => {
-          try {
-            const priceResponse = await axios.get(`${API_BASE_URL}/funds/${fund.code}/prices`, {
-              params: { days: 30 }
-            });
-            
-            const prices = priceResponse.data;
-            const latestPrice = prices.length > 0 ? prices[prices.length - 1] : null;
-            const monthAgoPrice = prices.length > 0 ? prices[0] : null;
-            
-            return {
-              ...fund,
-              latest_price: latestPrice?.price || null,
-              daily_change: latestPrice?.daily_change || null,
-              monthly_change: latestPrice && monthAgoPrice ? 
-                ((latestPrice.price - monthAgoPrice.price) / monthAgoPrice.price * 100) : null
-            };
-          } catch (error) {
-            console.error(`获取 ${fund.code} 价格失败`, error);
-            return fund;
-          }
-        })
-      );
+      const fundsWithPrices = response.data.map(fund => ({
+        ...fund,
+        monthly_change: fund.period_change
+      }));
       
       setFunds(fundsWithPrices);
       setLastUpdated(new Date());
@@ -79,6 +61,32 @@ const Dashboard = () => {
     loadData();
   }, []);
 
+  // 订阅服务端推送的净值和详情变更，就地更新对应基金
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/stream/funds`);
+    const applyEvent = (changes) => (message) => {
+      const event = JSON.parse(message.data);
+      setFunds(current => current.map(fund => (
+        fund.code === event.code ? { ...fund, ...changes(event) } : fund
+      )));
+      setLastUpdated(new Date());
+    };
+
+    source.addEventListener('price', applyEvent(event => ({
+      latest_price: event.price,
+      latest_date: event.date,
+      daily_change: event.daily_change
+    })));
+    source.addEventListener('details', applyEvent(({ type, code, ...fields }) => fields));
+    source.addEventListener('delete', (message) => {
+      const event = JSON.parse(message.data);
+      setFunds(current => current.filter(fund => fund.code !== event.code));
+      setLastUpdated(new Date());
+    });
+
+    return () => source.close();
+  }, []);
+
   // 计算总资产
   const getTotalAssets = () => {
     return funds.reduce((total, fund) => {
@@ -39,6 +39,7 @@ const FundDetail = () => {
   const [prices, setPrices] = useState([]);
   const [loading, setLoading] = useState(true);
   const [priceLoading, setPriceLoading] = useState(true);
+  const [analytics, setAnalytics] = useState(null);
 
   // 加载基金详情
   useEffect(() => {
@@ -80,6 +81,23 @@ const FundDetail = () => {
     }
   }, [fundCode]);
 
+  // 加载服务端计算的收益率等指标
+  useEffect(() => {
+    const fetchAnalytics = async () => {
+      try {
+        const response = await axios.get(`${API_BASE_URL}/funds/${fundCode}/analytics`);
+        setAnalytics(response.data);
+      } catch (error) {
+        console.error('加载基金指标失败', error);
+        setAnalytics(null);
+      }
+    };
+
+    if (fundCode) {
+      fetchAnalytics();
+    }
+  }, [fundCode]);
+
   // 处理返回按钮
   const handleBack = () => {
     navigate('/funds');
@@ -114,19 +132,12 @@ const FundDetail = () => {
     value: item.price
   }));
 
-  // 计算收益率
+  // 区间收益率（由后端 analytics 接口计算）
+  const RETURN_WINDOWS = { 7: '1w', 30: '1m', 90: '3m', 180: '6m', 365: '1y' };
   const calculateReturn = (days) => {
-    if (prices.length < 2) return null;
-    
-    const latestPrice = prices[prices.length - 1].price;
-    const startIndex = prices.findIndex(p => 
-      moment(p.date).isAfter(moment().subtract(days, 'days'))
-    );
-    
-    if (startIndex === -1) return null;
-    
-    const startPrice = prices[startIndex].price;
-    return ((latestPrice - startPrice) / startPrice * 100).toFixed(2);
+    const value = analytics?.returns?.[RETURN_WINDOWS[days]];
+    if (value === null || value === undefined) return null;
+    return value.toFixed(2);
   };
 
   // 渲染加载状态